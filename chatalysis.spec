@@ -1,4 +1,5 @@
 # -*- mode: python ; coding: utf-8 -*-
+from PyInstaller.utils.hooks import collect_data_files
 
 
 block_cipher = None
@@ -7,13 +8,15 @@ data_files = [
     ("resources/images", "resources/images"),
     ("resources/templates", "resources/templates")
 ]
+# the time zone database for zoneinfo, Windows doesn't have its own
+data_files += collect_data_files("tzdata")
 
 a = Analysis(
     ['chatalysis/__main__.py'],
     pathex=['chatalysis'],
     binaries=[],
     datas=data_files,
-    hiddenimports=[],
+    hiddenimports=["tzdata"],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
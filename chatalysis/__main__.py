@@ -1,5 +1,6 @@
 import argparse
 import locale
+import multiprocessing
 import sys
 
 from __init__ import __version__
@@ -25,4 +26,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # worker processes of the parallel mode in the PyInstaller executable
     main()
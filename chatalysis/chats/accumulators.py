@@ -0,0 +1,532 @@
+from __future__ import annotations
+import abc
+from array import array
+from dataclasses import dataclass
+from datetime import tzinfo
+from typing import Any, Callable, Iterable, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from chats.emoji_scanner import EmojiScanner
+from chats.message_lengths import LongMessage, MessageLengths, text_lengths
+from chats.message_table import MessageKind, MessageTable
+from chats.reply_times import ReplyTimes, count_reply_times
+from chats.sessions import SESSION_GAP, count_sessions
+from chats.stats import StatsType
+from chats.system_messages import SystemEvent, SystemMessageClassifier
+from chats.time_buckets import count_times
+from chats.vocabulary import VOCABULARY_CAPACITY, Vocabulary
+
+_NICKNAME_EVENTS = {SystemEvent.NICKNAME, SystemEvent.YOUR_NICKNAME, SystemEvent.OWN_NICKNAME}
+_MEMBER_EVENTS = {
+    SystemEvent.MEMBER_ADDED: "added",
+    SystemEvent.MEMBER_REMOVED: "removed",
+    SystemEvent.MEMBER_LEFT: "left",
+}
+
+# fields of the stats with the numbers of the messages of each kind, None if the source doesn't have the kind
+FACEBOOK_MEDIA: dict[str, MessageKind | None] = {
+    "photos": MessageKind.PHOTOS,
+    "gifs": MessageKind.GIFS,
+    "stickers": MessageKind.STICKER,
+    "videos": MessageKind.VIDEOS,
+    "audios": MessageKind.AUDIO,
+    "files": MessageKind.FILES,
+}
+
+
+@dataclass(frozen=True)
+class ChatContext:
+    """Information about the processed chat that the accumulators may need"""
+
+    participants: list[str]
+    title: str
+    stats_type: StatsType | None
+    user_name: str | None = None  # name of the user, if the source knows it
+    timezone: tzinfo | None = None  # time zone of the times in the stats, the local time zone of the machine if None
+    session_gap: int = SESSION_GAP  # longest gap between messages of one session in seconds, see Sessions
+
+
+class Accumulator(abc.ABC):
+    """Computes some of the fields of the stats from a table of messages. Accumulators that need the text
+    of the messages set reads_text and get the messages with text content one at a time from the engine,
+    the rest work with the columns of the table. Accumulators whose fields depend on the neighbouring messages
+    (e.g. the replies) set sequential, their fields can't be computed from parts of the messages and merged,
+    see StatsEngine.run_batches. They don't read the text."""
+
+    reads_text = False
+    sequential = False
+
+    def __init__(self, messages: MessageTable, chat: ChatContext) -> None:
+        self.messages = messages
+        self.chat = chat
+        self.participants = set(chat.participants)
+        # mask of the interned names of the table (see MessageTable.names) that belong to the participants
+        self.is_participant = np.array([n in self.participants for n in messages.names], dtype=np.bool_)
+
+    def add_text(self, row: int, name: str, text: str) -> bool:
+        """Processes a message with text content
+
+        :param row: row of the message in the table
+        :param name: name of the sender
+        :param text: content of the message
+        :return: True if the message is a system message (e.g. a nickname change), which isn't passed to
+                 the following accumulators and whose reactions aren't counted
+        """
+        return False
+
+    @abc.abstractmethod
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        """Gets the computed fields of the stats
+
+        :param system_rows: mask of the system messages found while the text was processed
+        :return: dict with the fields
+        """
+
+
+# creates an accumulator for a table of messages, usually the accumulator class itself
+AccumulatorFactory = Callable[[MessageTable, ChatContext], Accumulator]
+
+
+def order_by_count(counts: dict[str, int]) -> dict[str, int]:
+    """Orders the counts of symbols (emojis, reactions) from the most frequent one, the equally frequent ones
+    by the symbols, so that the order doesn't depend on the order of the messages. The total stays first.
+
+    :param counts: numbers of the symbols, possibly with their total
+    :return: new dict with the same counts
+    """
+    ordered = {"total": counts["total"]} if "total" in counts else {}
+    ordered.update(sorted(((s, c) for s, c in counts.items() if s != "total"), key=lambda i: (-i[1], i[0])))
+    return ordered
+
+
+def order_by_people(counts: dict[str, Any], people: Sequence[str]) -> dict[str, Any]:
+    """Orders counts of people (numbers of messages, nested counts of their emojis...) in the order
+    of the participants, so that the order doesn't depend on the order of the messages. The total stays first,
+    the people who aren't in the list follow the participants in their original order.
+
+    :param counts: counts of the people, possibly with their total
+    :param people: names of the participants in the required order
+    :return: new dict with the same counts
+    """
+    ordered = {"total": counts["total"]} if "total" in counts else {}
+    ordered.update((p, counts[p]) for p in people if p in counts)
+    ordered.update((p, c) for p, c in counts.items() if p not in ordered)
+    return ordered
+
+
+def _count_pairs(
+    people: npt.NDArray[np.integer[Any]],
+    symbols: npt.NDArray[np.integer[Any]],
+    names: Sequence[str],
+    symbol_names: Sequence[str],
+    total: str | None = None,
+) -> dict[str, dict[str, int]]:
+    """Counts the occurrences of pairs of interned ids of people and symbols (emojis, reactions) in the sparse
+    form, only the pairs that occur are sorted and counted. The people are in the order of their first occurrence,
+    their symbols are ordered by order_by_count.
+
+    :param people: ids of the people, indices to names
+    :param symbols: ids of the symbols, indices to symbol_names, of the same length as people
+    :param names: names of the people
+    :param symbol_names: the symbols
+    :param total: key of the total number of the symbols of each person, which comes first, left out if None
+    :return: dict of the people with the numbers of their symbols
+    """
+    keys = people.astype(np.int64) * len(symbol_names) + symbols
+    pairs, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+
+    result: dict[str, dict[str, int]] = {}
+    for pair, count in zip(pairs[order].tolist(), counts[order].tolist()):
+        person, symbol = divmod(pair, len(symbol_names))
+        if names[person] not in result:
+            result[names[person]] = {total: 0} if total is not None else {}
+        result[names[person]][symbol_names[symbol]] = count
+        if total is not None:
+            result[names[person]][total] += count
+    return {person: order_by_count(counts) for person, counts in result.items()}
+
+
+class StatsEngine:
+    """Computes the stats of a table of messages with a set of accumulators. The accumulators that read the text
+    of the messages are run together in a single pass over the messages with text content, in the order in which
+    they are registered, then the results of all accumulators are collected."""
+
+    def __init__(self, accumulators: Sequence[AccumulatorFactory]) -> None:
+        """
+        :param accumulators: accumulators computing the stats, fields without an accumulator are left out
+        """
+        self.accumulators = list(accumulators)
+
+    def run(self, messages: MessageTable, chat: ChatContext) -> dict[str, Any]:
+        """Computes the stats
+
+        :param messages: table of messages
+        :param chat: information about the chat
+        :return: dict with the fields of the stats computed by the accumulators
+        """
+        accumulators = [factory(messages, chat) for factory in self.accumulators]
+        return self._results(accumulators, self._read_texts(messages, accumulators))
+
+    def run_batches(
+        self, batches: Iterable[MessageTable], chat: ChatContext
+    ) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+        """Computes the stats of messages read in batches, of which only one needs to be in memory at a time.
+        The accumulators are run on each batch, except the sequential ones: only the timestamps and the senders
+        of the messages they get are kept (see MessageTable.timeline) and they're run once on all of them after
+        the last batch, so their fields are the same as if all the messages were in one table.
+
+        :param batches: tables of messages, in any order, empty ones are skipped
+        :param chat: information about the chat
+        :return: parts - fields of each batch computed by the accumulators that aren't sequential, to be merged
+                 sequential - fields computed by the sequential accumulators from all the messages,
+                              empty if there are no messages
+        """
+        parts = []
+        timelines = []
+        sequential: list[AccumulatorFactory] = []
+        for batch in batches:
+            if not len(batch):
+                continue
+            accumulators = [factory(batch, chat) for factory in self.accumulators]
+            sequential = [f for f, a in zip(self.accumulators, accumulators) if a.sequential]
+            system_rows = self._read_texts(batch, accumulators)
+            parts.append(self._results([a for a in accumulators if not a.sequential], system_rows))
+            # the system messages are left out by the sequential accumulators
+            timelines.append(batch.timeline(np.flatnonzero(~system_rows)))
+
+        if not parts:
+            return [], {}
+        messages = MessageTable.concatenate(timelines)
+        accumulators = [factory(messages, chat) for factory in sequential]
+        return parts, self._results(accumulators, np.zeros(len(messages), dtype=np.bool_))
+
+    @staticmethod
+    def _read_texts(messages: MessageTable, accumulators: Sequence[Accumulator]) -> npt.NDArray[np.bool_]:
+        """Passes the messages with text content to the accumulators that read the text
+
+        :param messages: table of messages
+        :param accumulators: accumulators created for the table
+        :return: mask of the system messages
+        """
+        readers = [a for a in accumulators if a.reads_text]
+        system_rows = np.zeros(len(messages), dtype=np.bool_)
+
+        if readers:
+            content_rows = np.flatnonzero(messages.kinds == MessageKind.CONTENT).tolist()
+            senders = messages.senders.tolist()
+            names = messages.names
+            for row, text in zip(content_rows, messages.texts(content_rows)):
+                name = names[senders[row]]
+                for reader in readers:
+                    if reader.add_text(row, name, text):
+                        system_rows[row] = True
+                        break
+        return system_rows
+
+    @staticmethod
+    def _results(accumulators: Sequence[Accumulator], system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        """Collects the fields computed by the accumulators"""
+        fields: dict[str, Any] = {}
+        for accumulator in accumulators:
+            fields.update(accumulator.result(system_rows))
+        return fields
+
+
+class TimesAccumulator(Accumulator):
+    """Numbers of messages in time (times, with the days in a Calendar) and the days of the first and the last
+    message (from_day, to_day)"""
+
+    def __init__(self, messages: MessageTable, chat: ChatContext) -> None:
+        if not len(messages):
+            raise ValueError(f"{chat.title} - there are no messages to process")
+        super().__init__(messages, chat)
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        messages = self.messages
+        # the calendar counts the messages of the participants and of each kind of message per day too
+        names = [n if p else None for n, p in zip(messages.names, self.is_participant.tolist())]
+        times, from_day, to_day = count_times(
+            messages.timestamps, self.chat.timezone, messages.senders, names, messages.kinds
+        )
+        return {"times": times, "from_day": from_day, "to_day": to_day}
+
+
+class PeopleAccumulator(Accumulator):
+    """Numbers of messages in total and for each of the participants (people)"""
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        people = {"total": len(self.messages)}
+        for n in self.chat.participants:
+            people[n] = 0
+
+        counts = np.bincount(self.messages.senders, minlength=len(self.messages.names)).tolist()
+        for sender_id, name in enumerate(self.messages.names):
+            if name in self.participants:
+                people[name] += counts[sender_id]
+        return {"people": people}
+
+
+class MediaAccumulator(Accumulator):
+    """Numbers of the messages of each media kind (photos, videos...) in total and for each participant who sent
+    at least one of them, in the order of the participants."""
+
+    def __init__(
+        self, messages: MessageTable, chat: ChatContext, kinds: dict[str, MessageKind | None] = FACEBOOK_MEDIA
+    ) -> None:
+        """
+        :param kinds: fields of the stats with the kinds of messages they count, None for the kinds
+                      the source doesn't have, which are always zero
+        """
+        super().__init__(messages, chat)
+        self.kinds = kinds
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        return {f: self._count(kind) if kind is not None else {"total": 0} for f, kind in self.kinds.items()}
+
+    def _count(self, kind: MessageKind) -> dict[str, int]:
+        messages = self.messages
+        senders = messages.senders[messages.kinds == kind]
+        counts = {"total": len(senders)}
+
+        sender_counts = np.bincount(senders, minlength=len(messages.names)).tolist()
+        for sender_id in np.unique(senders).tolist():
+            name = messages.names[sender_id]
+            if name in self.participants:
+                counts[name] = sender_counts[sender_id]
+        return order_by_people(counts, self.chat.participants)
+
+
+class ReactionsAccumulator(Accumulator):
+    """Reactions in total, by their types and given and received by each participant (reactions).
+    The reactions of system messages aren't counted."""
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        messages = self.messages
+        reactions: Any = {"total": 0, "types": {}, "gave": {}, "got": {}}
+        for n in self.chat.participants:
+            reactions["gave"][n] = {"total": 0}
+            reactions["got"][n] = {"total": 0}
+
+        # both hearts are counted as the same reaction
+        symbol_names = list(dict.fromkeys("❤️" if s == "❤" else s for s in messages.symbols))
+        symbol_ids = np.array([symbol_names.index("❤️" if s == "❤" else s) for s in messages.symbols], dtype=np.int64)
+
+        kept = ~system_rows[messages.reaction_rows]
+        symbols = symbol_ids[messages.reaction_symbols[kept]]
+        actors = messages.reaction_actors[kept]
+        recipients = messages.senders[messages.reaction_rows[kept]]
+
+        reactions["total"] = len(symbols)
+        reactions["types"] = _count_pairs(np.zeros_like(symbols), symbols, [""], symbol_names).get("", {})
+        got = self.is_participant[recipients]
+        gave = got & self.is_participant[actors]
+        reactions["got"].update(_count_pairs(recipients[got], symbols[got], messages.names, symbol_names, "total"))
+        reactions["gave"].update(_count_pairs(actors[gave], symbols[gave], messages.names, symbol_names, "total"))
+        return {"reactions": reactions}
+
+
+class EmojisAccumulator(Accumulator):
+    """Both actual Unicode emojis and text emojis (such as ":D") sent by the participants (emojis)"""
+
+    reads_text = True
+    scanner = EmojiScanner()
+
+    def __init__(self, messages: MessageTable, chat: ChatContext) -> None:
+        super().__init__(messages, chat)
+        self.senders = messages.senders.tolist()
+        self.is_sender_participant = self.is_participant.tolist()
+        # the emojis are interned, each found emoji is stored as a pair of ids of its sender and the emoji
+        self.emoji_ids: dict[str, int] = {}
+        self.found_senders = array("i")
+        self.found_emojis = array("i")
+
+    def add_text(self, row: int, name: str, text: str) -> bool:
+        sender_id = self.senders[row]
+        if not self.is_sender_participant[sender_id]:
+            return False
+
+        for c in self.scanner.scan(text):
+            self.found_senders.append(sender_id)
+            self.found_emojis.append(self.emoji_ids.setdefault(c, len(self.emoji_ids)))
+        return False
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        senders = np.frombuffer(self.found_senders, dtype=np.int32)
+        emojis = np.frombuffer(self.found_emojis, dtype=np.int32)
+        emoji_names = list(self.emoji_ids)
+
+        sent: dict[str, dict[str, int]] = {n: {"total": 0} for n in self.chat.participants}
+        sent.update(_count_pairs(senders, emojis, self.messages.names, emoji_names, "total"))
+        types = _count_pairs(np.zeros_like(emojis), emojis, [""], emoji_names).get("", {})
+        return {"emojis": {"total": len(emojis), "types": types, "sent": sent}}
+
+
+class VocabularyAccumulator(Accumulator):
+    """The most frequent words and phrases of each participant (vocabulary), see Vocabulary"""
+
+    reads_text = True
+
+    def __init__(self, messages: MessageTable, chat: ChatContext, capacity: int = VOCABULARY_CAPACITY) -> None:
+        """
+        :param capacity: number of the words and of the phrases of each participant whose counts are kept
+        """
+        super().__init__(messages, chat)
+        self.capacity = capacity
+        self.senders = messages.senders.tolist()
+        self.is_sender_participant = self.is_participant.tolist()
+        self.vocabularies: dict[int, Vocabulary] = {}  # by the ids of the senders
+
+    def add_text(self, row: int, name: str, text: str) -> bool:
+        sender_id = self.senders[row]
+        if self.is_sender_participant[sender_id]:
+            vocabulary = self.vocabularies.get(sender_id)
+            if vocabulary is None:
+                vocabulary = self.vocabularies[sender_id] = Vocabulary(self.capacity)
+            vocabulary.add_text(text)
+        return False
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        vocabulary = {n: Vocabulary(self.capacity) for n in self.chat.participants}
+        for sender_id, sender_vocabulary in self.vocabularies.items():
+            sender_vocabulary.flush()
+            vocabulary[self.messages.names[sender_id]] = sender_vocabulary
+        return {"vocabulary": vocabulary}
+
+
+class LengthsAccumulator(Accumulator):
+    """Lengths of the text messages of each participant in characters and words (lengths), see MessageLengths.
+    The system messages aren't counted."""
+
+    def __init__(self, messages: MessageTable, chat: ChatContext, top: int = 5) -> None:
+        """
+        :param top: number of the longest messages of each participant to keep
+        """
+        super().__init__(messages, chat)
+        self.top = top
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        messages = self.messages
+        lengths = {n: MessageLengths(self.top) for n in self.chat.participants}
+
+        rows = np.flatnonzero(
+            (messages.kinds == MessageKind.CONTENT) & ~system_rows & self.is_participant[messages.senders]
+        )
+        rows = rows[np.argsort(messages.senders[rows], kind="stable")]
+        chars, words = text_lengths(messages.content, messages.content_offsets)
+        sender_ids, firsts = np.unique(messages.senders[rows], return_index=True)
+
+        for sender_id, sender_rows in zip(sender_ids.tolist(), np.split(rows, firsts[1:])):
+            person = lengths[messages.names[sender_id]]
+            person.add(chars[sender_rows], words[sender_rows])
+            # the candidates are ordered in the same way as in the heap, so that the result doesn't depend on
+            # how the messages are split into tables
+            order = np.lexsort((-messages.timestamps[sender_rows], -words[sender_rows], -chars[sender_rows]))
+            longest = sender_rows[order[: self.top]]
+            for row in longest.tolist():
+                person.longest.add(
+                    LongMessage(int(chars[row]), int(words[row]), int(messages.timestamps[row]), messages.text(row))
+                )
+        return {"lengths": lengths}
+
+
+class RepliesAccumulator(Accumulator):
+    """Times in which the participants replied to each other (replies), see ReplyTimes. The system messages
+    are left out and so are the replies of and to the people who aren't participants. The personal stats hold
+    only the messages of the user, which aren't replies, so they're left out there."""
+
+    sequential = True
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        if self.chat.stats_type == StatsType.PERSONAL:
+            return {"replies": None}
+
+        messages = self.messages
+        rows = np.flatnonzero(~system_rows)
+        rows = rows[np.argsort(messages.timestamps[rows], kind="stable")]
+        replies = count_reply_times(
+            messages.timestamps[rows], messages.senders[rows], messages.names, self.chat.timezone
+        )
+
+        result = {}
+        for n in self.chat.participants:
+            result[n] = replies.get(n, ReplyTimes())
+            result[n].to = {m: sketch for m, sketch in result[n].to.items() if m in self.participants}
+        return {"replies": result}
+
+
+class SessionsAccumulator(Accumulator):
+    """Sessions of the chat (sessions), see Sessions. The system messages are left out and only the sessions
+    started and ended by the participants are counted for them. The personal stats hold only the messages
+    of the user, which don't make sessions, so they're left out there."""
+
+    sequential = True
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        if self.chat.stats_type == StatsType.PERSONAL:
+            return {"sessions": None}
+
+        messages = self.messages
+        rows = np.flatnonzero(~system_rows)
+        rows = rows[np.argsort(messages.timestamps[rows], kind="stable")]
+        sessions = count_sessions(
+            messages.timestamps[rows], messages.senders[rows], messages.names, self.chat.session_gap
+        )
+
+        sessions.started = {n: c for n, c in sessions.started.items() if n in self.participants}
+        sessions.ended = {n: c for n, c in sessions.ended.items() if n in self.participants}
+        return {"sessions": sessions}
+
+
+class SystemMessagesAccumulator(Accumulator):
+    """Changes of the nicknames (nicknames) and of the name of a group chat (group_names), members added to,
+    removed from or leaving the group (members) and calls started by each participant (calls). They are all
+    announced by system messages (see SystemMessageClassifier)."""
+
+    reads_text = True
+    classifier = SystemMessageClassifier()
+
+    def __init__(self, messages: MessageTable, chat: ChatContext) -> None:
+        super().__init__(messages, chat)
+        self.timestamps = messages.timestamps
+        self.nicknames: list[dict[str, Any]] = []
+        self.group_names: list[dict[str, Any]] = []
+        self.members: list[dict[str, Any]] = []
+        self.calls = {"total": 0}
+
+    def add_text(self, row: int, name: str, text: str) -> bool:
+        message = self.classifier.classify(text, name, self.chat.participants)
+        if message is None:
+            return False
+
+        event, groups = message
+        timestamp = int(self.timestamps[row])
+        if event in _NICKNAME_EVENTS:
+            target = groups.get("target") or (self.chat.user_name if event == SystemEvent.YOUR_NICKNAME else name)
+            self.nicknames.append(
+                {"timestamp": timestamp, "target": target, "nickname": groups["nickname"], "changed_by": name}
+            )
+        elif event == SystemEvent.GROUP_NAME:
+            if self.chat.stats_type != StatsType.GROUP:
+                return False
+            self.group_names.append({"timestamp": timestamp, "group_name": groups["group_name"], "changed_by": name})
+        elif event in _MEMBER_EVENTS:
+            member = groups.get("member", name)
+            self.members.append(
+                {"timestamp": timestamp, "event": _MEMBER_EVENTS[event], "member": member, "changed_by": name}
+            )
+        elif event == SystemEvent.CALL:
+            self.calls["total"] += 1
+            if name in self.participants:
+                self.calls[name] = 1 + self.calls.get(name, 0)
+        return True
+
+    def result(self, system_rows: npt.NDArray[np.bool_]) -> dict[str, Any]:
+        return {
+            "nicknames": sorted(self.nicknames, key=lambda n: n["timestamp"]),
+            "group_names": sorted(self.group_names, key=lambda g: g["timestamp"]),
+            "members": sorted(self.members, key=lambda m: m["timestamp"]),
+            "calls": order_by_people(self.calls, self.chat.participants),
+        }
@@ -7,11 +7,14 @@ from jinja2 import Environment, FileSystemLoader
 from __init__ import __version__
 from paths import HOME, OUTPUT_DIR
 from chats.stats import StatsType
-from chats.charts.plotly_messages import daily_messages_bar, hourly_messages_line, messages_pie
+from chats.charts.plotly_messages import daily_messages_bar, hourly_messages_line, messages_pie, reply_times_line
 from chats.charts.plotly_names import groupchat_names_plot, nicknames_plot
+from chats.sessions import longest_streak
+from chats.sketches import QuantileSketch
 from chats.stats import Stats
+from chats.vocabulary import Vocabulary
 from utils.const import DAYS
-from utils.utility import list_folder, html_spaces, change_name
+from utils.utility import list_folder, html_duration, html_spaces, change_name
 
 # emojis = {"total": 0, "types": {"type": x}, "sent": {"name": {"total": x, "type": y}}}
 # reactions = {"total": 0, "types": {}, "gave": {"name": {"total": x, "type": y}}, "got": {"name": {"total": x, "type": y}}}
@@ -33,6 +36,7 @@ class Analyzer:
         file_loader = FileSystemLoader(HOME / "resources" / "templates")
         env = Environment(loader=file_loader)
         env.filters["space"] = html_spaces
+        env.filters["duration"] = html_duration
 
         template = env.get_template(f"{template_name}.html.j2")
 
@@ -97,6 +101,15 @@ class Analyzer:
             reacts_L=self._tops_count(self.chat.reactions, "got") if self.chat.reactions else None,
             left_reacts=self._emoji_stats_count(self.chat.reactions, "gave") if self.chat.reactions else None,
             reacts_names=self._active_names_emojis_reacts(self.chat.reactions, "gave") if self.chat.reactions else None,
+            # message lengths
+            lengths=self._message_lengths(),
+            # reply times
+            replies=self._reply_times(),
+            reply_times_line=reply_times_line(self._reply_hours()) if self.chat.replies else None,
+            # sessions
+            sessions=self._sessions(),
+            # vocabulary
+            vocabulary=self._vocabulary(),
             # chat type
             chat_type=self.chat.stats_type.value,
         )
@@ -154,6 +167,10 @@ class Analyzer:
             diff_reacts_gave=self._count_types(self.chat.reactions, "gave") if self.chat.reactions else None,
             top_reacts=self._top_emojis(self.chat.reactions, "got") if self.chat.reactions else None,
             reacts_L=self._tops_count(self.chat.reactions, "got") if self.chat.reactions else None,
+            # message lengths
+            lengths=self._message_lengths(),
+            # vocabulary
+            vocabulary=self._vocabulary(),
         )
 
     # endregion
@@ -256,6 +273,102 @@ class Analyzer:
                 count[n] = len(self._top_emojis_personal(to_count, n, keyword)[0])
         return count
 
+    def _message_lengths(self, longest: int = 3) -> dict[str, dict[str, Any]] | None:
+        """Prepares the lengths of the text messages for the HTML, for the participants who sent any,
+        from the most active one
+
+        :param longest: number of the longest messages of each participant to show
+        """
+        if not self.chat.lengths:
+            return None
+        lengths = sorted(((n, l) for n, l in self.chat.lengths.items() if l.count), key=lambda i: -i[1].count)
+        return {
+            n: {
+                "chars": round(l.mean_chars, 1),
+                "words": round(l.mean_words, 1),
+                "median": round(l.chars_sketch.quantile(0.5)),
+                "p90": round(l.chars_sketch.quantile(0.9)),
+                "longest": l.longest.messages()[:longest],
+            }
+            for n, l in lengths
+        }
+
+    def _reply_times(self, top: int = 3, min_hour_replies: int = 10) -> dict[str, dict[str, Any]] | None:
+        """Prepares the reply times for the HTML, for the participants who replied to someone,
+        from the one who replied the most
+
+        :param top: number of the people replied to the fastest to show for each participant
+        :param min_hour_replies: minimum number of replies in an hour of day for it to be the fastest hour
+        """
+        if not self.chat.replies:
+            return None
+        replies = sorted(((n, r) for n, r in self.chat.replies.items() if r.count), key=lambda i: -i[1].count)
+        result = {}
+        for n, r in replies:
+            hours = {h: s for h, s in r.hours.items() if s.count >= min_hour_replies}
+            result[n] = {
+                "count": r.count,
+                "median": r.times.quantile(0.5),
+                "p90": r.times.quantile(0.9),
+                "fastest_hour": min(hours, key=lambda h: hours[h].quantile(0.5)) if hours else None,
+                "to": sorted(((m, s.quantile(0.5)) for m, s in r.to.items() if s.count), key=lambda i: i[1])[:top],
+            }
+        return result
+
+    def _reply_hours(self) -> dict[int, float]:
+        """Gets the median reply time of all the participants in each hour of day"""
+        hours: dict[int, QuantileSketch] = {}
+        for r in (self.chat.replies or {}).values():
+            for h, s in r.hours.items():
+                hours.setdefault(h, QuantileSketch(s.relative_accuracy)).merge(s)
+        return {h: s.quantile(0.5) for h, s in hours.items()}
+
+    def _sessions(self) -> dict[str, Any] | None:
+        """Prepares the sessions of the chat for the HTML, with the participants who started or ended any
+        from the one who started the most"""
+        sessions = self.chat.sessions
+        if not sessions or not sessions.count:
+            return None
+        people = sorted(self.chat.participants, key=lambda n: (-sessions.started.get(n, 0), -sessions.ended.get(n, 0)))
+        return {
+            "count": sessions.count,
+            "median": sessions.durations.quantile(0.5),
+            "p90": sessions.durations.quantile(0.9),
+            "messages": round(sessions.sizes.quantile(0.5)),
+            "streak": longest_streak(self.chat.times.days),
+            "silence": sessions.silence.length / 1000,
+            "people": {
+                n: (
+                    round(100 * sessions.started.get(n, 0) / sessions.count),
+                    round(100 * sessions.ended.get(n, 0) / sessions.count),
+                )
+                for n in people
+                if sessions.started.get(n) or sessions.ended.get(n)
+            },
+        }
+
+    def _vocabulary(self, top: int = 10, people: int = 10) -> dict[str, dict[str, Any]] | None:
+        """Prepares the most frequent words and phrases for the HTML, of the whole chat and of the most active
+        participants who wrote any
+
+        :param top: number of the words and of the phrases to show
+        :param people: maximum number of the participants to show
+        """
+        if not self.chat.vocabulary:
+            return None
+        total = Vocabulary()
+        for v in self.chat.vocabulary.values():
+            total.merge(v)
+        if not total.words.top(1):
+            return None
+
+        active = sorted(self.chat.vocabulary, key=lambda n: -self.chat.people.get(n, 0))
+        vocabularies = [("total", total)] if len(self.chat.vocabulary) > 1 else []
+        vocabularies += [(n, self.chat.vocabulary[n]) for n in active[:people]]
+        return {
+            n: {"words": v.words.top(top), "phrases": v.phrases.top(top)} for n, v in vocabularies if v.words.top(1)
+        }
+
     def _pers_stats_count(self) -> tuple[int, int]:
         """Calculates how many lines of personal stats are needed in the HTML"""
         active = self._active_names()
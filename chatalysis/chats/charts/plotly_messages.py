@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Mapping
 import plotly as pl
 import plotly.graph_objects as go
 
@@ -119,10 +119,10 @@ def hourly_messages_line(hours: dict[Any, Any]) -> str:
     return html
 
 
-def daily_messages_bar(days: dict[Any, Any]) -> str:
+def daily_messages_bar(days: Mapping[str, int]) -> str:
     """Prepares the HTML code for the Daily Messages bar chart
 
-    :param days: dict of message counts per day of the conversation
+    :param days: message counts per day of the conversation (see Calendar)
     :return: HTML code of the chart"""
     data = list(days.values())
 
@@ -152,3 +152,45 @@ def daily_messages_bar(days: dict[Any, Any]) -> str:
     # fig.show()
     html = pl.offline.plot(fig, include_plotlyjs=False, output_type="div")
     return html
+
+
+def reply_times_line(hours: dict[int, float]) -> str:
+    """Prepares the HTML code for the Reply Times line chart
+
+    :param hours: dict of median reply times in seconds per hour of day of the conversation
+    :return: HTML code of the chart"""
+    hours = {key: hours[key] for key in sorted(hours)}
+
+    data = [h / 60 for h in hours.values()]
+    fig = go.Figure(
+        data=[
+            go.Scatter(
+                x=list(hours.keys()),
+                y=data,
+                marker_color="rgba(0,0,0,0.8)",
+                line_shape="spline",
+                hovertemplate="%{y:.1f} min<extra></extra>",
+            )
+        ]
+    )
+    fig.update_layout(
+        title={
+            "text": "Median reply time throughout the day",
+            "y": 0.95,
+            "x": 0.5,
+            "xanchor": "center",
+            "yanchor": "top",
+            "font": dict(size=15, color="grey"),
+        },
+        margin=dict(b=25, t=20, l=1, r=20),
+        autosize=True,
+        height=225,
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(linecolor="rgba(0,0,0,0.75)", dtick=4),
+        yaxis=dict(linecolor="rgba(0,0,0,0.75)", ticksuffix=" min"),
+        hovermode="x",
+    )
+    # fig.show()
+    html = pl.offline.plot(fig, include_plotlyjs=False, output_type="div")
+    return html
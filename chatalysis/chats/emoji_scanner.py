@@ -0,0 +1,45 @@
+import emoji
+import regex
+
+from utils.const import EMOJIS_DICT, EMOJIS_REGEX, TRANSLATE_REMOVE_LETTERS
+
+_REGEX_GRAPHEME = regex.compile(r"\X")
+
+
+class EmojiScanner:
+    """Finds the Unicode emojis and the text emojis (such as ":D") in the content of messages. Every emoji is
+    a whole grapheme cluster of the text, so sequences like "👍🏻" or "👨‍👩‍👧" are single emojis.
+
+    The scan is only prefiltered, it isn't a single-pass automaton over the emoji sequences: the clusters are still
+    looked up in emoji.EMOJI_DATA and the text emojis matched by a separate regex, because matching the sequences
+    anywhere in the text would count malformed ones (e.g. an emoji followed by a combining mark). Most messages
+    don't contain any emojis, so the text is first checked for the characters that can appear in the emojis and in
+    the text emojis (ASCII-only text can't contain Unicode emojis at all), only the texts containing some of them
+    are split into grapheme clusters and matched with the text emojis. Checking a set of characters is several
+    times faster than both the splitting and a regex character class."""
+
+    def __init__(self) -> None:
+        # no emoji consists only of ASCII characters (the ASCII digits are only the bases of keycap sequences)
+        self._emoji_chars = frozenset(c for e in emoji.EMOJI_DATA for c in e if not c.isascii())
+
+        # every text emoji contains at least one of its punctuation characters
+        self._text_emoji_chars = frozenset(c for e in EMOJIS_DICT for c in e if not c.isalnum())
+        assert all(not self._text_emoji_chars.isdisjoint(e) for e in EMOJIS_DICT)
+        self._text_emoji = regex.compile(EMOJIS_REGEX)
+
+    def scan(self, text: str) -> list[str]:
+        """Finds the emojis in a text
+
+        :param text: content of a message
+        :return: the Unicode emojis in the order of their appearance followed by the emoji of the first text emoji
+        """
+        emojis = []
+        if not text.isascii() and not self._emoji_chars.isdisjoint(text):
+            clusters = _REGEX_GRAPHEME.findall(text.translate(TRANSLATE_REMOVE_LETTERS))
+            emojis = [c for c in clusters if c in emoji.EMOJI_DATA]
+
+        if not self._text_emoji_chars.isdisjoint(text):
+            text_emoji = self._text_emoji.search(text)
+            if text_emoji:
+                emojis.extend(EMOJIS_DICT[e] for e in text_emoji.groups())
+        return emojis
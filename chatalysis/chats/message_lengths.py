@@ -0,0 +1,117 @@
+from __future__ import annotations
+import heapq
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from chats.sketches import QuantileSketch
+
+# bytes of the UTF-8 content that separate the words (ASCII whitespace) and that continue a multibyte character
+_WHITESPACE = np.isin(np.arange(256), [9, 10, 11, 12, 13, 32])
+_CONTINUATION = (np.arange(256) & 0xC0) == 0x80
+
+
+def text_lengths(content: bytes, offsets: npt.NDArray[np.int64]) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Counts the characters and the words of messages directly in their UTF-8 buffer (see MessageTable), without
+    decoding them. The characters are Unicode code points, the words are separated by ASCII whitespace.
+
+    :param content: UTF-8 buffer with the content of the messages
+    :param offsets: start of each message in the buffer, with one extra item at the end
+    :return: numbers of characters and numbers of words of the messages
+    """
+    data = np.frombuffer(content, dtype=np.uint8)
+    starts, ends = offsets[:-1], offsets[1:]
+    chars = (ends - starts) - _count_per_message(_CONTINUATION[data], offsets)
+
+    # words start with a non-whitespace byte at the start of a message or after whitespace
+    space = _WHITESPACE[data]
+    word_starts = ~space
+    word_starts[1:] &= space[:-1]
+    first = starts[ends > starts]
+    word_starts[first] = ~space[first]
+    words = _count_per_message(word_starts, offsets)
+    return chars, words
+
+
+def _count_per_message(mask: npt.NDArray[np.bool_], offsets: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Counts the marked bytes of the buffer in each message"""
+    messages = np.searchsorted(offsets, np.flatnonzero(mask), side="right") - 1
+    return np.bincount(messages, minlength=len(offsets) - 1)
+
+
+class LongMessage(NamedTuple):
+    chars: int
+    words: int
+    timestamp: int  # in ms
+    text: str
+
+
+class LongestMessages:
+    """The longest messages (by the number of characters) seen so far, kept in a heap of a bounded size"""
+
+    def __init__(self, size: int = 5) -> None:
+        """
+        :param size: number of the messages to keep
+        """
+        self.size = size
+        self._heap: list[LongMessage] = []
+
+    def add(self, message: LongMessage) -> None:
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, message)
+        else:
+            heapq.heappushpop(self._heap, message)
+
+    def merge(self, other: LongestMessages) -> None:
+        for message in other._heap:
+            self.add(message)
+
+    def messages(self) -> list[LongMessage]:
+        """Gets the messages from the longest one"""
+        return sorted(self._heap, reverse=True)
+
+
+class MessageLengths:
+    """Statistics of the lengths of the text messages of a person: totals for the means, sketches
+    for the percentiles and the longest messages. Their size doesn't depend on the number of the messages."""
+
+    def __init__(self, top: int = 5) -> None:
+        """
+        :param top: number of the longest messages to keep
+        """
+        self.count = 0
+        self.chars = 0
+        self.words = 0
+        self.chars_sketch = QuantileSketch()
+        self.words_sketch = QuantileSketch()
+        self.longest = LongestMessages(top)
+
+    @property
+    def mean_chars(self) -> float:
+        return self.chars / self.count if self.count else 0
+
+    @property
+    def mean_words(self) -> float:
+        return self.words / self.count if self.count else 0
+
+    def add(self, chars: npt.NDArray[np.int64], words: npt.NDArray[np.int64]) -> None:
+        """Adds the lengths of messages, the longest messages are added separately
+
+        :param chars: numbers of characters of the messages
+        :param words: numbers of words of the messages
+        """
+        self.count += len(chars)
+        self.chars += int(chars.sum())
+        self.words += int(words.sum())
+        self.chars_sketch.add(chars)
+        self.words_sketch.add(words)
+
+    def merge(self, other: MessageLengths) -> None:
+        """Adds the messages of other statistics to these"""
+        self.count += other.count
+        self.chars += other.chars
+        self.words += other.words
+        self.chars_sketch.merge(other.chars_sketch)
+        self.words_sketch.merge(other.words_sketch)
+        self.longest.merge(other.longest)
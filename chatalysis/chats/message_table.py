@@ -0,0 +1,261 @@
+from __future__ import annotations
+from array import array
+from enum import IntEnum
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+
+class MessageKind(IntEnum):
+    """Kind of a message, stored as uint8 in the MessageTable"""
+
+    OTHER = 0  # messages without any content that is analyzed (calls, unsent messages...)
+    CONTENT = 1
+    PHOTOS = 2
+    GIFS = 3
+    STICKER = 4
+    VIDEOS = 5
+    AUDIO = 6
+    FILES = 7
+    SHARE = 8
+
+
+class MessageTable:
+    """Compact columnar storage of the messages of a chat.
+
+    Every column is a NumPy array with one item per message: the timestamp, the ID of the sender (index to the
+    `names` list of interned names) and the message kind. The text content of all messages is stored in a single
+    UTF-8 buffer and `content_offsets` holds the start of each message's content in the buffer (with one extra
+    item at the end), so messages without content have an empty slice. Reactions are stored in separate columns,
+    each reaction pointing to the row of the message it belongs to, with interned symbols and actors.
+    """
+
+    def __init__(
+        self,
+        timestamps: npt.NDArray[np.int64],
+        senders: npt.NDArray[np.int32],
+        kinds: npt.NDArray[np.uint8],
+        content_offsets: npt.NDArray[np.int64],
+        content: bytes,
+        names: list[str],
+        reaction_rows: npt.NDArray[np.int64],
+        reaction_symbols: npt.NDArray[np.int32],
+        reaction_actors: npt.NDArray[np.int32],
+        symbols: list[str],
+    ) -> None:
+        self.timestamps = timestamps
+        self.senders = senders
+        self.kinds = kinds
+        self.content_offsets = content_offsets
+        self.content = content
+        self.names = names
+        self.reaction_rows = reaction_rows
+        self.reaction_symbols = reaction_symbols
+        self.reaction_actors = reaction_actors
+        self.symbols = symbols
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def text(self, row: int) -> str:
+        """Gets the text content of a message (empty string for messages without content)"""
+        return self.content[self.content_offsets[row] : self.content_offsets[row + 1]].decode("utf-8")
+
+    def texts(self, rows: Iterable[int]) -> Iterator[str]:
+        """Gets the text content of several messages"""
+        offsets = self.content_offsets
+        for row in rows:
+            yield self.content[offsets[row] : offsets[row + 1]].decode("utf-8")
+
+    def sender_id(self, name: str) -> int | None:
+        """Gets the interned ID of a name or None if the name isn't in the table"""
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return None
+
+    def sent_by(self, name: str) -> MessageTable:
+        """Gets a table with only the messages sent by the given person"""
+        sender_id = self.sender_id(name)
+        if sender_id is None:
+            return self.take(np.zeros(0, dtype=np.int64))
+        return self.take(np.flatnonzero(self.senders == sender_id))
+
+    def sorted(self) -> MessageTable:
+        """Gets a table with the messages sorted by their timestamps (the order of equal timestamps is kept)"""
+        order = np.argsort(self.timestamps, kind="stable")
+        if np.array_equal(order, np.arange(len(self))):
+            return self
+        return self.take(order)
+
+    def take(self, rows: npt.NDArray[np.int64]) -> MessageTable:
+        """Gets a table with the given rows in the given order. The name and symbol tables are shared.
+
+        :param rows: indices of the rows to take
+        :return: new table
+        """
+        starts = self.content_offsets[rows]
+        lengths = self.content_offsets[rows + 1] - starts
+        content_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=content_offsets[1:])
+        # gather the bytes of the messages: the i-th byte of the new buffer comes from the position
+        # (start of its message) + (i - new start of its message) of the old buffer
+        positions = np.repeat(starts - content_offsets[:-1], lengths) + np.arange(content_offsets[-1])
+        content = np.frombuffer(self.content, dtype=np.uint8)[positions].tobytes()
+
+        # map the reactions to the new rows and keep them ordered by the rows
+        new_rows = np.full(len(self) + 1, -1, dtype=np.int64)
+        new_rows[rows] = np.arange(len(rows))
+        reaction_rows = new_rows[self.reaction_rows]
+        kept = np.flatnonzero(reaction_rows >= 0)
+        kept = kept[np.argsort(reaction_rows[kept], kind="stable")]
+
+        return MessageTable(
+            self.timestamps[rows],
+            self.senders[rows],
+            self.kinds[rows],
+            content_offsets,
+            content,
+            self.names,
+            reaction_rows[kept],
+            self.reaction_symbols[kept],
+            self.reaction_actors[kept],
+            self.symbols,
+        )
+
+    def timeline(self, rows: npt.NDArray[np.int64]) -> MessageTable:
+        """Gets a table with only the timestamps, senders and kinds of the given rows, without the text content
+        and the reactions. It takes a fraction of the memory of the whole table, so the timelines of all messages
+        of a chat can be kept when its messages are processed in batches (see StatsEngine.run_batches).
+
+        :param rows: indices of the rows to take
+        :return: new table, the name and symbol tables are shared
+        """
+        return MessageTable(
+            self.timestamps[rows],
+            self.senders[rows],
+            self.kinds[rows],
+            np.zeros(len(rows) + 1, dtype=np.int64),
+            b"",
+            self.names,
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32),
+            self.symbols,
+        )
+
+    @staticmethod
+    def merge(tables: Sequence[MessageTable]) -> MessageTable:
+        """Merges tables whose messages are sorted by time (in ascending or descending order) into one table
+        sorted by time. The stable sort of NumPy used for the timestamps is a timsort, which finds the sorted runs
+        and only merges them, so this takes O(n log k) for k tables. Messages with equal timestamps keep the order
+        of the tables.
+
+        :param tables: sorted tables
+        :return: new sorted table
+        """
+        return MessageTable.concatenate(tables).sorted()
+
+    @staticmethod
+    def concatenate(tables: Sequence[MessageTable]) -> MessageTable:
+        """Joins several tables into one, the names and symbols are interned again.
+
+        :param tables: tables to join
+        :return: new table with the messages from all tables, in the order of the tables
+        """
+        names: dict[str, int] = {}
+        symbols: dict[str, int] = {}
+        senders, actors, reaction_symbols, reaction_rows, content_offsets = [], [], [], [], []
+        row_shift = 0
+        content_shift = 0
+
+        for table in tables:
+            name_ids = np.array([names.setdefault(n, len(names)) for n in table.names], dtype=np.int32)
+            symbol_ids = np.array([symbols.setdefault(s, len(symbols)) for s in table.symbols], dtype=np.int32)
+            senders.append(name_ids[table.senders] if len(table) else table.senders)
+            actors.append(name_ids[table.reaction_actors] if len(table.reaction_actors) else table.reaction_actors)
+            reaction_symbols.append(
+                symbol_ids[table.reaction_symbols] if len(table.reaction_symbols) else table.reaction_symbols
+            )
+            reaction_rows.append(table.reaction_rows + row_shift)
+            content_offsets.append(table.content_offsets[:-1] + content_shift)
+            row_shift += len(table)
+            content_shift += len(table.content)
+
+        content_offsets.append(np.array([content_shift], dtype=np.int64))
+
+        return MessageTable(
+            np.concatenate([t.timestamps for t in tables] or [np.zeros(0, dtype=np.int64)]),
+            np.concatenate(senders or [np.zeros(0, dtype=np.int32)]).astype(np.int32),
+            np.concatenate([t.kinds for t in tables] or [np.zeros(0, dtype=np.uint8)]),
+            np.concatenate(content_offsets),
+            b"".join(t.content for t in tables),
+            list(names),
+            np.concatenate(reaction_rows or [np.zeros(0, dtype=np.int64)]),
+            np.concatenate(reaction_symbols or [np.zeros(0, dtype=np.int32)]).astype(np.int32),
+            np.concatenate(actors or [np.zeros(0, dtype=np.int32)]).astype(np.int32),
+            list(symbols),
+        )
+
+
+class MessageTableBuilder:
+    """Builds a MessageTable from raw (decoded) Facebook / Instagram messages appended one at a time"""
+
+    def __init__(self, classify: Callable[[dict[str, Any]], MessageKind]) -> None:
+        """
+        :param classify: function determining the kind of a message, it differs between the sources
+        """
+        self._classify = classify
+        self._timestamps = array("q")
+        self._senders = array("i")
+        self._kinds = array("B")
+        self._content_offsets = array("q", [0])
+        self._content = bytearray()
+        self._names: dict[str, int] = {}
+        self._reaction_rows = array("q")
+        self._reaction_symbols = array("i")
+        self._reaction_actors = array("i")
+        self._symbols: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def append(self, message: dict[str, Any]) -> None:
+        """Adds a message to the table"""
+        names = self._names
+        row = len(self._timestamps)
+
+        self._timestamps.append(message["timestamp_ms"])
+        self._senders.append(names.setdefault(message["sender_name"], len(names)))
+        kind = self._classify(message)
+        self._kinds.append(kind)
+        if kind == MessageKind.CONTENT:
+            self._content += message["content"].encode("utf-8")
+        self._content_offsets.append(len(self._content))
+
+        for r in message.get("reactions", ()):
+            self._reaction_rows.append(row)
+            self._reaction_symbols.append(self._symbols.setdefault(r["reaction"], len(self._symbols)))
+            self._reaction_actors.append(names.setdefault(r["actor"], len(names)))
+
+    def extend(self, messages: Iterable[dict[str, Any]]) -> MessageTableBuilder:
+        """Adds several messages to the table"""
+        for m in messages:
+            self.append(m)
+        return self
+
+    def build(self) -> MessageTable:
+        """Creates the table from the appended messages"""
+        return MessageTable(
+            np.frombuffer(self._timestamps, dtype=np.int64).copy(),
+            np.frombuffer(self._senders, dtype=np.int32).copy(),
+            np.frombuffer(self._kinds, dtype=np.uint8).copy(),
+            np.frombuffer(self._content_offsets, dtype=np.int64).copy(),
+            bytes(self._content),
+            list(self._names),
+            np.frombuffer(self._reaction_rows, dtype=np.int64).copy(),
+            np.frombuffer(self._reaction_symbols, dtype=np.int32).copy(),
+            np.frombuffer(self._reaction_actors, dtype=np.int32).copy(),
+            list(self._symbols),
+        )
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from datetime import tzinfo
+
+import numpy as np
+import numpy.typing as npt
+
+from chats.sketches import QuantileSketch
+from chats.time_buckets import DAY, local_seconds
+
+# longer gaps between the messages of two people are a new conversation rather than a reply (in seconds)
+REPLY_WINDOW = 12 * 3600
+
+
+class ReplyTimes:
+    """Times in which a person replied to the other participants, in seconds. A reply is a message that follows
+    a message of someone else, the time is the gap between them. The times are kept in sketches: overall,
+    by the hour of the day of the reply and for every person replied to."""
+
+    def __init__(self) -> None:
+        self.times = QuantileSketch()
+        self.hours: dict[int, QuantileSketch] = {}
+        self.to: dict[str, QuantileSketch] = {}  # replies to each of the other participants
+
+    @property
+    def count(self) -> int:
+        return self.times.count
+
+    def merge(self, other: ReplyTimes) -> None:
+        """Adds the replies of other reply times to these"""
+        self.times.merge(other.times)
+        for hour, sketch in other.hours.items():
+            self.hours.setdefault(hour, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+        for name, sketch in other.to.items():
+            self.to.setdefault(name, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+
+
+def find_replies(
+    timestamps: npt.NDArray[np.int64], senders: npt.NDArray[np.int32], window: int = REPLY_WINDOW
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Finds the replies in messages sorted by time, i.e. the messages whose sender differs from the sender
+    of the previous message that came at most the window before them
+
+    :param timestamps: sorted timestamps of the messages in ms
+    :param senders: IDs of the senders of the messages
+    :param window: maximum time of a reply in seconds
+    :return: rows of the replies, rows of the messages they reply to and the times of the replies in seconds
+    """
+    gaps = np.diff(timestamps) // 1000
+    replies = np.flatnonzero((senders[1:] != senders[:-1]) & (gaps <= window)) + 1
+    return replies, replies - 1, gaps[replies - 1]
+
+
+def count_reply_times(
+    timestamps: npt.NDArray[np.int64],
+    senders: npt.NDArray[np.int32],
+    names: list[str],
+    zone: tzinfo | None = None,
+    window: int = REPLY_WINDOW,
+) -> dict[str, ReplyTimes]:
+    """Computes the reply times of the people who replied to someone
+
+    :param timestamps: sorted timestamps of the messages in ms
+    :param senders: IDs of the senders of the messages, indices to names
+    :param names: names of the senders
+    :param zone: time zone of the hours of the replies, the local time zone of the machine if None
+    :param window: maximum time of a reply in seconds
+    :return: dict with the reply times of the people
+    """
+    replies, previous, times = find_replies(timestamps, senders, window)
+    repliers = senders[replies].astype(np.int64)
+    replied_to = senders[previous].astype(np.int64)
+    hours = local_seconds(timestamps[replies], zone) % DAY // 3600
+
+    result: dict[str, ReplyTimes] = {}
+    for replier, sketch in QuantileSketch.grouped(repliers, times).items():
+        result.setdefault(names[replier], ReplyTimes()).times = sketch
+    for key, sketch in QuantileSketch.grouped(repliers * 24 + hours, times).items():
+        result[names[key // 24]].hours[key % 24] = sketch
+    for key, sketch in QuantileSketch.grouped(repliers * len(names) + replied_to, times).items():
+        result[names[key // len(names)]].to[names[key % len(names)]] = sketch
+    return result
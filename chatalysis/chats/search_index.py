@@ -0,0 +1,430 @@
+from __future__ import annotations
+import hashlib
+import heapq
+import os
+import pickle
+import re
+import unicodedata as ud
+import zlib
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, tzinfo
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple
+
+import appdirs
+import numpy as np
+import numpy.typing as npt
+
+from __init__ import __version__
+from chats.message_table import MessageTable
+
+# bump whenever the format of the index changes, which makes the whole index be built again
+INDEX_VERSION = 1
+
+index_dir_current = Path(appdirs.user_cache_dir("Chatalysis")) / "search"
+
+# number of the messages whose text is compressed together, only one block is decompressed to get a message
+BLOCK_SIZE = 256
+
+# number of the messages that are split into words together
+_BATCH = 5000
+_SEPARATOR = "\0"
+_TOKEN_REGEX = re.compile(r"\w+")
+_BATCH_TOKEN_REGEX = re.compile(r"\w+|\0")
+_MARKS_REGEX = re.compile("[\u0300-\u036f]")  # combining diacritical marks
+_QUERY_REGEX = re.compile(r'(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+
+class SearchResult(NamedTuple):
+    chat_id: str
+    title: str
+    timestamp: int  # in ms
+    sender: str
+    text: str
+
+
+class Query(NamedTuple):
+    terms: list[str]  # normalized words that the messages have to contain
+    phrases: list[list[str]]  # runs of normalized words that the messages have to contain in this order
+    senders: list[str]  # parts of the names of the senders, a message matches if it's from any of them
+    after: int | None  # timestamps of the start and of the end of the searched time span in ms, None if unbounded
+    before: int | None
+
+
+def normalize(text: str) -> str:
+    """Normalizes a text for the search, so that neither the case nor the diacritics matter"""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return _MARKS_REGEX.sub("", ud.normalize("NFKD", text))
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits a text into normalized words"""
+    return _TOKEN_REGEX.findall(normalize(text))
+
+
+def parse_query(text: str, zone: tzinfo | None = None) -> Query:
+    """Parses a search query. Besides the words, which all have to be in the messages, the query can contain
+    phrases in double quotes, senders (from:name or from:"full name") and the searched days (after:YYYY-MM-DD
+    and before:YYYY-MM-DD, both days included).
+
+    :param text: the query
+    :param zone: time zone of the days, the local time zone if None
+    :return: the parsed query
+    :raises ValueError: if a date isn't in the YYYY-MM-DD format
+    """
+    query = Query([], [], [], None, None)
+    after, before = None, None
+    for match in _QUERY_REGEX.finditer(text):
+        field, quoted, word = match.groups()
+        value = quoted if quoted is not None else word
+        if field == "from":
+            query.senders.append(normalize(value))
+        elif field == "after":
+            after = _day_start(date.fromisoformat(value), zone)
+        elif field == "before":
+            before = _day_start(date.fromisoformat(value) + timedelta(days=1), zone)
+        else:
+            words = tokenize(match.group(0) if field else value)
+            if quoted is not None and len(words) > 1:
+                query.phrases.append(words)
+            query.terms.extend(words)
+    return query._replace(terms=list(dict.fromkeys(query.terms)), after=after, before=before)
+
+
+def _day_start(day: date, zone: tzinfo | None) -> int:
+    """Gets the timestamp of the start of a day in ms"""
+    return int(datetime.combine(day, time(), tzinfo=zone).timestamp() * 1000)
+
+
+def encode_varints(values: npt.NDArray[np.int64]) -> bytes:
+    """Encodes non-negative integers as variable-length integers (LEB128), 7 bits in each byte with the highest
+    bit set in all bytes of a number but the last one, so that small numbers take a single byte"""
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+
+    encoded = np.empty(int(sizes.sum()), dtype=np.uint8)
+    starts = np.cumsum(sizes) - sizes
+    for k in range(int(sizes.max()) if len(sizes) else 0):
+        has_byte = sizes > k
+        byte = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (sizes[has_byte] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[has_byte] + k] = byte | more
+    return encoded.tobytes()
+
+
+def decode_varints(data: bytes) -> npt.NDArray[np.int64]:
+    """Decodes the integers encoded by encode_varints"""
+    encoded = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(encoded < 0x80)  # the last bytes of the numbers
+    starts = np.r_[0, ends[:-1] + 1]
+    sizes = ends - starts + 1
+    values = np.zeros(len(ends), dtype=np.int64)
+    for k in range(int(sizes.max()) if len(sizes) else 0):
+        has_byte = sizes > k
+        values[has_byte] |= (encoded[starts[has_byte] + k] & 0x7F).astype(np.int64) << (7 * k)
+    return values
+
+
+class ChatSegment:
+    """Inverted index of the messages of one chat. For every word, it holds the sorted rows of the messages that
+    contain it (postings), encoded as the differences between the consecutive rows in variable-length integers,
+    so that the words that occur in many messages take about a byte per message. The words are sorted, so they're
+    looked up by a binary search. The timestamps and the senders of the messages are kept to filter the results
+    and the texts are compressed in blocks of BLOCK_SIZE messages, only the blocks with the results are
+    decompressed. The segment is stored (and sent between processes) in the compressed form."""
+
+    def __init__(
+        self,
+        chat_id: str,
+        title: str,
+        names: list[str],
+        timestamps: npt.NDArray[np.int64],
+        senders: npt.NDArray[np.int64],
+        terms: list[str],
+        term_offsets: npt.NDArray[np.int64],
+        postings: bytes,
+        text_offsets: npt.NDArray[np.int64],
+        blocks: list[bytes],
+    ) -> None:
+        self.chat_id = chat_id
+        self.title = title
+        self.names = names
+        self.timestamps = timestamps
+        self.senders = senders
+        self.terms = terms
+        self.term_offsets = term_offsets  # start of the postings of each word in postings, with one extra item
+        self.postings = postings
+        self.text_offsets = text_offsets  # start of each message's text in the uncompressed texts of all messages
+        self.blocks = blocks
+        self._normalized_names = [normalize(n) for n in names]
+        self._block_cache: dict[int, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def build(cls, chat_id: str, title: str, messages: MessageTable) -> ChatSegment:
+        """Indexes the messages of a chat
+
+        :param chat_id: ID of the chat
+        :param title: title of the chat
+        :param messages: the messages sorted by time
+        :return: the index of the chat
+        """
+        # every word of a message is given an ID and paired with the message's row (as ID * rows + row)
+        n = max(len(messages), 1)
+        term_ids: dict[str, int] = {_SEPARATOR: 0}
+        batches = [np.zeros(0, dtype=np.int64)]
+        offsets = messages.content_offsets
+        rows = np.flatnonzero(offsets[1:] > offsets[:-1])
+        content = np.frombuffer(messages.content, dtype=np.uint8)
+        for start in range(0, len(rows), _BATCH):
+            batch = rows[start : start + _BATCH]
+            # the texts of the batch are next to each other in the content, the separators are inserted between them
+            # (and the zero bytes already in the texts are replaced, so that they don't split the messages)
+            begin, end = offsets[batch[0]], offsets[batch[-1] + 1]
+            texts = np.where(content[begin:end] == 0, np.uint8(ord(" ")), content[begin:end])
+            text = normalize(np.insert(texts, offsets[batch[1:]] - begin, 0).tobytes().decode("utf-8"))
+
+            tokens = _BATCH_TOKEN_REGEX.findall(text)
+            for token in dict.fromkeys(tokens):
+                if token not in term_ids:
+                    term_ids[token] = len(term_ids)
+            ids = np.fromiter(map(term_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+            separators = ids == 0
+            batches.append(ids[~separators] * n + batch[np.cumsum(separators)[~separators]])
+
+        # the IDs are replaced by the ranks of the sorted words, so that the pairs are sorted by the words and rows
+        terms = sorted(term_ids)[1:]
+        ranks = np.zeros(len(term_ids), dtype=np.int64)
+        ranks[[term_ids[t] for t in terms]] = np.arange(len(terms))
+        pairs = np.concatenate(batches)
+        pairs = np.unique(ranks[pairs // n] * n + pairs % n)
+        posting_terms, posting_rows = pairs // n, pairs % n
+
+        # the first row of each word is encoded as is, the others as the difference from the previous one
+        firsts = np.r_[True, posting_terms[1:] != posting_terms[:-1]][: len(pairs)]
+        deltas = posting_rows - np.where(firsts, 0, np.r_[0, posting_rows[:-1]])
+        postings = encode_varints(deltas)
+        value_ends = np.flatnonzero(np.frombuffer(postings, dtype=np.uint8) < 0x80) + 1
+        term_ends = value_ends[np.r_[np.flatnonzero(firsts)[1:], len(pairs)] - 1] if len(pairs) else value_ends
+
+        blocks = [
+            zlib.compress(messages.content[offsets[s] : offsets[min(s + BLOCK_SIZE, len(messages))]], 1)
+            for s in range(0, len(messages), BLOCK_SIZE)
+        ]
+        return cls(
+            chat_id,
+            title,
+            list(messages.names),
+            messages.timestamps.astype(np.int64),
+            messages.senders.astype(np.int64),
+            terms,
+            np.r_[0, term_ends].astype(np.int64),
+            postings,
+            offsets.astype(np.int64),
+            blocks,
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        deltas = np.diff(self.timestamps, prepend=0)
+        return {
+            "chat_id": self.chat_id,
+            "title": self.title,
+            "names": self.names,
+            # the timestamps are sorted, but the differences are zigzag-encoded just in case they aren't
+            "timestamps": encode_varints((deltas << 1) ^ (deltas >> 63)),
+            "senders": encode_varints(self.senders),
+            "terms": zlib.compress("\n".join(self.terms).encode("utf-8")),
+            "term_offsets": encode_varints(np.diff(self.term_offsets)),
+            "postings": self.postings,
+            "text_lengths": encode_varints(np.diff(self.text_offsets)),
+            "blocks": self.blocks,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        zigzag = decode_varints(state["timestamps"])
+        terms = zlib.decompress(state["terms"]).decode("utf-8")
+        self.__init__(  # type: ignore[misc]
+            state["chat_id"],
+            state["title"],
+            state["names"],
+            np.cumsum((zigzag >> 1) ^ -(zigzag & 1)),
+            decode_varints(state["senders"]),
+            terms.split("\n") if terms else [],
+            np.r_[0, np.cumsum(decode_varints(state["term_offsets"]))],
+            state["postings"],
+            np.r_[0, np.cumsum(decode_varints(state["text_lengths"]))],
+            state["blocks"],
+        )
+
+    def rows(self, term: str) -> npt.NDArray[np.int64]:
+        """Gets the sorted rows of the messages that contain a normalized word"""
+        i = bisect_left(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return np.zeros(0, dtype=np.int64)
+        return np.cumsum(decode_varints(self.postings[self.term_offsets[i] : self.term_offsets[i + 1]]))
+
+    def text(self, row: int) -> str:
+        """Gets the text of a message"""
+        block = row // BLOCK_SIZE
+        if block not in self._block_cache:
+            if len(self._block_cache) >= 64:
+                self._block_cache.clear()
+            self._block_cache[block] = zlib.decompress(self.blocks[block])
+        block_start = self.text_offsets[block * BLOCK_SIZE]
+        start, end = self.text_offsets[row] - block_start, self.text_offsets[row + 1] - block_start
+        return self._block_cache[block][start:end].decode("utf-8")
+
+    def search(self, query: Query, limit: int) -> npt.NDArray[np.int64]:
+        """Finds the messages matching a query
+
+        :param query: the query
+        :param limit: maximum number of the messages, the newest ones are returned
+        :return: sorted rows of the messages
+        """
+        lo = 0 if query.after is None else int(np.searchsorted(self.timestamps, query.after))
+        hi = len(self) if query.before is None else int(np.searchsorted(self.timestamps, query.before))
+        if lo >= hi:
+            return np.zeros(0, dtype=np.int64)
+
+        if query.terms:
+            # the rarest words first, the intersection can only get smaller
+            postings = sorted((self.rows(t) for t in query.terms), key=len)
+            rows = postings[0]
+            for other in postings[1:]:
+                if not len(rows):
+                    break
+                rows = np.intersect1d(rows, other, assume_unique=True)
+        else:
+            rows = np.flatnonzero(self.text_offsets[1:] > self.text_offsets[:-1])
+        rows = rows[(rows >= lo) & (rows < hi)]
+
+        if query.senders:
+            senders = [i for i, name in enumerate(self._normalized_names) if any(s in name for s in query.senders)]
+            rows = rows[np.isin(self.senders[rows], senders)]
+
+        if not query.phrases:
+            return rows[-limit:]
+
+        # the phrases are checked in the texts, from the newest messages until there are enough of them
+        found: list[int] = []
+        phrases = [f" {' '.join(p)} " for p in query.phrases]
+        for row in rows[::-1].tolist():
+            words = f" {' '.join(tokenize(self.text(row)))} "
+            if all(p in words for p in phrases):
+                found.append(row)
+                if len(found) == limit:
+                    break
+        return np.array(found[::-1], dtype=np.int64)
+
+
+class SearchIndex:
+    """Persistent full-text index of the messages of the chats of a message source. Each chat has its own segment
+    (see ChatSegment) stored in a separate file together with a fingerprint of the chat's files, so only the chats
+    whose files changed have to be indexed again. The segments are loaded when they are searched for the first
+    time and then kept in memory."""
+
+    def __init__(self, scope: str, index_dir: Path = index_dir_current, zone: tzinfo | None = None) -> None:
+        """
+        :param scope: identifier of the indexed source, sources with different scopes have separate indexes
+        :param index_dir: directory with the indexes
+        :param zone: time zone of the days in the queries, the local time zone if None
+        """
+        self.index_dir = index_dir
+        self.zone = zone
+        self._dir = index_dir / hashlib.sha1(scope.encode("utf-8")).hexdigest()
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._fingerprints: dict[str, str] = self._load(self._dir / "manifest.pickle") or {}
+        self._segments: dict[str, ChatSegment] = {}
+
+    @property
+    def chat_ids(self) -> list[str]:
+        return list(self._fingerprints)
+
+    def fingerprint(self, chat_id: str) -> str | None:
+        """Gets the fingerprint of the files of an indexed chat, None if the chat isn't indexed"""
+        if not self._segment_path(chat_id).exists():
+            return None
+        return self._fingerprints.get(chat_id)
+
+    def add(self, segment: ChatSegment, fingerprint: str) -> None:
+        """Adds the index of a chat, replacing its previous index. The change is saved by save().
+
+        :param segment: the index of the chat
+        :param fingerprint: fingerprint of the files of the chat
+        """
+        self._write(self._segment_path(segment.chat_id), segment)
+        self._fingerprints[segment.chat_id] = fingerprint
+        self._segments[segment.chat_id] = segment
+
+    def remove(self, chat_id: str) -> None:
+        """Removes a chat from the index. The change is saved by save()."""
+        self._fingerprints.pop(chat_id, None)
+        self._segments.pop(chat_id, None)
+        self._segment_path(chat_id).unlink(missing_ok=True)
+
+    def save(self) -> None:
+        """Saves the list of the indexed chats"""
+        self._write(self._dir / "manifest.pickle", self._fingerprints)
+
+    def search(self, text: str, limit: int = 100, chat_ids: Iterable[str] | None = None) -> list[SearchResult]:
+        """Finds the messages matching a query, see parse_query
+
+        :param text: the query
+        :param limit: maximum number of the results
+        :param chat_ids: IDs of the searched chats, all indexed chats if None
+        :return: the results, from the newest message
+        :raises ValueError: if the query is invalid
+        """
+        query = parse_query(text, self.zone)
+        if not (query.terms or query.senders or query.after or query.before):
+            return []
+
+        found: list[tuple[int, int, ChatSegment]] = []
+        for chat_id in self._fingerprints if chat_ids is None else chat_ids:
+            segment = self._segment(chat_id)
+            if segment is None:
+                continue
+            rows = segment.search(query, limit)
+            found.extend(zip(segment.timestamps[rows].tolist(), rows.tolist(), [segment] * len(rows)))
+
+        return [
+            SearchResult(s.chat_id, s.title, timestamp, s.names[s.senders[row]], s.text(row))
+            for timestamp, row, s in heapq.nlargest(limit, found, key=lambda f: (f[0], f[1]))
+        ]
+
+    def _segment(self, chat_id: str) -> ChatSegment | None:
+        if chat_id not in self._fingerprints:
+            return None
+        if chat_id not in self._segments:
+            segment = self._load(self._segment_path(chat_id))
+            if segment is None:
+                return None
+            self._segments[chat_id] = segment
+        return self._segments[chat_id]
+
+    def _segment_path(self, chat_id: str) -> Path:
+        return self._dir / f"{hashlib.sha1(chat_id.encode('utf-8')).hexdigest()}.pickle"
+
+    @staticmethod
+    def _load(path: Path) -> Any:
+        try:
+            with open(path, "rb") as f:
+                version, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+            return None
+        return value if version == (INDEX_VERSION, __version__) else None
+
+    @staticmethod
+    def _write(path: Path, value: Any) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(((INDEX_VERSION, __version__), value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # replace atomically, so that an interrupted write can't corrupt the index
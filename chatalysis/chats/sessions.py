@@ -0,0 +1,131 @@
+from __future__ import annotations
+from datetime import date
+from typing import Mapping, NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from chats.sketches import QuantileSketch
+from chats.time_buckets import EPOCH, Calendar
+
+# longer gaps between two messages split the chat into separate sessions (in seconds)
+SESSION_GAP = 3600
+
+
+class Silence(NamedTuple):
+    length: int  # in ms
+    start: int  # timestamp of the last message before the silence, in ms
+
+
+class Streak(NamedTuple):
+    days: int
+    first: date | None
+    last: date | None
+
+
+class Sessions:
+    """Sessions of a chat, i.e. the runs of messages without a gap longer than the session gap between them:
+    who starts and who ends them, their durations (in seconds) and sizes (in messages) kept in sketches
+    and the longest silence between two messages."""
+
+    def __init__(self, gap: int = SESSION_GAP) -> None:
+        """
+        :param gap: the session gap in seconds
+        """
+        self.gap = gap
+        self.started: dict[str, int] = {}  # sessions started by each participant
+        self.ended: dict[str, int] = {}  # sessions ended by each participant
+        self.durations = QuantileSketch()
+        self.sizes = QuantileSketch()
+        self.silence = Silence(0, 0)
+        self.first: int | None = None  # timestamps of the first and of the last message, in ms
+        self.last: int | None = None
+
+    @property
+    def count(self) -> int:
+        return self.durations.count
+
+    def merge(self, other: Sessions) -> None:
+        """Adds the sessions of other messages to these. The silence between the two is only taken into account
+        when the messages don't overlap in time, and a session split between them is counted as two."""
+        for name, count in other.started.items():
+            self.started[name] = count + self.started.get(name, 0)
+        for name, count in other.ended.items():
+            self.ended[name] = count + self.ended.get(name, 0)
+        self.durations.merge(other.durations)
+        self.sizes.merge(other.sizes)
+        self.silence = max(self.silence, other.silence)
+
+        if self.first is None or self.last is None:
+            self.first, self.last = other.first, other.last
+        elif other.first is not None and other.last is not None:
+            if other.first > self.last:
+                self.silence = max(self.silence, Silence(other.first - self.last, self.last))
+            elif self.first > other.last:
+                self.silence = max(self.silence, Silence(self.first - other.last, other.last))
+            self.first, self.last = min(self.first, other.first), max(self.last, other.last)
+
+
+def find_sessions(timestamps: npt.NDArray[np.int64], gap: int = SESSION_GAP) -> npt.NDArray[np.int64]:
+    """Finds the sessions in messages sorted by time
+
+    :param timestamps: sorted timestamps of the messages in ms
+    :param gap: the session gap in seconds
+    :return: rows of the first messages of the sessions
+    """
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, np.diff(timestamps) > gap * 1000])
+
+
+def count_sessions(
+    timestamps: npt.NDArray[np.int64], senders: npt.NDArray[np.int32], names: list[str], gap: int = SESSION_GAP
+) -> Sessions:
+    """Computes the sessions of messages
+
+    :param timestamps: sorted timestamps of the messages in ms
+    :param senders: IDs of the senders of the messages, indices to names
+    :param names: names of the senders
+    :param gap: the session gap in seconds
+    :return: the sessions
+    """
+    sessions = Sessions(gap)
+    starts = find_sessions(timestamps, gap)
+    if len(starts) == 0:
+        return sessions
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+
+    sessions.durations.add((timestamps[ends] - timestamps[starts]) // 1000)
+    sessions.sizes.add(ends - starts + 1)
+    for counts, rows in ((sessions.started, starts), (sessions.ended, ends)):
+        per_sender = np.bincount(senders[rows], minlength=len(names))
+        counts.update((names[s], int(per_sender[s])) for s in np.flatnonzero(per_sender).tolist())
+
+    sessions.first, sessions.last = int(timestamps[0]), int(timestamps[-1])
+    if len(timestamps) > 1:
+        gaps = np.diff(timestamps)
+        longest = int(np.argmax(gaps))
+        sessions.silence = Silence(int(gaps[longest]), int(timestamps[longest]))
+    return sessions
+
+
+def longest_streak(days: Mapping[str, int]) -> Streak:
+    """Finds the longest run of consecutive days with messages
+
+    :param days: numbers of messages per day (see Times), by ISO dates
+    :return: length of the streak in days with its first and last day
+    """
+    if isinstance(days, Calendar):
+        active = np.flatnonzero(days.counts()) + (days.from_day - EPOCH).days
+    else:
+        active = np.unique(np.array([d for d, n in days.items() if n], dtype="datetime64[D]").astype(np.int64))
+    if len(active) == 0:
+        return Streak(0, None, None)
+
+    # runs start where the previous active day isn't the day before
+    starts = np.flatnonzero(np.r_[True, np.diff(active) != 1])
+    lengths = np.diff(np.r_[starts, len(active)])
+    longest = int(np.argmax(lengths))
+    first = active[starts[longest]].astype("datetime64[D]").item()
+    last = active[starts[longest] + lengths[longest] - 1].astype("datetime64[D]").item()
+    return Streak(int(lengths[longest]), first, last)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import heapq
+import math
+from collections import Counter
+from typing import Mapping
+
+import numpy as np
+import numpy.typing as npt
+
+
+class QuantileSketch:
+    """Streaming quantile sketch of non-negative numbers (DDSketch). The numbers are counted in buckets whose
+    width grows exponentially, so the memory depends only on the range of the numbers (a few hundred buckets
+    for message lengths), not on how many there are, and every quantile is within the relative accuracy
+    of the exact one. Sketches with the same accuracy can be merged by adding their counts."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        """
+        :param relative_accuracy: maximum relative error of the quantiles
+        """
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.count = 0
+        self.zeros = 0
+        self.buckets: dict[int, int] = {}  # bucket k holds the numbers from (gamma^(k-1), gamma^k]
+
+    def add(self, values: npt.NDArray[np.int64]) -> None:
+        """Adds numbers to the sketch"""
+        positive = values[values > 0]
+        self.count += len(values)
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(self._keys(positive), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = count + self.buckets.get(key, 0)
+
+    def _keys(self, values: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+        """Gets the buckets of positive numbers"""
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Adds the numbers of another sketch with the same accuracy to this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same accuracy can be merged")
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = count + self.buckets.get(key, 0)
+
+    def quantile(self, q: float) -> float:
+        """Gets a quantile of the numbers
+
+        :param q: the quantile, from 0 to 1 (e.g. 0.5 for the median)
+        :return: the approximate quantile, 0 if the sketch is empty
+        """
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self._gamma**key / (self._gamma + 1)
+        return 0
+
+    @classmethod
+    def grouped(
+        cls, groups: npt.NDArray[np.int64], values: npt.NDArray[np.int64], relative_accuracy: float = 0.01
+    ) -> dict[int, QuantileSketch]:
+        """Creates the sketches of the numbers of several groups at once. The numbers of all the groups are counted
+        in one pass over pairs of a group and a bucket, which is much faster than adding them group by group.
+
+        :param groups: group of each number, non-negative
+        :param values: the numbers
+        :param relative_accuracy: maximum relative error of the quantiles
+        :return: dict with the sketch of each group that has any numbers
+        """
+        sketches: dict[int, QuantileSketch] = {}
+        if len(values) == 0:
+            return sketches
+
+        # bucket 0 counts the zeros, the buckets of the positive numbers start from 1
+        keys = np.zeros(len(values), dtype=np.int64)
+        positive = values > 0
+        positive_keys = cls(relative_accuracy)._keys(values[positive])
+        shift = int(positive_keys.min()) - 1 if len(positive_keys) else 0
+        keys[positive] = positive_keys - shift
+        width = int(keys.max()) + 1
+
+        # dense counts when there aren't many more pairs than numbers, otherwise sort them
+        pairs = groups.astype(np.int64) * width + keys
+        size = int(pairs.max()) + 1
+        if size <= 4 * len(pairs):
+            counts = np.bincount(pairs, minlength=size)
+            pairs = np.flatnonzero(counts)
+            counts = counts[pairs]
+        else:
+            pairs, counts = np.unique(pairs, return_counts=True)
+
+        pair_groups = pairs // width
+        starts = np.flatnonzero(np.r_[True, np.diff(pair_groups) != 0])
+        ends = np.r_[starts[1:], len(pairs)]
+        totals = np.add.reduceat(counts, starts)
+        zeros = pairs[starts] % width == 0
+
+        # slicing lists is much faster than splitting the arrays for many small groups
+        all_keys, all_counts = (pairs % width + shift).tolist(), counts.tolist()
+        for group, start, end, total, has_zeros in zip(
+            pair_groups[starts].tolist(), starts.tolist(), ends.tolist(), totals.tolist(), zeros.tolist()
+        ):
+            sketch = sketches[group] = cls(relative_accuracy)
+            sketch.count = total
+            if has_zeros:
+                sketch.zeros = all_counts[start]
+                start += 1
+            sketch.buckets = dict(zip(all_keys[start:end], all_counts[start:end]))
+        return sketches
+
+
+class HeavyHitters:
+    """Most frequent items of a stream in a fixed amount of memory (Misra-Gries summary, the mergeable counterpart
+    of Space-Saving). The items are counted exactly until there are too many different ones, then the counts
+    are decreased by the count of the (capacity + 1)-th most frequent item and the items that drop to zero are
+    forgotten. Every count is thus at most the total decrease (error) below the real one, which is at most
+    the number of the items divided by the capacity, so the frequent items are never lost."""
+
+    def __init__(self, capacity: int = 200) -> None:
+        """
+        :param capacity: number of the items whose counts are kept, at most twice as many are kept at a time
+        """
+        self.capacity = capacity
+        self.counts: Counter[str] = Counter()
+        self.error = 0
+
+    def add(self, counts: Mapping[str, int]) -> None:
+        """Adds a batch of items, counting them first is much faster than adding them one by one
+
+        :param counts: numbers of the occurrences of the items
+        """
+        self.counts.update(counts)
+        # decreasing the counts takes a while, so they're left to grow to twice the capacity first
+        if len(self.counts) > 2 * self.capacity:
+            self._decrease()
+
+    def merge(self, other: HeavyHitters) -> None:
+        """Adds the items of another summary to this one"""
+        self.error += other.error
+        self.add(other.counts)
+
+    def top(self, n: int) -> list[tuple[str, int]]:
+        """Gets the most frequent items
+
+        :param n: number of the items
+        :return: the items with their counts, from the most frequent one (in alphabetical order if they're
+                 equally frequent). The counts are lower bounds, the real ones are higher by at most the error.
+        """
+        return heapq.nsmallest(n, self.counts.items(), key=lambda i: (-i[1], i[0]))
+
+    def _decrease(self) -> None:
+        threshold = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.counts = Counter({item: count - threshold for item, count in self.counts.items() if count > threshold})
+        self.error += threshold
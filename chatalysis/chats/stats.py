@@ -1,9 +1,18 @@
+from __future__ import annotations
 import abc
 from collections import namedtuple
 from dataclasses import dataclass
 from datetime import date
 from enum import Enum, auto
-from typing import Any
+from typing import Any, NamedTuple, TYPE_CHECKING
+
+from chats.message_lengths import MessageLengths
+from chats.message_table import MessageTable
+
+if TYPE_CHECKING:
+    from chats.reply_times import ReplyTimes
+    from chats.sessions import Sessions
+    from chats.vocabulary import Vocabulary
 
 Times = namedtuple("Times", ["hours", "days", "weekdays", "months", "years"])
 
@@ -20,6 +29,16 @@ class SourceType(Enum):
     WHATSAPP = auto()
 
 
+class ChatSummary(NamedTuple):
+    """Basic info about a chat that can be obtained without processing its messages"""
+
+    title: str
+    chat_type: StatsType
+    messages: int  # number of messages
+    first_timestamp: int | None  # timestamps in ms, None if there are no messages in the chat
+    last_timestamp: int | None
+
+
 @dataclass(frozen=True)
 class Stats(abc.ABC):
     # fmt: off
@@ -42,24 +61,33 @@ class Stats(abc.ABC):
     group_names:    list[dict[str, Any]] | None
     stats_type:     StatsType
     source_type:    SourceType
-    # avg_message_lengths: dict[Any, Any]
-    # longest_message: dict[Any, Any]
+    members:        list[dict[str, Any]] | None = None  # members added to / removed from / leaving a group chat
+    calls:          dict[str, int] | None = None  # numbers of calls started in total and by each participant
+    lengths:        dict[str, MessageLengths] | None = None  # lengths of the text messages of each participant
+    replies:        dict[str, ReplyTimes] | None = None  # times in which each participant replied to the others
+    sessions:       Sessions | None = None  # sessions of the chat
+    vocabulary:     dict[str, Vocabulary] | None = None  # the most frequent words of each participant
     # fmt: on
 
 
 class FacebookStats(Stats):
     """Facebook Messenger / Instagram stats"""
-    messages: list[Any]
+
+    messages: MessageTable | None  # None if the chat was processed in the streaming mode
 
     def first_message(self) -> Any:
-        author = self.messages[0]["sender_name"]
+        if self.messages is None:
+            raise ValueError("Messages are not kept for chats processed in the streaming mode")
+
+        senders = self.messages.senders
+        author = senders[0]
         texts = {}
         i = 0
         while True:
-            if self.messages[i]["sender_name"] == author:
-                texts[self.messages[i]["sender_name"]] = self.messages[i]["content"]
+            name = self.messages.names[senders[i]]
+            texts[name] = self.messages.text(i)
+            if senders[i] == author:
                 i += 1
             else:
-                texts[self.messages[i]["sender_name"]] = self.messages[i]["content"]
                 break
         return texts
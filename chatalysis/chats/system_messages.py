@@ -0,0 +1,128 @@
+from __future__ import annotations
+from enum import Enum, auto
+from typing import NamedTuple, Sequence
+
+import regex
+
+
+class SystemEvent(Enum):
+    NICKNAME = auto()  # nickname of someone else
+    YOUR_NICKNAME = auto()  # nickname of the user
+    OWN_NICKNAME = auto()  # nickname of the person who set it
+    GROUP_NAME = auto()
+    MEMBER_ADDED = auto()
+    MEMBER_REMOVED = auto()
+    MEMBER_LEFT = auto()
+    CALL = auto()
+    CALL_ENDED = auto()
+
+
+# System messages in the supported export languages. Each pattern is the text that follows the name of the person
+# who did the action (without the final period), it has to start with a literal phrase, which is used to filter out
+# ordinary messages without running the patterns. The captured groups are "target" and "nickname" for nicknames,
+# "group_name" for group names and "member" for added and removed members.
+SYSTEM_MESSAGES: dict[str, list[tuple[SystemEvent, str]]] = {
+    "en": [
+        (SystemEvent.NICKNAME, r"set the nickname for (?P<target>.+?) to (?P<nickname>.+)"),
+        (SystemEvent.YOUR_NICKNAME, r"set your nickname to (?P<nickname>.+)"),
+        (SystemEvent.OWN_NICKNAME, r"set (?:his|her|their) own nickname to (?P<nickname>.+)"),
+        (SystemEvent.GROUP_NAME, r"named the group (?P<group_name>.*)"),
+        (SystemEvent.MEMBER_ADDED, r"added (?P<member>.+) to the group"),
+        (SystemEvent.MEMBER_REMOVED, r"removed (?P<member>.+) from the group"),
+        (SystemEvent.MEMBER_LEFT, r"left the group"),
+        (SystemEvent.CALL, r"started (?:a|a video) call"),
+    ],
+    "cs": [
+        (SystemEvent.NICKNAME, r"nastavila? přezdívku uživatele (?P<target>.+?) na (?P<nickname>.+)"),
+        (SystemEvent.YOUR_NICKNAME, r"nastavila? vaši přezdívku na (?P<nickname>.+)"),
+        (SystemEvent.OWN_NICKNAME, r"nastavila? svou přezdívku na (?P<nickname>.+)"),
+        (SystemEvent.GROUP_NAME, r"pojmenovala? skupinu (?P<group_name>.*)"),
+        (SystemEvent.MEMBER_ADDED, r"přidala? uživatele (?P<member>.+) do skupiny"),
+        (SystemEvent.MEMBER_REMOVED, r"odebrala? uživatele (?P<member>.+) ze skupiny"),
+        (SystemEvent.MEMBER_LEFT, r"opustila? skupinu"),
+        (SystemEvent.MEMBER_LEFT, r"odešel ze skupiny"),
+        (SystemEvent.MEMBER_LEFT, r"odešla ze skupiny"),
+        (SystemEvent.CALL, r"zahájila? (?:hovor|videohovor)"),
+    ],
+}
+
+# system messages without the name of anyone in them
+SYSTEM_MESSAGES_WITHOUT_ACTOR = {
+    "The call ended.": SystemEvent.CALL_ENDED,
+    "The video call ended.": SystemEvent.CALL_ENDED,
+    "Hovor skončil.": SystemEvent.CALL_ENDED,
+    "Videohovor skončil.": SystemEvent.CALL_ENDED,
+}
+
+# the content of the system messages about the user's own actions can start with this instead of the user's name
+YOU = "You "
+
+_LITERAL_PREFIX = regex.compile(r"^[^\\()\[\]?*+.|{}^$]*")
+
+
+class SystemMessage(NamedTuple):
+    event: SystemEvent
+    groups: dict[str, str]  # the captured parts of the message (see SYSTEM_MESSAGES)
+
+
+class SystemMessageClassifier:
+    """Recognizes the system messages of Messenger (nickname changes, group renames...), which are exported
+    as ordinary messages of the person who did the action. Almost all messages are rejected by comparing their
+    beginning with the sender's name and with the literal phrases of the system messages, only the remaining ones
+    are matched with a single regex combining the patterns of all languages, which is compiled only once."""
+
+    def __init__(self, languages: list[str] | None = None) -> None:
+        """
+        :param languages: codes of the languages of the system messages to recognize, all if None
+        """
+        patterns = [p for lang in languages or list(SYSTEM_MESSAGES) for p in SYSTEM_MESSAGES[lang]]
+        # the literal prefixes of the optional letters (e.g. "nastavila?") end before the optional letter
+        self._prefixes = tuple({_literal_prefix(pattern) for _, pattern in patterns})
+        self._events = [event for event, _ in patterns]
+        alternatives = "|".join(f"(?P<_{i}>{pattern})" for i, (_, pattern) in enumerate(patterns))
+        self._matcher = regex.compile(f"(?:{alternatives})\\.")
+
+    def classify(self, text: str, sender: str, participants: Sequence[str] = ()) -> SystemMessage | None:
+        """Recognizes a system message
+
+        :param text: content of the message
+        :param sender: name of the sender of the message
+        :param participants: names of the chat participants, the target of a nickname is one of them if possible
+                             (both the target and the nickname can contain the word separating them)
+        :return: the recognized system message or None for ordinary messages
+        """
+        if text.startswith(sender) and text[len(sender) : len(sender) + 1] == " ":
+            rest = text[len(sender) + 1 :]
+        elif text.startswith(YOU):
+            rest = text[len(YOU) :]
+        else:
+            event = SYSTEM_MESSAGES_WITHOUT_ACTOR.get(text)
+            return SystemMessage(event, {}) if event else None
+
+        if not rest.startswith(self._prefixes):
+            return None
+        match = self._matcher.fullmatch(rest)
+        if match is None:
+            return None
+
+        all_groups = match.groupdict()
+        i = next(i for i in range(len(self._events)) if all_groups[f"_{i}"] is not None)
+        groups = {k: v for k, v in all_groups.items() if v is not None and not k.startswith("_")}
+
+        if "target" in groups:
+            separator = rest[match.end("target") : match.start("nickname")]
+            combined = rest[match.start("target") : match.end("nickname")]
+            target = next((p for p in participants if combined.startswith(f"{p}{separator}")), None)
+            if target is not None:
+                groups.update(target=target, nickname=combined[len(target) + len(separator) :])
+
+        return SystemMessage(self._events[i], groups)
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Gets the literal text at the beginning of a pattern (e.g. "set " for "set (?:his|her) own")"""
+    match = _LITERAL_PREFIX.match(pattern)
+    assert match is not None and match[0]
+    prefix = match[0]
+    # a letter followed by "?" is optional
+    return prefix[:-1] if pattern[len(prefix) : len(prefix) + 1] == "?" else prefix
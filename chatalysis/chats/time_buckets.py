@@ -0,0 +1,316 @@
+from __future__ import annotations
+import time
+import zlib
+from datetime import date, datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Mapping, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import numpy.typing as npt
+
+from chats.message_table import MessageKind
+from chats.stats import Times
+
+DAY = 86400  # seconds in a day
+EPOCH = date(1970, 1, 1)
+SAMPLE_STEP = 6 * 3600  # the UTC offset of a time zone is assumed to change at most once in this many seconds
+
+
+def load_timezone(name: str | None) -> tzinfo | None:
+    """Gets a time zone by its IANA name (e.g. "Europe/Prague")
+
+    :param name: name of the time zone, None or an empty string for the local time zone of the machine
+    :return: the time zone, None for the local time zone
+    :raises ValueError: if there is no time zone with the name
+    """
+    try:
+        return ZoneInfo(name) if name else None
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f'Unknown time zone "{name}"') from e
+
+
+def timezone_name(zone: tzinfo | None) -> str:
+    """Gets a name identifying a time zone (returned by load_timezone), e.g. in the keys of cached stats"""
+    return str(zone) if zone is not None else f"local:{'/'.join(time.tzname)}"
+
+
+def local_seconds(timestamps: npt.NDArray[np.int64], zone: tzinfo | None = None) -> npt.NDArray[np.int64]:
+    """Converts timestamps to seconds since the epoch in a time zone, i.e. shifts them by the UTC offset that was
+    valid at the time of each of them (the same as datetime.fromtimestamp does). The offsets are looked up
+    in the tables of the times when the offset of the time zone changed (e.g. to the daylight saving time),
+    which are computed once for every year.
+
+    :param timestamps: timestamps in ms
+    :param zone: the time zone, the local time zone of the machine if None
+    :return: local time in seconds
+    """
+    seconds = timestamps // 1000
+    if not len(seconds):
+        return seconds
+
+    first_year = (EPOCH + timedelta(days=int(seconds.min()) // DAY)).year
+    last_year = (EPOCH + timedelta(days=int(seconds.max()) // DAY)).year
+    # the local time zone can be changed while the program runs (time.tzset)
+    local_names = tuple(time.tzname) if zone is None else None
+    tables = [_offset_changes(zone, local_names, year) for year in range(first_year, last_year + 1)]
+    starts = np.concatenate([t[0] for t in tables])
+    offsets = np.concatenate([t[1] for t in tables])
+    return seconds + offsets[np.searchsorted(starts, seconds, side="right") - 1]
+
+
+@lru_cache(maxsize=None)
+def _offset_changes(
+    zone: tzinfo | None, local_names: tuple[str, ...] | None, year: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Finds the changes of the UTC offset of a time zone during a (UTC) year. The offset is sampled regularly,
+    the exact second of every change is then found by bisection.
+
+    :param zone: the time zone, the local time zone of the machine if None
+    :param local_names: names of the local time zone (time.tzname) if zone is None, only for the cache
+    :param year: the year
+    :return: times when the offsets start to be valid (the first is the start of the year) and the offsets
+    """
+    start = (date(year, 1, 1) - EPOCH).days * DAY
+    end = (date(year + 1, 1, 1) - EPOCH).days * DAY
+    starts = [start]
+    offsets = [_utc_offset(zone, start)]
+    previous = start
+    for sample in range(start + SAMPLE_STEP, end + SAMPLE_STEP, SAMPLE_STEP):
+        sample = min(sample, end - 1)
+        if _utc_offset(zone, sample) == offsets[-1]:
+            previous = sample
+            continue
+        low, high = previous, sample  # the offset changes after low, at high at the latest
+        while high - low > 1:
+            middle = (low + high) // 2
+            if _utc_offset(zone, middle) == offsets[-1]:
+                low = middle
+            else:
+                high = middle
+        starts.append(high)
+        offsets.append(_utc_offset(zone, high))
+        previous = sample
+    return np.array(starts, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def _utc_offset(zone: tzinfo | None, second: int) -> int:
+    """Gets the UTC offset of a time zone in seconds at a time (in seconds since the epoch)"""
+    if zone is None:
+        return time.localtime(second).tm_gmtoff
+    offset = datetime.fromtimestamp(second, zone).utcoffset()
+    return int(offset.total_seconds()) if offset is not None else 0
+
+
+class Calendar(Mapping[str, int]):
+    """Numbers of messages per day, from the day of the first message to the day of the last one, in arrays
+    indexed by the number of days since the first day. Besides the total, it can hold the numbers of messages
+    of each participant and of each kind of message. Their prefix sums and the weekly, monthly and yearly totals
+    are computed once, so the number of messages in any range of days is a difference of two prefix sums.
+
+    The calendar is also a read-only mapping of the ISO dates of all the days (including those without messages)
+    to the total numbers of messages, like a dict."""
+
+    def __init__(
+        self,
+        from_day: date,
+        counts: npt.NDArray[np.int64],
+        people: Mapping[str, npt.NDArray[np.int64]] | None = None,
+        kinds: Mapping[str, npt.NDArray[np.int64]] | None = None,
+    ) -> None:
+        """
+        :param from_day: the first day
+        :param counts: total numbers of messages per day
+        :param people: numbers of messages per day of each participant, of the same length as counts
+        :param kinds: numbers of messages per day of each kind of message (e.g. "photos")
+        """
+        self.from_day = from_day
+        self.people = list(people or {})
+        self.kinds = list(kinds or {})
+        # rows of the prefix sums of the participants and of the kinds, the first row is the total
+        self._rows = {("person", p): i for i, p in enumerate(self.people, 1)}
+        self._rows.update({("kind", k): i for i, k in enumerate(self.kinds, 1 + len(self.people))})
+        series = [counts, *(people or {}).values(), *(kinds or {}).values()]
+        self._prefix = np.zeros((len(series), len(counts) + 1), dtype=np.int64)
+        np.cumsum(np.vstack(series), axis=1, out=self._prefix[:, 1:])
+
+        # the weeks start on Monday and are identified by it (the epoch was on Thursday), the months and years
+        # are named as in Times
+        first = (from_day - EPOCH).days
+        days = np.arange(first, first + len(counts))
+        weeks = (days + 3) // 7
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        years = months // 12
+        self.weeks = self._rollup(weeks, lambda w: str(EPOCH + timedelta(days=7 * w - 3)))
+        self.months = self._rollup(months, lambda m: f"{m % 12 + 1}/{m // 12 + 1970}")
+        self.years = self._rollup(years, lambda y: str(y + 1970))
+
+    def __getstate__(self) -> dict[str, Any]:
+        # the numbers of messages of the participants are mostly zeros, they're stored compressed
+        state = self.__dict__.copy()
+        state["_prefix"] = self._prefix.shape, zlib.compress(np.diff(self._prefix).astype(np.int32).tobytes(), 1)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        shape, counts = state["_prefix"]
+        prefix = np.zeros(shape, dtype=np.int64)
+        np.cumsum(
+            np.frombuffer(zlib.decompress(counts), dtype=np.int32).reshape(shape[0], -1), axis=1, out=prefix[:, 1:]
+        )
+        self.__dict__.update(state, _prefix=prefix)
+
+    def __repr__(self) -> str:
+        return f"Calendar({self.from_day} - {self.to_day}, {self.count()} messages)"
+
+    @property
+    def to_day(self) -> date:
+        return self.from_day + timedelta(days=len(self) - 1)
+
+    def __len__(self) -> int:
+        return self._prefix.shape[1] - 1
+
+    def __iter__(self) -> Iterator[str]:
+        first = (self.from_day - EPOCH).days
+        return iter(np.arange(first, first + len(self)).astype("datetime64[D]").astype(str).tolist())
+
+    def __getitem__(self, day: str) -> int:
+        offset = (date.fromisoformat(day) - self.from_day).days
+        if not 0 <= offset < len(self):
+            raise KeyError(day)
+        return int(self._prefix[0, offset + 1] - self._prefix[0, offset])
+
+    def count(
+        self, start: date | None = None, end: date | None = None, person: str | None = None, kind: str | None = None
+    ) -> int:
+        """Gets the number of messages in a range of days
+
+        :param start: the first day of the range, None for the day of the first message
+        :param end: the last day of the range (included), None for the day of the last message
+        :param person: counts only the messages of this participant if not None
+        :param kind: counts only the messages of this kind if not None, can't be combined with person
+        :return: the number of messages
+        """
+        row = self._row(person, kind)
+        low = 0 if start is None else min(max((start - self.from_day).days, 0), len(self))
+        high = len(self) if end is None else min(max((end - self.from_day).days + 1, 0), len(self))
+        if row is None or high <= low:
+            return 0
+        return int(self._prefix[row, high] - self._prefix[row, low])
+
+    def counts(self, person: str | None = None, kind: str | None = None) -> npt.NDArray[np.int64]:
+        """Gets the numbers of messages per day, see count"""
+        row = self._row(person, kind)
+        return np.diff(self._prefix[row]) if row is not None else np.zeros(len(self), dtype=np.int64)
+
+    def _row(self, person: str | None, kind: str | None) -> int | None:
+        """Gets the row of the prefix sums of a participant or a kind of message, None if there aren't any"""
+        if person is not None and kind is not None:
+            raise ValueError("The messages can't be counted by both the participant and the kind")
+        if person is not None:
+            return self._rows.get(("person", person))
+        if kind is not None:
+            return self._rows.get(("kind", kind))
+        return 0
+
+    def _rollup(self, periods: npt.NDArray[np.int64], name: Callable[[int], str]) -> dict[str, int]:
+        """Sums the total numbers of messages of the periods (weeks, months...) with any messages
+
+        :param periods: sorted number of the period of each day
+        :param name: function naming a period by its number
+        :return: dict of the names of the periods with the numbers of their messages
+        """
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        ends = np.r_[starts[1:], len(periods)]
+        sums = (self._prefix[0, ends] - self._prefix[0, starts]).tolist()
+        return {name(period): count for period, count in zip(periods[starts].tolist(), sums) if count}
+
+    @classmethod
+    def merge(cls, calendars: Sequence[Calendar]) -> Calendar:
+        """Merges the calendars of several sets of messages into one
+
+        :param calendars: non-empty list of the calendars
+        :return: the merged calendar
+        """
+        from_day = min(c.from_day for c in calendars)
+        length = (max(c.to_day for c in calendars) - from_day).days + 1
+        counts = np.zeros(length, dtype=np.int64)
+        people: dict[str, npt.NDArray[np.int64]] = {}
+        kinds: dict[str, npt.NDArray[np.int64]] = {}
+        for calendar in calendars:
+            days = slice((calendar.from_day - from_day).days, (calendar.to_day - from_day).days + 1)
+            counts[days] += calendar.counts()
+            for person in calendar.people:
+                people.setdefault(person, np.zeros(length, dtype=np.int64))[days] += calendar.counts(person=person)
+            for kind in calendar.kinds:
+                kinds.setdefault(kind, np.zeros(length, dtype=np.int64))[days] += calendar.counts(kind=kind)
+        return cls(from_day, counts, people, kinds)
+
+
+def count_times(
+    timestamps: npt.NDArray[np.int64],
+    zone: tzinfo | None = None,
+    senders: npt.NDArray[np.int32] | None = None,
+    names: Sequence[str | None] = (),
+    kinds: npt.NDArray[np.uint8] | None = None,
+) -> tuple[Times, date, date]:
+    """Counts the messages per hour, day, weekday, month and year in the local time zone. The days are counted
+    in a Calendar with all days from the first message to the last one, the months and years contain only those
+    with messages, all of them in chronological order. The weekdays are in the order of their first appearance
+    in the timestamps.
+
+    :param timestamps: non-empty array of timestamps in ms, in any order
+    :param zone: the time zone, the local time zone of the machine if None
+    :param senders: IDs of the senders of the messages (indices to names), to count the messages of each
+                    participant per day in the calendar
+    :param names: names of the senders, None for the senders who aren't counted
+    :param kinds: kinds of the messages, to count the messages of each kind per day in the calendar
+    :return: times - numbers of messages in time
+             from_day - day of the first message
+             to_day - day of the last message
+    """
+    local = local_seconds(timestamps, zone)
+    days = local // DAY
+    first_day = int(days.min())
+    from_day = EPOCH + timedelta(days=first_day)
+    day_counts = np.bincount(days - first_day)
+    to_day = from_day + timedelta(days=len(day_counts) - 1)
+
+    hours = dict(enumerate(np.bincount(local % DAY // 3600, minlength=24).tolist()))
+    people = {}
+    if senders is not None:
+        people = _count_per_day(days - first_day, senders, names, len(day_counts))
+    kind_counts = {}
+    if kinds is not None:
+        kind_counts = _count_per_day(days - first_day, kinds, [k.name.lower() for k in MessageKind], len(day_counts))
+    calendar = Calendar(from_day, day_counts, people, kind_counts)
+
+    # ISO weekdays (1 is Monday), the epoch was on Thursday
+    weekdays = (days + 3) % 7 + 1
+    weekday_counts = np.bincount(weekdays, minlength=8)
+    present, first_rows = np.unique(weekdays, return_index=True)
+    weekdays_dict = {int(w): int(weekday_counts[w]) for w in present[np.argsort(first_rows)]}
+
+    return Times(hours, calendar, weekdays_dict, calendar.months, calendar.years), from_day, to_day
+
+
+def _count_per_day(
+    days: npt.NDArray[np.int64], groups: npt.NDArray[np.integer[Any]], names: Sequence[str | None], length: int
+) -> dict[str, npt.NDArray[np.int64]]:
+    """Counts the messages of each group (sender, kind of message) per day
+
+    :param days: day of each message, the number of days since the first day
+    :param groups: group of each message, indices to names
+    :param names: names of the groups, the groups named None are left out, as are the groups without messages
+    :param length: number of the days
+    :return: dict of the names of the groups with the numbers of their messages per day
+    """
+    counts = np.bincount(groups.astype(np.int64) * length + days, minlength=len(names) * length)
+    per_group = counts.reshape(len(names), length)
+    present = np.flatnonzero(per_group.any(axis=1)).tolist()
+    result: dict[str, npt.NDArray[np.int64]] = {}
+    for group in present:
+        name = names[group]
+        if name is not None:
+            # interned names can repeat (e.g. in the merged tables), their messages are added up
+            result[name] = result[name] + per_group[group] if name in result else per_group[group]
+    return result
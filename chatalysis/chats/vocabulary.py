@@ -0,0 +1,63 @@
+from __future__ import annotations
+import re
+from collections import Counter
+
+from chats.sketches import HeavyHitters
+
+# shorter words (mostly articles, prepositions and pronouns) are left out
+MIN_WORD_LENGTH = 3
+# number of the words and of the pairs of words whose counts are kept for each person
+VOCABULARY_CAPACITY = 200
+
+# the messages are split into words in batches, joined by a separator that is also matched (as a short "word"),
+# so that the phrases don't span two messages
+_SEPARATOR = "\0"
+_WORD_REGEX = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*|\0")
+_LINK_REGEX = re.compile(r"[^\s\0]+://[^\s\0]+")
+
+
+class Vocabulary:
+    """The most frequent words and pairs of consecutive words (phrases) of a person, see HeavyHitters.
+    The words are compared in lowercase, the numbers and the links are left out."""
+
+    def __init__(self, capacity: int = VOCABULARY_CAPACITY, batch: int = 1000) -> None:
+        """
+        :param capacity: number of the words and of the phrases whose counts are kept
+        :param batch: number of the messages that are split into words together
+        """
+        self.words = HeavyHitters(capacity)
+        self.phrases = HeavyHitters(capacity)
+        self.batch = batch
+        self._texts: list[str] = []
+
+    def add_text(self, text: str) -> None:
+        """Adds the words of a message"""
+        self._texts.append(text)
+        if len(self._texts) >= self.batch:
+            self._split_texts()
+
+    def flush(self) -> None:
+        """Counts the words of the messages added since the last flush"""
+        self._split_texts()
+
+    def merge(self, other: Vocabulary) -> None:
+        """Adds the words of another vocabulary to this one"""
+        other.flush()
+        self.words.merge(other.words)
+        self.phrases.merge(other.phrases)
+
+    def _split_texts(self) -> None:
+        if not self._texts:
+            return
+        text = _SEPARATOR.join(self._texts).lower()
+        self._texts.clear()
+        if "://" in text:
+            text = _LINK_REGEX.sub(" ", text)
+
+        tokens = _WORD_REGEX.findall(text)
+        words = Counter(tokens)
+        self.words.add({w: c for w, c in words.items() if len(w) >= MIN_WORD_LENGTH})
+        pairs = Counter(zip(tokens, tokens[1:]))
+        self.phrases.add(
+            {f"{a} {b}": c for (a, b), c in pairs.items() if len(a) >= MIN_WORD_LENGTH and len(b) >= MIN_WORD_LENGTH}
+        )
@@ -7,6 +7,7 @@ from typing import Any, Optional, Type
 from pathlib import Path
 
 from paths import HOME
+from sources.facebook_source import FacebookSource
 from sources.message_source import MessageSource
 from sources.instagram import Instagram
 from sources.messenger import Messenger
@@ -14,6 +15,7 @@ from sources.whatsapp import WhatsApp
 from utils.utility import is_latest_version, download_latest
 from gui.window_top_ten import WindowTopTen
 from gui.window_individual import WindowIndividual
+from gui.window_search import WindowSearch
 from gui.gui_utils import show_error
 
 
@@ -36,6 +38,7 @@ class MainGUI(tk.Tk):
 
         self.window_top_ten: Optional[WindowTopTen] = None
         self.window_individual: Optional[WindowIndividual] = None
+        self.window_search: Optional[WindowSearch] = None
 
         self._ui_elements: list[tk.BaseWidget] = []
         self._create_source_selection()
@@ -98,11 +101,14 @@ class MainGUI(tk.Tk):
 
         # Configure grids & columns
         self.grid_columnconfigure(0, weight=1)
-        for i in range(2, 7):
+        for i in range(2, 8):
             self.grid_rowconfigure(i, weight=1)
 
         # Create buttons
         self.button_select_dir = ttk.Button(self, text="Select folder", command=lambda: self.select_dir(source_class))
+        self.button_select_zip = ttk.Button(
+            self, text="Select zip files", command=lambda: self.select_archives(source_class)
+        )
         self.button1 = ttk.Button(
             self, text="Show top conversations", command=lambda: self._try_create_window("top_ten")
         )
@@ -110,11 +116,15 @@ class MainGUI(tk.Tk):
             self, text="Analyze individual conversations", command=lambda: self._try_create_window("individual")
         )
         self.button3 = ttk.Button(self, text="Show your overall personal stats", command=self.show_personal)
+        # only the Facebook sources, which have several chats, can be searched
+        searchable = issubclass(source_class, FacebookSource)
+        if searchable:
+            self.button4 = ttk.Button(self, text="Search messages", command=self.show_search)
         self.button_back = ttk.Button(self, text="Back", command=lambda: self._create_source_selection())
 
         # Create labels
         self.label_under = tk.Label(self, text="", wraplength=650)
-        self.label_select_dir = ttk.Label(self, text="Please select folder with the messages:")
+        self.label_select_dir = ttk.Label(self, text="Please select folder or zip files with the messages:")
 
         # Create entry widgets
         self.data_dir_path_tk = tk.StringVar()
@@ -126,17 +136,21 @@ class MainGUI(tk.Tk):
 
         # Render objects onto a grid
         self.label_select_dir.grid(column=0, row=0, pady=5)
-        self.button_select_dir.grid(column=0, row=1)
+        self.button_select_dir.grid(column=0, row=1, padx=(0, 130))
+        self.button_select_zip.grid(column=0, row=1, padx=(130, 0))
         self.entry_data_dir.grid(column=0, row=2)
         self.button1.grid(column=0, row=3, sticky="S")
         self.button2.grid(column=0, row=4)
-        self.button3.grid(column=0, row=5, sticky="N")
-        self.button_back.grid(column=0, row=6, padx=(610, 15))
-        self.label_under.grid(column=0, row=6, pady=5)
+        self.button3.grid(column=0, row=5)
+        if searchable:
+            self.button4.grid(column=0, row=6, sticky="N")
+        self.button_back.grid(column=0, row=7, padx=(610, 15))
+        self.label_under.grid(column=0, row=7, pady=5)
 
         self._ui_elements = [
             self.label_select_dir,
             self.button_select_dir,
+            self.button_select_zip,
             self.entry_data_dir,
             self.button1,
             self.button2,
@@ -145,6 +159,8 @@ class MainGUI(tk.Tk):
             self.label_under,
             self.progress_bar,
         ]
+        if searchable:
+            self._ui_elements.append(self.button4)
 
     def _create_whatsapp_menu(self, source_class: Type[MessageSource] = WhatsApp) -> None:
         """Creates the menu for WhatsApp"""
@@ -216,6 +232,8 @@ class MainGUI(tk.Tk):
         )
         self.data_dir_path_tk.set(data_path)
         self._instantiate_message_source(data_path, source_class)
+        if not self.Program.valid_dir:
+            return
 
         self.label_under.config(text="Analyzing...", fg="black")
         self.update()
@@ -241,15 +259,41 @@ class MainGUI(tk.Tk):
         self.data_dir_path_tk.set(data_path)
         self._instantiate_message_source(data_path, source_class)
 
-    def _instantiate_message_source(self, data_path: Path | str, source_class: Type[MessageSource]) -> None:
+    def select_archives(self, source_class: Type[MessageSource]) -> None:
+        """Selects one or more zip archives with data using a dialog window. The archives are read directly,
+        without extracting them.
+
+        :param source_class: class of the selected message source
+        """
+        data_paths = filedialog.askopenfilenames(
+            filetypes=[("Zip archive", ".zip")],
+            title="Select zip files with the export",
+            initialdir=self.Program.config.load(source_class.__name__.lower(), "Source_dirs"),
+        )
+        if not data_paths:
+            return
+        self.data_dir_path_tk.set("; ".join(data_paths))
+        self._instantiate_message_source(list(data_paths), source_class)
+
+    def _instantiate_message_source(self, data_path: Path | str | list[str], source_class: Type[MessageSource]) -> None:
         """Creates an instance of the message source after the data path is selected.
 
-        :param data_path: path to the directory or file with the data
+        :param data_path: path to the directory or file with the data, or paths to zip archives with the data
         :param source_class: class of the selected message source
         """
+        try:
+            options = self.Program.source_options(source_class)
+        except ValueError as e:
+            self.entry_data_dir.config(background="#f02663")  # display directory path in red
+            self.Program.valid_dir = False
+            show_error(self, f"Sorry, the config is invalid: {e}", False)
+            return
+
+        if self.Program.source is not None:
+            self.Program.source.close()
         try:
             # create message source instance filled with data from the selected dir
-            self.Program.source = source_class(data_path)
+            self.Program.source = source_class(data_path, **options)
         except Exception as e:
             # directory is not valid (missing 'messages' folder or other issue)
             self.entry_data_dir.config(background="#f02663")  # display directory path in red
@@ -258,6 +302,8 @@ class MainGUI(tk.Tk):
             return
 
         # save last used dir
+        if isinstance(data_path, list):
+            data_path = str(Path(data_path[0]).parent)
         self.Program.config.save(source_class.__name__.lower(), data_path, "Source_dirs")
         self.Program.valid_dir = True
 
@@ -271,12 +317,13 @@ class MainGUI(tk.Tk):
             show_error(self, "Cannot analyze until a valid directory is selected", False)
             return
 
-        self.progress_bar.grid(column=0, row=6, pady=5)
+        self.progress_bar["value"] = 0
+        self.progress_bar.grid(column=0, row=7, pady=5)
 
         try:
             self.Program.personal_stats = self.Program.source.personal_stats(self)
 
-            self.progress_bar.destroy()
+            self.progress_bar.grid_remove()
             self.label_under.config(text="Done. You can find it in the output folder!", fg="green")
             self.update()
 
@@ -286,6 +333,33 @@ class MainGUI(tk.Tk):
             show_error(self, repr(e), self.Program.print_stacktrace)
             return
 
+    def show_search(self) -> None:
+        """Opens the window for searching the messages. The chats that aren't indexed yet are indexed first,
+        which can take a while, so the progress bar is displayed."""
+        if not self.Program.valid_dir or not isinstance(self.Program.source, FacebookSource):
+            # don't do anything if source directory is invalid to avoid errors
+            show_error(self, "Cannot analyze until a valid directory is selected", False)
+            return
+        if self.window_search:
+            self.window_search.lift()
+            return
+
+        self.label_under.config(text="Indexing the messages...", fg="black")
+        self.progress_bar["value"] = 0
+        self.progress_bar.grid(column=0, row=7, pady=5)
+        self.update()
+
+        try:
+            self.Program.source.search_index(self)
+        except Exception as e:
+            show_error(self, repr(e), self.Program.print_stacktrace)
+            return
+        finally:
+            self.progress_bar.grid_remove()
+            self.label_under.config(text="")
+
+        WindowSearch(self.Program, self)
+
     def _try_create_window(self, window_type: str) -> None:
         if self.Program.valid_dir:
             if window_type == "top_ten":
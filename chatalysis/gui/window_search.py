@@ -0,0 +1,100 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, TYPE_CHECKING
+import tkinter as tk
+
+from chats.search_index import SearchResult
+from gui.singleton_window import SingletonWindow
+from gui.gui_utils import show_error
+
+if TYPE_CHECKING:
+    from gui.main_gui import MainGUI
+
+
+class WindowSearch(SingletonWindow):
+    def __init__(self, program: Any, main_gui: MainGUI) -> None:
+        SingletonWindow.__init__(self)
+        self.Program = program
+        self.main_gui = main_gui
+        self.main_gui.window_search = self
+
+        self.title("Search messages")
+        self.geometry("800x450")
+
+        self.results: list[SearchResult] = []
+        self._create()
+
+    def _create(self) -> None:
+        """Creates and renders the objects in the window"""
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_rowconfigure(3, weight=1)
+
+        self.label_instructions = tk.Label(
+            self,
+            text='Please enter the words to search for, "a phrase" in quotes, from:name\n'
+            "or after:YYYY-MM-DD and before:YYYY-MM-DD (for example: cinema from:john after:2020-01-01)",
+            justify="center",
+        )
+
+        self.label_under = tk.Label(self, text="", wraplength=750, justify="center")
+
+        # Entry for entering the query, it's bound to start the search when the user hits Enter.
+        # Also sets focus on query_entry for immediate writing action.
+        self.query_entry = tk.Entry(self, width=80)
+        self.query_entry.bind("<Return>", lambda x: self.search())
+        self.query_entry.focus_set()
+
+        self.result_box: tk.Listbox = tk.Listbox(self, height=12, width=80)
+        self.result_box.bind("<<ListboxSelect>>", self._listbox_result_selected)
+
+        self.result_box_scrollbar = tk.Scrollbar(self, command=self.result_box.yview)
+        self.result_box.config(yscrollcommand=self.result_box_scrollbar.set)
+
+        self.label_instructions.grid(column=0, row=0)
+        self.query_entry.grid(column=0, row=1, pady=(5, 0))
+        self.result_box.grid(column=0, row=2, pady=0)
+        self.result_box_scrollbar.grid(column=0, row=2, sticky="NS", padx=(690, 0), pady=(2, 0))
+        self.label_under.grid(column=0, row=3, pady=5)
+
+    def search(self, _event: None | tk.Event = None) -> None:
+        """Searches the messages of all conversations and lists the results
+
+        :param _event: tkinter event
+        """
+        # the chats are indexed by the main GUI before the window is opened (see MainGUI.show_search)
+        self.label_under.config(text="Searching...", fg="black")
+        self.update()
+
+        try:
+            self.results = self.Program.source.search(self.query_entry.get())
+        except ValueError as e:
+            show_error(self, f"Sorry, the query is invalid: {e}", False)
+            self.label_under.config(text="")
+            return
+        except Exception as e:
+            show_error(self, repr(e), self.Program.print_stacktrace)
+            self.label_under.config(text="")
+            return
+
+        self.result_box.delete(0, tk.END)
+        self.result_box.insert(tk.END, *(self._format_result(r) for r in self.results))
+        found = f"Found {len(self.results)} messages" if len(self.results) < 100 else "Showing 100 newest messages"
+        self.label_under.config(text=found)
+
+    def _format_result(self, result: SearchResult) -> str:
+        time = datetime.fromtimestamp(result.timestamp / 1000, self.Program.source.timezone)
+        text = " ".join(result.text.split())
+        return f"{time:%Y-%m-%d %H:%M}  {result.title}  {result.sender}: {text}"
+
+    def _listbox_result_selected(self, *_args: Any) -> None:
+        """Shows the whole selected message with the ID of its conversation"""
+        current_selection = self.result_box.curselection()  # type: ignore
+        if not current_selection:
+            return
+        result = self.results[current_selection[0]]
+        self.label_under.config(text=f"{result.text}\n\n(conversation {result.title}, ID {result.chat_id})")
+
+    def _close(self) -> None:
+        self.main_gui.window_search = None
+        self.destroy()
@@ -1,10 +1,14 @@
 import io
-from typing import Any
+from typing import Any, Type
 
 from chats.analyzer import Analyzer
 from chats.stats import Stats
+from chats.time_buckets import load_timezone
 from gui.main_gui import MainGUI
+from sources.facebook_source import FacebookSource
+from sources.message_source import MessageSource
 from utils.utility import get_file_path, open_html
+from utils.cache import StatsCache
 from utils.config import Config
 
 
@@ -21,6 +25,54 @@ class Program:
     def run(self) -> None:
         self.gui = MainGUI(self)
         self.gui.mainloop()
+        if self.source is not None:
+            self.source.close()
+
+    def source_options(self, source_class: Type[MessageSource]) -> dict[str, Any]:
+        """Gets the keyword arguments for creating an instance of the message source from the config.
+
+        :param source_class: class of the selected message source
+        :return: dict with the keyword arguments
+        :raises ValueError: if a time zone in the config is unknown, the message says which config item it's in
+        """
+        timezones = self.config.items("Timezones")
+        source_name = source_class.__name__.lower()
+        if timezones.get(source_name):
+            timezone = self._check_timezone(timezones[source_name], f"{source_name} in [Timezones]")
+        else:
+            timezone = self._check_timezone(self.config.load("timezone", "Analysis"), "timezone in [Analysis]")
+        # the gap is in minutes in the config
+        session_gap = int(self.config.load("session_gap", "Analysis")) * 60
+
+        if issubclass(source_class, FacebookSource):
+            return {
+                "streaming": self.config.load("streaming", "Analysis", is_bool=True),
+                "workers": int(self.config.load("workers", "Analysis")),
+                "cache": StatsCache() if self.config.load("cache", "Analysis", is_bool=True) else None,
+                "incremental": self.config.load("incremental", "Analysis", is_bool=True),
+                "timezone": timezone,
+                "chat_timezones": {
+                    k.partition("/")[2]: self._check_timezone(v, f"{k} in [Timezones]")
+                    for k, v in timezones.items()
+                    if k.startswith(f"{source_name}/")
+                },
+                "session_gap": session_gap,
+            }
+        return {"timezone": timezone, "session_gap": session_gap}
+
+    @staticmethod
+    def _check_timezone(name: str, item: str) -> str:
+        """Checks that a time zone from the config exists
+
+        :param name: name of the time zone
+        :param item: description of the config item with the time zone for the error message
+        :return: the name of the time zone
+        """
+        try:
+            load_timezone(name)
+        except ValueError as e:
+            raise ValueError(f"{e} in the config item {item}, please use an IANA name such as Europe/Prague") from e
+        return name
 
     def chat_to_html(self, name: str) -> Any:
         chat = self.source.get_chat(name)
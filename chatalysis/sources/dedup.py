@@ -0,0 +1,85 @@
+from __future__ import annotations
+import hashlib
+from array import array
+from typing import Any, Hashable, Iterable, Iterator, Mapping
+
+import numpy as np
+import numpy.typing as npt
+
+# keys of the messages with lists of attached files, each of them with its own URI
+ATTACHMENT_KEYS = ("photos", "gifs", "videos", "audio_files", "files")
+
+
+def message_hash(message: dict[str, Any]) -> int:
+    """Computes a 64-bit hash identifying a message by its timestamp, sender, content and attachments. Only
+    the file names of the attachments are used, as the folders in their URIs can differ between exports.
+
+    :param message: decoded message
+    :return: signed 64-bit hash of the message
+    """
+    identity = [str(message["timestamp_ms"]), message.get("sender_name", ""), message.get("content", "")]
+    for key in ATTACHMENT_KEYS:
+        for attachment in message.get(key, ()):
+            identity.append(attachment.get("uri", "").rpartition("/")[2])
+    if "sticker" in message:
+        identity.append(message["sticker"].get("uri", "").rpartition("/")[2])
+    if "share" in message:
+        identity.append(message["share"].get("link", ""))
+
+    digest = hashlib.blake2b("\0".join(identity).encode("utf-8", "surrogateescape"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def hash_messages(messages: Iterable[dict[str, Any]], hashes: array[int]) -> Iterator[dict[str, Any]]:
+    """Passes the messages through and appends their hashes to the given array
+
+    :param messages: decoded messages
+    :param hashes: array of signed 64-bit integers ("q") for the hashes
+    :return: the same messages
+    """
+    for m in messages:
+        hashes.append(message_hash(m))
+        yield m
+
+
+class MessageDeduplicator:
+    """Finds the messages of a chat that were already read from another folder of the chat, which happens when
+    the chat is in several exports with overlapping time spans. Only the hashes of the messages are kept, in NumPy
+    arrays, so it takes 8 bytes per message.
+
+    Only the folders of different exports are compared. Identical messages in the files of one export are genuine,
+    and an export can be split into several parts (e.g. zip archives), each with some of the files of the chat
+    (message_1.json in one, message_2.json in another). The files of a chat are named in the same way in every
+    export, and one export never has two files of the same name, so the folders sharing a file name must come from
+    different exports. The folders whose files have different names can be parts of one export and aren't compared,
+    and neither are the files of the same folder."""
+
+    def __init__(self, folders: Mapping[Hashable, Iterable[str]]) -> None:
+        """
+        :param folders: names of the files with the messages in each folder of the chat
+        """
+        names = {folder: set(files) for folder, files in folders.items()}
+        # folders of other exports, whose messages can be the same
+        self._overlapping = {f: [g for g in names if g != f and not names[f].isdisjoint(names[g])] for f in names}
+        self._hashes: dict[Hashable, list[npt.NDArray[np.int64]]] = {}
+
+    @property
+    def needed(self) -> bool:
+        """Whether any of the folders can hold the same messages"""
+        return any(self._overlapping.values())
+
+    def add(self, hashes: npt.NDArray[np.int64], folder: Hashable) -> npt.NDArray[np.bool_]:
+        """Adds the hashes of the messages from a file and marks the duplicates
+
+        :param hashes: hashes of the messages in the file
+        :param folder: folder of the file, one of those given to the constructor
+        :return: mask of the messages that were already read from the folders of other exports
+        """
+        others = [h for f in self._overlapping[folder] for h in self._hashes.get(f, [])]
+        if others:
+            duplicates = np.isin(hashes, np.concatenate(others))
+        else:
+            duplicates = np.zeros(len(hashes), dtype=np.bool_)
+        # the duplicates are already stored with the other folders
+        self._hashes.setdefault(folder, []).append(hashes[~duplicates])
+        return duplicates
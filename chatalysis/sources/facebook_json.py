@@ -0,0 +1,218 @@
+from __future__ import annotations
+import json
+import re
+from typing import Any, IO, Iterator
+
+CHUNK_SIZE = 1 << 20  # number of characters read from the file at once
+HEADER_CHUNK_SIZE = 1 << 14  # the members before "messages" are small, so a smaller chunk is enough to get them
+
+_WHITESPACE = " \t\n\r"
+
+# a value that fails to decode this close to the end of the buffer may be a number, a literal (e.g. "true")
+# or an escape cut off by the end of the chunk, so it can be decoded once more data is read
+_MAX_CUT_OFF_TOKEN = 32
+
+# Facebook writes every byte of non-ASCII UTF-8 characters as a separate escape (e.g. "\u00c5\u00a0" for "Š").
+# A run of such escapes is matched only if its backslash isn't escaped itself, i.e. if it's preceded by an even
+# number of backslashes (which are kept in the first group).
+_ESCAPED_BYTES = re.compile(r"(?<!\\)((?:\\\\)*)((?:\\u00[89a-fA-F][0-9a-fA-F])+)")
+_ESCAPE = re.compile(r"\\u00[0-9a-fA-F]{2}")
+_PARTIAL_ESCAPE = re.compile(r"\\(?:u(?:0(?:0[0-9a-fA-F]?)?)?)?")
+
+
+def decode_escaped_bytes(text: str) -> str:
+    """Decodes the UTF-8 bytes escaped as "\\u00XX" in the raw JSON text of a Facebook export into the actual
+    characters, so that the strings come out of the JSON parser already decoded. Runs of escapes that aren't
+    valid UTF-8 are left as they are.
+
+    :param text: raw JSON text
+    :return: JSON text with the escaped bytes decoded
+    """
+
+    def decode_run(match: re.Match[str]) -> str:
+        try:
+            return match[1] + match[2].encode("ascii").decode("unicode_escape").encode("latin-1").decode("utf-8")
+        except UnicodeDecodeError:
+            return match[0]
+
+    return _ESCAPED_BYTES.sub(decode_run, text)
+
+
+def _unfinished_tail(text: str) -> int:
+    """Finds where the possibly unfinished run of escapes at the end of a chunk of JSON text begins. The run may
+    continue in the next chunk (possibly in the middle of an escape or of a UTF-8 sequence), so it has to be
+    decoded together with it. The backslashes preceding the run are included as they decide whether it's escaped.
+
+    :param text: chunk of JSON text
+    :return: position of the beginning of the tail
+    """
+    pos = len(text)
+    start = text.rfind("\\", max(0, pos - 5))
+    if start != -1 and _PARTIAL_ESCAPE.fullmatch(text, start):
+        pos = start
+    while pos >= 6 and _ESCAPE.fullmatch(text, pos - 6, pos):
+        pos -= 6
+    while pos > 0 and text[pos - 1] == "\\":
+        pos -= 1
+    return pos
+
+
+def load(file: IO[str]) -> Any:
+    """Loads a whole JSON file from a Facebook export with the escaped bytes decoded
+
+    :param file: opened JSON file
+    :return: the decoded JSON
+    """
+    return json.loads(decode_escaped_bytes(file.read()))
+
+
+class MessageFileReader:
+    """Incremental parser of a single message_N.json file from a Facebook / Instagram export.
+
+    The file is a JSON object whose "messages" member is a (potentially huge) array of messages. The reader
+    parses the file in chunks and yields the messages one at a time, so at most one chunk of the file and a single
+    message are kept in memory. All the other top-level members (participants, title, ...) are decoded whole
+    and stored in the `members` dict as they are encountered. In the Facebook exports, "participants" precede
+    "messages", so they are available right after the reader is created, while "title" follows the messages
+    and is available only after all messages have been read. The escaped bytes are decoded as the chunks are read
+    (see decode_escaped_bytes).
+    """
+
+    def __init__(self, file: IO[str], chunk_size: int = CHUNK_SIZE) -> None:
+        self.members: dict[str, Any] = {}
+
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._unfinished = ""  # end of the last chunk that is decoded together with the next one
+        self._eof = False
+        self._first_member = True
+        self._in_messages = False
+
+        self._skip_whitespace()
+        self._expect("{")
+        self._read_members()
+
+    def messages(self) -> Iterator[dict[str, Any]]:
+        """Yields the messages from the file one by one, in the order in which they are stored in the file."""
+        if not self._in_messages:
+            return
+
+        first = True
+        while True:
+            self._skip_whitespace()
+            if self._peek() == "]":
+                self._pos += 1
+                break
+            if not first:
+                self._expect(",")
+                self._skip_whitespace()
+            first = False
+            yield self._decode_value()
+
+        self._in_messages = False
+        self._read_members()
+
+    def _read_members(self) -> None:
+        """Reads the top-level members of the object until the "messages" array is opened or the object ends."""
+        while True:
+            self._skip_whitespace()
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            if not self._first_member:
+                self._expect(",")
+                self._skip_whitespace()
+            self._first_member = False
+
+            key = self._decode_value()
+            self._skip_whitespace()
+            self._expect(":")
+            self._skip_whitespace()
+
+            if key == "messages" and self._peek() == "[":
+                self._pos += 1
+                self._in_messages = True
+                return
+            self.members[key] = self._decode_value()
+
+    def _decode_value(self) -> Any:
+        """Decodes a single JSON value starting at the current position, reading more data if necessary. The value
+        is decoded again after every read, but every read at least doubles the unparsed part of the buffer, so long
+        values take linear time. Errors that can't be caused by the end of the buffer are raised right away."""
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._eof or not self._is_cut_off(e):
+                    raise
+            else:
+                # a number or a literal ending right at the end of the buffer might continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            self._read_chunk()
+
+    def _is_cut_off(self, error: json.JSONDecodeError) -> bool:
+        """Checks whether a decoding error can be caused by the value being cut off by the end of the buffer"""
+        return error.msg.startswith("Unterminated string") or len(self._buffer) - error.pos <= _MAX_CUT_OFF_TOKEN
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return
+            self._read_chunk()
+
+    def _peek(self) -> str:
+        while self._pos >= len(self._buffer):
+            if self._eof:
+                raise json.JSONDecodeError("Unexpected end of file", self._buffer, self._pos)
+            self._read_chunk()
+        return self._buffer[self._pos]
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buffer, self._pos)
+        self._pos += 1
+
+    def _read_chunk(self) -> None:
+        """Reads the next chunk of the file, decodes its escaped bytes and drops the already parsed part
+        of the buffer. The chunk is at least as long as the unparsed part of the buffer."""
+        chunk = self._file.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if chunk:
+            chunk = self._unfinished + chunk
+            tail = _unfinished_tail(chunk)
+            chunk, self._unfinished = chunk[:tail], chunk[tail:]
+        else:
+            chunk, self._unfinished = self._unfinished, ""
+            if not chunk:
+                self._eof = True
+        self._buffer = self._buffer[self._pos :] + decode_escaped_bytes(chunk)
+        self._pos = 0
+
+
+def iter_messages(file: IO[str], members: dict[str, Any] | None = None) -> Iterator[dict[str, Any]]:
+    """Yields the messages from a message_N.json file one at a time.
+
+    :param file: opened message file
+    :param members: optional dict to which the other top-level members of the file (participants, title, ...)
+                    are stored
+    """
+    reader = MessageFileReader(file)
+    yield from reader.messages()
+    if members is not None:
+        members.update(reader.members)
+
+
+def read_header(file: IO[str]) -> dict[str, Any]:
+    """Reads only the top-level members preceding the messages (participants in the Facebook exports)
+    without parsing the messages themselves.
+
+    :param file: opened message file
+    :return: dict with the members
+    """
+    return MessageFileReader(file, HEADER_CHUNK_SIZE).members
@@ -1,61 +1,185 @@
 from __future__ import annotations
-import abc
-import json
+import hashlib
 import os
-from typing import Any, Optional, TYPE_CHECKING
-import regex
-from datetime import date, timedelta
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from itertools import chain, islice
+from dataclasses import fields, replace
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, TypeVar, TYPE_CHECKING
+from datetime import tzinfo
 from pathlib import Path
 from statistics import mode
 import unicodedata as ud
 
 import emoji
-
-from utils.const import EMOJIS_REGEX, EMOJIS_DICT, TRANSLATE_REMOVE_LETTERS
-from chats.stats import StatsType, FacebookStats
+import numpy as np
+
+from chats.accumulators import ChatContext, StatsEngine, order_by_count, order_by_people
+from chats.message_lengths import MessageLengths
+from chats.message_table import MessageKind, MessageTable, MessageTableBuilder
+from chats.reply_times import ReplyTimes
+from chats.search_index import ChatSegment, SearchIndex, SearchResult, index_dir_current
+from chats.sessions import SESSION_GAP, Sessions
+from chats.stats import ChatSummary, StatsType, FacebookStats, Times
+from chats.time_buckets import Calendar, load_timezone, timezone_name
+from chats.vocabulary import Vocabulary
+from sources.dedup import MessageDeduplicator, hash_messages
+from sources.facebook_json import iter_messages, load, read_header
 from sources.message_source import MessageSource, NoMessageFilesError
-from utils.utility import list_folder
+from utils.archive import ArchivePath, ExportPath, ZipExport
+from utils.cache import StatsCache, files_content_fingerprint, files_fingerprint
+from utils.utility import is_metadata_file
 
 if TYPE_CHECKING:
     from gui.main_gui import MainGUI
 
 chat_id_str = str  # alias for str that denotes a unique chat ID (for example: "2kqhirzyng")
 
+T = TypeVar("T")
+
+# message source used by the worker processes of the parallel mode, set by the pool initializer
+_worker_source: Optional[FacebookSource] = None
+
+# the "inbox" folders are at most this deep below the selected folder, e.g. in
+# <selected folder>/<export>/your_facebook_activity/messages/inbox
+MAX_INBOX_DEPTH = 5
+
+# folders with media or other data that never contain the "inbox" folders, so they aren't searched
+SKIPPED_FOLDERS = {"photos", "videos", "audio", "gifs", "files", "media", "stickers_used", "photos_and_videos"}
+
+# maximum number of the messages in one table in the streaming mode, which bounds the memory used by the messages
+STREAM_BATCH_SIZE = 10_000
+
+
+class ExportManifest(NamedTuple):
+    """Layout of the export found by the discovery, it's cached so that the folders don't have to be searched
+    and listed again as long as none of the listed folders changed."""
+
+    listed_folders: list[ExportPath]  # all folders whose content the manifest is based on
+    fingerprint: str  # fingerprint of the listed folders (their modification times change when their content does)
+    inboxes: list[ExportPath]
+    chats: dict[ExportPath, list[str]]  # chat folders with the names of their JSON files
+    info_files: list[ExportPath]  # files with the names from the source's info_file_names
+
 
 class FacebookSource(MessageSource):
     """Abstract parent class for Facebook Messenger and Instagram. The message format for both
-    is almost identical (with only minor differences), so only the _process_messages method is abstract.
+    is almost identical (with only minor differences), so the sources mostly differ in the accumulators
+    of their stats engine.
     """
 
-    def __init__(self, path: str):
-        MessageSource.__init__(self, path)
-        self.folders: list[Path] = []
+    # names of the files with information about the user that are looked for during the discovery of the export
+    info_file_names: tuple[str, ...] = ()
+
+    # engine with the accumulators computing the stats of the source
+    stats_engine: StatsEngine
+
+    # name of the user, if the source can get it from the export
+    user_name: str | None = None
+
+    def __init__(
+        self,
+        path: str | Sequence[str],
+        streaming: bool = False,
+        workers: int = 1,
+        cache: StatsCache | None = None,
+        incremental: bool = False,
+        timezone: str | None = None,
+        chat_timezones: dict[chat_id_str, str] | None = None,
+        session_gap: int = SESSION_GAP,
+    ):
+        """
+        :param path: path to the directory with the export, or path(s) to the zip archive(s) with the export,
+                     which are read without extracting them
+        :param streaming: if True, messages are parsed and processed one at a time instead of loading whole
+                          conversations into memory, so the memory usage doesn't grow with the size of the chats.
+                          The processed stats then don't keep the list of messages.
+        :param workers: number of worker processes used to extract the chats for the personal stats and top
+                        conversations, 1 means that everything is done sequentially in the current process
+        :param cache: persistent cache for the processed stats, None to always process everything from scratch
+        :param incremental: if True, the cached stats are identified by the content of the chats' files instead of
+                            their location, so that when a newer export of the same account is analyzed, only the chats
+                            whose files changed since the last analysis are processed again. It has no effect
+                            without the cache.
+        :param timezone: IANA name of the time zone of the times in the stats (e.g. "Europe/Prague"),
+                         the local time zone of the machine if None or empty
+        :param chat_timezones: time zones of individual chats (by their IDs) that differ from the source's one
+        :param session_gap: longest gap between two messages of one session of a chat in seconds
+        """
+        paths = [path] if isinstance(path, str) else list(path)
+        if not paths:
+            raise NoMessageFilesError("No files with the messages were selected.")
+        MessageSource.__init__(self, paths[0])
+        self.streaming = streaming
+        self.workers = workers
+        self.cache = cache
+        self.incremental = incremental
+        self.timezone = load_timezone(timezone)
+        self.chat_timezones = {c: load_timezone(z) for c, z in (chat_timezones or {}).items()}
+        self.session_gap = session_gap
+        self.folders: list[ExportPath] = []
+        self.info_files: list[ExportPath] = []
+        self._chat_files: dict[ExportPath, list[str]] = {}  # chat folders with the names of their JSON files
+
+        # directories and roots of the zip archives with the export
+        self._roots: list[ExportPath] = [ZipExport(p).root if zipfile.is_zipfile(p) else Path(p) for p in paths]
+        self._export_id = "|".join(str(r.resolve()) if isinstance(r, Path) else str(r) for r in self._roots)
+        # prefix of the keys of the persistent cache, the incremental mode shares the entries between exports
+        self._cache_scope = f"{self.__class__.__name__}:{'incremental' if incremental else self._export_id}"
+
+        # content fingerprints of the chats in the incremental mode, together with the fingerprints of their files'
+        # metadata, so that the content is only read again when the files change. They're loaded from the persistent
+        # cache on the first use, so an unchanged export isn't read again when it's opened the next time.
+        self._content_fingerprints: Optional[dict[chat_id_str, tuple[str, str]]] = None
+        self._content_fingerprints_changed = False  # whether there are fingerprints that aren't saved yet
 
         # dict of all conversations identified by their chat ID, with their paths
-        self.chat_ids: dict[chat_id_str, list[Path]] = {}
+        self.chat_ids: dict[chat_id_str, list[ExportPath]] = {}
 
         # Intermediate cache of the extracted but not yet processed messages. The values stored are tuples of
-        # messages, names of the chat participants, chat title and chat type. Once the messages have been processed,
-        # they are removed from this cache as they can be accessed via the Chat object.
-        self.messages_cache: dict[chat_id_str, tuple[list[Any], list[Any], str, StatsType]] = {}
+        # the message table, names of the chat participants, chat title and chat type. Once the messages have been
+        # processed, they are removed from this cache as they can be accessed via the Chat object.
+        self.messages_cache: dict[chat_id_str, tuple[MessageTable, list[Any], str, StatsType]] = {}
 
         # cache of Stats objects
         self.chats_cache: dict[chat_id_str, FacebookStats] = {}
 
+        # index of chat summaries (title, type, number of messages...) with fingerprints of the files they were
+        # obtained from, it's loaded from the persistent cache on the first use
+        self._chat_index: Optional[dict[chat_id_str, tuple[str, ChatSummary]]] = None
+        self._chat_index_changed = False  # whether the index has summaries that aren't saved yet
+
         self._top_conversations: Optional[tuple[list[Any], list[Any]]] = None
         self._personal_stats: Optional[FacebookStats] = None
-
-        self._regex_emoji = regex.compile(EMOJIS_REGEX)
-        self._regex_unicode = regex.compile(r"\X")
+        self._search_index: Optional[SearchIndex] = None
 
         self._load_message_folders()
         self._load_all_chats()
 
+    def __getstate__(self) -> dict[str, Any]:
+        """Leaves out the caches when the source is sent to the worker processes"""
+        state = self.__dict__.copy()
+        state.update(
+            messages_cache={},
+            chats_cache={},
+            _chat_index=None,
+            _chat_index_changed=False,
+            _top_conversations=None,
+            _personal_stats=None,
+            _search_index=None,
+        )
+        return state
+
     # region Public API
 
     def get_chat(self, chat_id: chat_id_str) -> FacebookStats:
         if chat_id not in self.chats_cache:
-            self._compile_chat_data(chat_id)
+            timezone = timezone_name(self._chat_timezone(chat_id))
+            self.chats_cache[chat_id] = self._cached(
+                f"chat:{chat_id}:{timezone}:{self.session_gap}", [chat_id], partial(self._compile_chat_data, chat_id)
+            )
         return self.chats_cache[chat_id]
 
     def personal_stats(self, gui: MainGUI = None) -> FacebookStats:
@@ -65,7 +189,7 @@ class FacebookSource(MessageSource):
         :return: Stats object with the personal stats
         """
         if not self._personal_stats:
-            self._get_personal_stats(gui)
+            self._personal_stats = self._get_personal_stats(gui)
         return self._personal_stats
 
     def top_ten(self) -> tuple[list[Any], list[Any]]:
@@ -75,39 +199,119 @@ class FacebookSource(MessageSource):
                  with the structure {conversation name: number of messages}
         """
         if not self._top_conversations:
-            self._get_top_conversations()
-        return self._top_conversations  # type: ignore
+            self._top_conversations = self._get_top_conversations()
+        return self._top_conversations
 
     def conversation_size(self, chat_id: chat_id_str) -> int:
         """Gets amount of messages in a conversation.
 
         :param chat_id: name of the conversation / chat ID
         """
-        messages, _, _, _ = self._get_messages(chat_id)
-        return len(messages)
+        return self.chat_summaries([chat_id])[chat_id].messages
+
+    def chat_summaries(
+        self, chat_ids: Iterable[chat_id_str] | None = None, gui: MainGUI = None
+    ) -> dict[str, ChatSummary]:
+        """Gets the title, type, number of messages and the time span of the chats. The summaries are kept
+        in an index stored in the persistent cache, only the chats that aren't in the index yet or whose files
+        changed are scanned (in the incremental mode, the index is shared by all exports of the account). The scan only
+        counts the messages, it doesn't decode or keep them. The index is saved after a scan of several chats, the
+        summaries of single chats (e.g. from conversation_size) are saved together by close.
+
+        :param chat_ids: IDs of the chats, all chats if None
+        :param gui: main GUI displaying the progress bar
+        :return: dict with the summaries of the chats
+        """
+        if self._chat_index is None:
+            self._chat_index = self._load_chat_index()
+        index = self._chat_index
+
+        chat_ids = list(self.chat_ids if chat_ids is None else chat_ids)
+        fingerprints = self._fingerprints(chat_ids)
+        outdated = [c for c in chat_ids if c not in index or index[c][0] != fingerprints[c]]
+
+        if outdated:
+            if self.workers > 1 and len(outdated) > 1:
+                scanned = self._map_chats(_summarize_chat, outdated, gui)
+            else:
+                scanned = {chat_id: self._summarize_chat(chat_id) for chat_id in outdated}
+            for chat_id, summary in scanned.items():
+                index[chat_id] = fingerprints[chat_id], summary
+            self._chat_index_changed = True
+            if len(outdated) > 1:
+                self._save_chat_index()
+
+        return {chat_id: index[chat_id][1] for chat_id in chat_ids}
+
+    def close(self) -> None:
+        self._save_chat_index()
+        self._save_content_fingerprints()
+        for root in self._roots:
+            if isinstance(root, ArchivePath):
+                root.archive.close()
+
+    def search_index(self, gui: MainGUI = None, index_dir: Path = index_dir_current) -> SearchIndex:
+        """Gets the full-text index of the messages of all chats. The index is stored on the disk, only the chats
+        that aren't indexed yet or whose files changed since they were indexed are indexed (in the incremental mode,
+        the index is shared by all exports of the account, like the persistent cache).
+
+        :param gui: main GUI displaying the progress bar
+        :param index_dir: directory with the indexes
+        :return: the index, see SearchIndex.search
+        """
+        if self._search_index is not None and self._search_index.index_dir == index_dir:
+            return self._search_index
+
+        index = SearchIndex(self._cache_scope, index_dir, self.timezone)
+        fingerprints = self._fingerprints(self.chat_ids)
+        outdated = [c for c in self.chat_ids if index.fingerprint(c) != fingerprints[c]]
+
+        if gui:
+            gui.progress_bar["value"] += (len(self.chat_ids) - len(outdated)) / len(self.chat_ids) * 100
+            gui.update()
+
+        if self.workers > 1 and len(outdated) > 1:
+            segments = self._map_chats(_index_chat, outdated, gui)
+        else:
+            segments = {}
+            for chat_id in outdated:
+                segments[chat_id] = self._index_chat(chat_id)
+
+                if gui:
+                    gui.progress_bar["value"] += 1 / len(self.chat_ids) * 100
+                    gui.update()
+        for chat_id, segment in segments.items():
+            index.add(segment, fingerprints[chat_id])
+        if not self.incremental:
+            # in the incremental mode, the chats that aren't in this export can be in other exports of the account
+            for chat_id in set(index.chat_ids) - set(self.chat_ids):
+                index.remove(chat_id)
+        index.save()
+
+        self._search_index = index
+        return index
+
+    def search(self, query: str, limit: int = 100, gui: MainGUI = None) -> list[SearchResult]:
+        """Finds the messages matching a query in all chats, the chats are indexed first if needed (see search_index)
+
+        :param query: the query, see parse_query
+        :param limit: maximum number of the results
+        :param gui: main GUI displaying the progress bar
+        :return: the results, from the newest message
+        :raises ValueError: if the query is invalid
+        """
+        return self.search_index(gui).search(query, limit, self.chat_ids)
 
     # endregion
 
     # region Chat processing
 
-    def _get_top_conversations(self) -> None:
-        """Calculates the top 10 individual chats and top 5 group chats based on number of messages
-        and store it in a "cache" variable.
-        """
+    def _get_top_conversations(self) -> tuple[list[Any], list[Any]]:
+        """Calculates the top 10 individual chats and top 5 group chats based on number of messages."""
         chats = {}
         groups = {}
 
-        for chat_id in self.chat_ids:
-            if chat_id in self.chats_cache:
-                title = self.chats_cache[chat_id].title
-                chat_type = self.chats_cache[chat_id].stats_type
-                messages = self.chats_cache[chat_id].messages
-            elif chat_id in self.messages_cache:
-                messages, _, title, chat_type = self.messages_cache[chat_id]
-            else:
-                # extract data for the chat and cache it
-                messages, participants, title, chat_type = self._prepare_chat_data(chat_id)
-                self.messages_cache[chat_id] = messages, participants, title, chat_type
+        for chat_id, (title, chat_type, size, _, _) in self.chat_summaries().items():
 
             # remove emoji because it ruins the aligning of the output text
             title = emoji.replace_emoji(title, "")
@@ -115,51 +319,326 @@ class FacebookSource(MessageSource):
                 title = f"chat_id: {chat_id}"  # edge case - title is comprised of just emoji
 
             if chat_type == StatsType.REGULAR:
-                chats[title] = len(messages)
+                chats[title] = size
             elif chat_type == StatsType.GROUP:
-                groups[title] = len(messages)
+                groups[title] = size
 
         top_individual = sorted(chats.items(), key=lambda item: item[1], reverse=True)[0:10]
         top_group = sorted(groups.items(), key=lambda item: item[1], reverse=True)[0:5]
-        self._top_conversations = top_individual, top_group
+        return top_individual, top_group
 
-    def _get_personal_stats(self, gui: MainGUI = None) -> None:
-        """Extracts and calculates overall personal stats
+    def _get_personal_stats(self, gui: MainGUI = None) -> FacebookStats:
+        """Calculates overall personal stats. The stats of the user's messages are computed for every chat
+        separately and merged together, so only the messages of one chat are in memory at a time (each worker
+        process has its own chat). With the persistent cache, the stats of every chat are cached separately,
+        so only the chats whose files changed since the last analysis are processed again.
 
         :param gui: main GUI displaying the progress bar
         """
-        messages = []
-        participants = []  # list of participants from all conversations
+        name = self._find_user_name()
+
+        # the entries hold a list with the chat's stats, which is empty if the user didn't send any messages there
+        parts: dict[chat_id_str, list[FacebookStats]] = {}
+        fingerprints = {}
+        if self.cache is not None:
+            fingerprints = self._fingerprints(self.chat_ids)
+            for chat_id in self.chat_ids:
+                cached = self.cache.load(self._personal_chat_key(chat_id, name), fingerprints[chat_id])
+                if cached is not None:
+                    parts[chat_id] = cached
+
+                    if gui:
+                        gui.progress_bar["value"] += 1 / len(self.chat_ids) * 100
+                        gui.update()
+
+        changed = [c for c in self.chat_ids if c not in parts]
+        processed: dict[chat_id_str, FacebookStats | None] = {}
+        if self.workers > 1 and len(changed) > 1:
+            # chats with messages already in memory are processed here, the rest is extracted by the workers
+            to_extract = [c for c in changed if c not in self.messages_cache and c not in self.chats_cache]
+            processed = self._map_chats(partial(_personal_chat_stats, name=name), to_extract, gui)
+        for chat_id in changed:
+            if chat_id not in processed:
+                processed[chat_id] = self._personal_chat_stats(chat_id, name)
+
+                if gui:
+                    gui.progress_bar["value"] += 1 / len(self.chat_ids) * 100
+                    gui.update()
+
+        for chat_id, part in processed.items():
+            parts[chat_id] = [part] if part is not None else []
+            if self.cache is not None:
+                self.cache.save(self._personal_chat_key(chat_id, name), fingerprints[chat_id], parts[chat_id])
+
+        merged = [p for chat_id in self.chat_ids for p in parts[chat_id]]
+        return self._merge_stats(merged, [name], "Personal stats", StatsType.PERSONAL)
+
+    def _personal_chat_key(self, chat_id: chat_id_str, name: str) -> str:
+        return f"{self._cache_scope}:personal:{name}:{timezone_name(self.timezone)}:{self.session_gap}:{chat_id}"
+
+    def _personal_chat_stats(self, chat_id: chat_id_str, name: str) -> FacebookStats | None:
+        """Processes the messages sent by the user in a single chat.
 
+        :param chat_id: ID of the chat to process
+        :param name: name of the user
+        :return: stats of the user's messages (without the messages themselves) or None if there are none
+        """
+        cached_messages = self.chats_cache[chat_id].messages if chat_id in self.chats_cache else None
+        tables: Iterable[MessageTable]
+        if cached_messages is not None:
+            tables = [cached_messages]
+        elif chat_id in self.messages_cache:
+            tables = [self.messages_cache[chat_id][0]]
+        else:
+            tables, _ = self._stream_chat_data(chat_id)
+
+        user_tables = (t.sent_by(name) for t in tables)
+        parts = [
+            self._process_messages(
+                t, [name], "Personal stats", StatsType.PERSONAL, keep_messages=False, timezone=self.timezone
+            )
+            for t in user_tables
+            if len(t)
+        ]
+        if not parts:
+            return None
+        return self._merge_stats(parts, [name], "Personal stats", StatsType.PERSONAL)
+
+    def _summarize_chat(self, chat_id: chat_id_str) -> ChatSummary:
+        """Scans the files of a chat and gets its summary. The messages are parsed one at a time and only their
+        timestamps (and hashes, if the chat is in several folders) are looked at, nothing is kept.
+
+        :param chat_id: ID of the chat
+        :return: summary of the chat
+        """
+        jsons = self._get_jsons(chat_id)
+        latest_json = self._latest_json(jsons)
+        dedup = self._deduplicator(chat_id)
+        count = 0
+        first_timestamp: int | None = None
+        last_timestamp: int | None = None
+
+        for json_file in jsons:
+            members: dict[str, Any] = {}
+            hashes: array[int] = array("q")
+            with json_file.open("r") as data_file:
+                messages = iter_messages(data_file, members)
+                for m in hash_messages(messages, hashes) if dedup else messages:
+                    timestamp = m["timestamp_ms"]
+                    count += 1
+                    if first_timestamp is None or timestamp < first_timestamp:
+                        first_timestamp = timestamp
+                    if last_timestamp is None or timestamp > last_timestamp:
+                        last_timestamp = timestamp
+
+            if dedup:
+                # the duplicates are within the time span of the messages they duplicate
+                count -= int(dedup.add(np.frombuffer(hashes, dtype=np.int64), json_file.parent).sum())
+
+            if json_file == latest_json:
+                _, title, chat_type = self._get_chat_info(members)
+
+        return ChatSummary(title, chat_type, count, first_timestamp, last_timestamp)
+
+    def _index_chat(self, chat_id: chat_id_str) -> ChatSegment:
+        messages, _, title, _ = self._prepare_chat_data(chat_id)
+        return ChatSegment.build(chat_id, title, messages)
+
+    def _load_chat_index(self) -> dict[chat_id_str, tuple[str, ChatSummary]]:
+        """Loads the index of chat summaries from the persistent cache"""
+        if self.cache is None:
+            return {}
+        # every entry of the index has its own fingerprint, so the index as a whole doesn't need one
+        return self.cache.load(self._chat_index_key(), "") or {}
+
+    def _save_chat_index(self) -> None:
+        """Saves the index of chat summaries to the persistent cache if it changed since it was last saved"""
+        if self.cache is not None and self._chat_index is not None and self._chat_index_changed:
+            self.cache.save(self._chat_index_key(), "", self._chat_index)
+        self._chat_index_changed = False
+
+    def _chat_index_key(self) -> str:
+        return f"{self._cache_scope}:chat_index"
+
+    def _chat_timezone(self, chat_id: chat_id_str) -> tzinfo | None:
+        """Gets the time zone of the stats of a chat, None for the local time zone"""
+        return self.chat_timezones.get(chat_id, self.timezone)
+
+    def _find_user_name(self) -> str:
+        """Finds the user's name as the participant that appears in all conversations. Only the beginnings
+        of the latest JSON files with the participants are read.
+
+        :return: name of the user
+        """
+        participants = []
         for chat_id in self.chat_ids:
-            if chat_id in self.chats_cache:
-                messages.extend(self.chats_cache[chat_id].messages)
-                participants.extend(self.chats_cache[chat_id].participants)
-            elif chat_id in self.messages_cache:
-                messages.extend(self.messages_cache[chat_id][0])
-                participants.extend(self.messages_cache[chat_id][1])
-            else:
-                # extract data for the chat and cache it
-                self.messages_cache[chat_id] = self._prepare_chat_data(chat_id)
-                messages.extend(self.messages_cache[chat_id][0])
-                participants.extend(self.messages_cache[chat_id][1])
+            with self._latest_json(self._get_jsons(chat_id)).open("r") as data_file:
+                participants.extend(self._get_participants(read_header(data_file)))
+        return mode(participants)
+
+    def _map_chats(
+        self, function: Callable[[chat_id_str], Any], chat_ids: list[chat_id_str], gui: MainGUI = None
+    ) -> dict[chat_id_str, Any]:
+        """Runs a function for each of the chats in a pool of worker processes.
+
+        :param function: picklable function that takes the chat ID, it's run with this source in _worker_source
+        :param chat_ids: IDs of the chats to process
+        :param gui: main GUI displaying the progress bar
+        :return: dict with the results of the function for each chat
+        """
+        results: dict[chat_id_str, Any] = {}
+        if not chat_ids:
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self,)) as executor:
+            futures = {executor.submit(function, chat_id): chat_id for chat_id in chat_ids}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
 
-            if gui:
-                gui.progress_bar["value"] += 1 / len(self.chat_ids) * 100
-                gui.update()
+                if gui:
+                    gui.progress_bar["value"] += 1 / len(self.chat_ids) * 100
+                    gui.update()
 
-        # find the user's name (the one that appears in all conversations)
-        name = mode(participants)
+        return results
 
-        messages = [m for m in messages if m["sender_name"] == name]
-        messages = sorted(messages, key=lambda k: k["timestamp_ms"])
-        self._personal_stats = self._process_messages(messages, [name], "Personal stats", StatsType.PERSONAL)
+    def _merge_stats(
+        self, parts: list[FacebookStats], participants: list[str], title: str, stats_type: StatsType
+    ) -> FacebookStats:
+        """Merges stats of several chats into one, as if all their messages were processed together.
+        The messages themselves are not kept.
+
+        :param parts: stats to merge
+        :param participants: list of the participants of the merged stats
+        :param title: title of the merged stats
+        :param stats_type: type of the merged stats
+        :return: merged stats
+        """
+        if not parts:
+            raise ValueError(f"{title} - there are no messages to process")
+
+        counts: dict[str, Any] = {}
+        for f in ["photos", "gifs", "stickers", "videos", "audios", "files", "reactions", "emojis", "people"]:
+            counts[f] = {}
+            for part in parts:
+                self._add_counts(counts[f], getattr(part, f))
+        # the counts are ordered in the same way as those of the parts, so that they don't depend on the parts' order
+        for f in ["photos", "gifs", "stickers", "videos", "audios", "files", "people"]:
+            counts[f] = order_by_people(counts[f], participants)
+        for f, people in [("reactions", ["gave", "got"]), ("emojis", ["sent"])]:
+            counts[f]["types"] = order_by_count(counts[f]["types"])
+            for p in people:
+                counts[f][p] = {n: order_by_count(c) for n, c in order_by_people(counts[f][p], participants).items()}
+
+        days = Calendar.merge([part.times.days for part in parts])
+        times: dict[str, Any] = {"hours": {}, "weekdays": {}}
+        for part in parts:
+            for f in times:
+                self._add_counts(times[f], getattr(part.times, f))
+
+        from_day = min(part.from_day for part in parts)
+        to_day = max(part.to_day for part in parts)
+        # the weekdays are in the order of their first appearance, as if the merged messages were sorted by time
+        active_weekdays = (np.flatnonzero(days.counts()) + from_day.weekday()) % 7 + 1
+        present, first_days = np.unique(active_weekdays, return_index=True)
+        times["weekdays"] = {w: times["weekdays"][w] for w in present[np.argsort(first_days)].tolist()}
+
+        nicknames = None
+        group_names = None
+        if parts[0].nicknames is not None:
+            nicknames = sorted(chain.from_iterable(p.nicknames or [] for p in parts), key=lambda n: n["timestamp"])
+        if parts[0].group_names is not None:
+            group_names = sorted(chain.from_iterable(p.group_names or [] for p in parts), key=lambda g: g["timestamp"])
+        members = None
+        calls: dict[str, int] | None = None
+        if parts[0].members is not None:
+            members = sorted(chain.from_iterable(p.members or [] for p in parts), key=lambda m: m["timestamp"])
+        if parts[0].calls is not None:
+            calls = {}
+            for part in parts:
+                self._add_counts(calls, part.calls or {})
+            calls = order_by_people(calls, participants)
+
+        lengths: dict[str, MessageLengths] | None = None
+        if parts[0].lengths is not None:
+            # the stats of the parts can be cached, so they're merged into new objects
+            lengths = {}
+            for part in parts:
+                for name, part_lengths in (part.lengths or {}).items():
+                    lengths.setdefault(name, MessageLengths(part_lengths.longest.size)).merge(part_lengths)
+        replies: dict[str, ReplyTimes] | None = None
+        if parts[0].replies is not None:
+            replies = {}
+            for part in parts:
+                for name, part_replies in (part.replies or {}).items():
+                    replies.setdefault(name, ReplyTimes()).merge(part_replies)
+        sessions: Sessions | None = None
+        if parts[0].sessions is not None:
+            sessions = Sessions(parts[0].sessions.gap)
+            for part in parts:
+                if part.sessions is not None:
+                    sessions.merge(part.sessions)
+        vocabulary: dict[str, Vocabulary] | None = None
+        if parts[0].vocabulary is not None:
+            vocabulary = {}
+            for part in parts:
+                for name, part_vocabulary in (part.vocabulary or {}).items():
+                    vocabulary.setdefault(name, Vocabulary(part_vocabulary.words.capacity)).merge(part_vocabulary)
+
+        return FacebookStats(
+            None,
+            counts["photos"],
+            counts["gifs"],
+            counts["stickers"],
+            counts["videos"],
+            counts["audios"],
+            counts["files"],
+            counts["reactions"],
+            counts["emojis"],
+            Times(times["hours"], days, times["weekdays"], days.months, days.years),
+            from_day,
+            to_day,
+            counts["people"],
+            participants,
+            title,
+            nicknames,
+            group_names,
+            stats_type,
+            parts[0].source_type,
+            members,
+            calls,
+            lengths,
+            replies,
+            sessions,
+            vocabulary,
+        )
 
-    def _compile_chat_data(self, chat_id: chat_id_str) -> None:
-        """Gets all the chat data, processes it and stores it as a Chat object in the cache.
+    @staticmethod
+    def _add_counts(counts: dict[Any, Any], other: dict[Any, Any]) -> None:
+        """Adds (possibly nested) counts from one dict to another"""
+        for key, value in other.items():
+            if isinstance(value, dict):
+                FacebookSource._add_counts(counts.setdefault(key, {}), value)
+            else:
+                counts[key] = value + counts.get(key, 0)
+
+    def _compile_chat_data(self, chat_id: chat_id_str) -> FacebookStats:
+        """Gets all the chat data and processes it into a Chat object.
 
         :param chat_id: name of the chat to process
         """
+        timezone = self._chat_timezone(chat_id)
+        if self.streaming and chat_id not in self.messages_cache:
+            tables, chat = self._stream_chat_data(chat_id)
+            participants = self._get_participants(chat)
+            chat_type = self._get_chat_type(participants)
+            # the title is read after the messages, the batches get the chat ID (only used in the errors) instead
+            context = ChatContext(participants, chat_id, chat_type, self.user_name, timezone, self.session_gap)
+            batches, sequential = self.stats_engine.run_batches(tables, context)
+            _, title, _ = self._get_chat_info(chat)
+            parts = [self._make_stats(f, None, participants, title, chat_type) for f in batches]
+            # the replies and the sessions span the batches, they're computed from all the messages at once
+            return replace(self._merge_stats(parts, participants, title, chat_type), **sequential)
+
         if chat_id in self.messages_cache:
             # fetch unprocessed extracted data
             messages, participants, title, chat_type = self.messages_cache[chat_id]
@@ -167,23 +646,99 @@ class FacebookSource(MessageSource):
         else:
             messages, participants, title, chat_type = self._prepare_chat_data(chat_id)
 
-        self.chats_cache[chat_id] = self._process_messages(messages, participants, title, chat_type)
+        return self._process_messages(messages, participants, title, chat_type, timezone=timezone)
 
-    def _prepare_chat_data(self, chat_id: chat_id_str) -> tuple[list[Any], list[Any], str, StatsType]:
-        """Extracts the chat data and decodes the messages
+    def _cached(self, key: str, chat_ids: Iterable[chat_id_str], compute: Callable[[], T]) -> T:
+        """Gets a value from the persistent cache or computes it and saves it to the cache. The entry is valid
+        as long as none of the JSON files of the given chats changed (see _fingerprint).
+
+        :param key: key of the value, unique within this source
+        :param chat_ids: chats from which the value is computed
+        :param compute: function computing the value
+        :return: the cached or computed value
+        """
+        if self.cache is None:
+            return compute()
+
+        key = f"{self._cache_scope}:{key}"
+        fingerprint = self._fingerprint(chat_ids)
+
+        value = self.cache.load(key, fingerprint)
+        if value is None:
+            value = compute()
+            # the messages are huge and can be extracted again if needed, so they aren't cached
+            stored = replace(value, messages=None) if isinstance(value, FacebookStats) else value
+            self.cache.save(key, fingerprint, stored)
+        return value
+
+    def _fingerprint(self, chat_ids: Iterable[chat_id_str]) -> str:
+        """Creates a fingerprint of the JSON files of the given chats. It's based on the paths and the modification
+        times of the files, or on their content in the incremental mode, so that the same files from a different
+        export have the same fingerprint.
+
+        :param chat_ids: IDs of the chats
+        :return: fingerprint of the chats' files
+        """
+        if not self.incremental:
+            return files_fingerprint(j for chat_id in chat_ids for j in self._get_jsons(chat_id))
+
+        if self._content_fingerprints is None:
+            self._content_fingerprints = self._load_content_fingerprints()
+        content_fingerprints = self._content_fingerprints
+
+        digest = hashlib.sha1()
+        for chat_id in chat_ids:
+            jsons = self._get_jsons(chat_id)
+            files_state = files_fingerprint(jsons)
+            if chat_id not in content_fingerprints or content_fingerprints[chat_id][0] != files_state:
+                content_fingerprints[chat_id] = files_state, files_content_fingerprint(jsons)
+                self._content_fingerprints_changed = True
+            digest.update(f"{chat_id}\0{content_fingerprints[chat_id][1]}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _fingerprints(self, chat_ids: Iterable[chat_id_str]) -> dict[chat_id_str, str]:
+        """Creates the fingerprints of several chats, each of them separately (see _fingerprint). The new content
+        fingerprints are saved to the persistent cache right away, those of single chats are saved by close.
+
+        :param chat_ids: IDs of the chats
+        :return: dict with the fingerprints of the chats' files
+        """
+        fingerprints = {chat_id: self._fingerprint([chat_id]) for chat_id in chat_ids}
+        if len(fingerprints) > 1:
+            self._save_content_fingerprints()
+        return fingerprints
+
+    def _load_content_fingerprints(self) -> dict[chat_id_str, tuple[str, str]]:
+        """Loads the content fingerprints of the chats of this export from the persistent cache"""
+        if self.cache is None:
+            return {}
+        # every entry has the fingerprint of the files' metadata, so the entries as a whole don't need one
+        return self.cache.load(self._content_fingerprints_key(), "") or {}
+
+    def _save_content_fingerprints(self) -> None:
+        """Saves the content fingerprints to the persistent cache if there are new ones since they were last saved"""
+        if self.cache is not None and self._content_fingerprints is not None and self._content_fingerprints_changed:
+            self.cache.save(self._content_fingerprints_key(), "", self._content_fingerprints)
+        self._content_fingerprints_changed = False
+
+    def _content_fingerprints_key(self) -> str:
+        # the metadata of the files differs between exports, so every export has its own entry
+        return f"{self.__class__.__name__}:{self._export_id}:content_fingerprints"
+
+    def _prepare_chat_data(self, chat_id: chat_id_str) -> tuple[MessageTable, list[Any], str, StatsType]:
+        """Extracts the chat data and stores the messages in a table sorted by time. The messages in each file
+        are already sorted (from the newest), so the tables of the files are only merged.
 
         :param chat_id: ID of the chat to process
-        :return: messages - list of messages
+        :return: messages - table of messages
                  title - name of the conversation,
                  participants - names of conversation participants
                  chat_type - type of chat (regular chat, group chat)
         """
-        messages, participants, title, chat_type = self._get_messages(chat_id)
-        messages = sorted(messages, key=lambda k: k["timestamp_ms"])
-        self._decode_messages(messages)
-        return messages, participants, title, chat_type
+        tables, participants, title, chat_type = self._get_messages(chat_id)
+        return MessageTable.merge(tables), participants, title, chat_type
 
-    def _get_jsons(self, chat_id: chat_id_str) -> list[Path]:
+    def _get_jsons(self, chat_id: chat_id_str) -> list[ExportPath]:
         """Gets the json(s) with messages for a particular chat
 
         :param chat_id: chat ID of the desired chat
@@ -193,14 +748,19 @@ class FacebookSource(MessageSource):
         jsons = []
 
         for ch in paths:
-            for file in list_folder(ch):
-                if file.startswith("message") and file.endswith(".json"):
+            for file in self._chat_files[ch]:
+                if file.startswith("message"):
                     jsons.append(ch / file)
         if not jsons:
             raise NoMessageFilesError(f"{chat_id} - no JSON files in this chat")
 
         return jsons
 
+    @staticmethod
+    def _latest_json(jsons: list[ExportPath]) -> ExportPath:
+        """Gets the most recently modified JSON file, which holds the current chat title and participants"""
+        return max(jsons, key=lambda j: j.stat().st_mtime)
+
     def _get_participants(self, chat: dict[Any, Any]) -> list[str]:
         """Gets names of the participants in the chat.
 
@@ -209,108 +769,200 @@ class FacebookSource(MessageSource):
         """
         participants = []
         for i in chat["participants"]:
-            participants.append(self._decode(i["name"]))
+            participants.append(i["name"])
         if len(participants) == 1:
             participants.append(participants[0])
         return participants
 
-    def _get_messages(self, chat_id: chat_id_str) -> tuple[list[dict[Any, Any]], list[str], str, StatsType]:
+    def _get_chat_info(self, chat: dict[Any, Any]) -> tuple[list[str], str, StatsType]:
+        """Gets the current participants, title and type of the chat.
+
+        :param chat: raw chat data from the latest JSON file
+        :return: participants - names of current conversation participants
+                 title - name of the conversation
+                 chat_type - type of chat (regular chat, group chat)
+        """
+        # normalization of the title ensures that Top Conversations table is aligned
+        title = ud.normalize("NFC", chat["title"])
+        participants = self._get_participants(chat)
+        return participants, title, self._get_chat_type(participants)
+
+    @staticmethod
+    def _get_chat_type(participants: list[str]) -> StatsType:
+        """Gets the type of the chat (regular chat, group chat) from the names of its participants"""
+        if len(participants) == 2:
+            return StatsType.REGULAR
+        return StatsType.GROUP
+
+    def _get_messages(self, chat_id: chat_id_str) -> tuple[list[MessageTable], list[str], str, StatsType]:
         """Gets the chat data (messages, names of the participants, chat title and chat type)
 
         :param chat_id: ID of the chat to process
-        :return: messages - list of messages
+        :return: messages - list of tables with the messages, one for each file
                  title - name of the conversation,
                  participants - names of current conversation participants
                  chat_type - type of chat (regular chat, group chat)
         """
         jsons = self._get_jsons(chat_id)
-        messages = []
+        latest_json = self._latest_json(jsons)
+        dedup = self._deduplicator(chat_id)
+        tables = []
 
-        get_current_info = True
-        file_max_mod_time = max([os.path.getmtime(j) for j in jsons])
         for json_file in jsons:
-            with open(json_file, "r") as data_file:
-                data = json.load(data_file)
-                messages.extend(data["messages"])
+            with json_file.open("r") as data_file:
+                data = load(data_file)
+                tables.append(self._build_table(data["messages"], dedup, json_file))
 
-                if get_current_info and os.path.getmtime(json_file) == file_max_mod_time:
+                if json_file == latest_json:
                     # get current title, participants and chat type from the latest file
-                    # normalization of the title ensures that Top Conversations table is aligned
-                    title = ud.normalize("NFC", self._decode(data["title"]))
-                    participants = self._get_participants(data)
+                    participants, title, chat_type = self._get_chat_info(data)
+
+        return tables, participants, title, chat_type
+
+    def _stream_chat_data(self, chat_id: chat_id_str) -> tuple[Iterator[MessageTable], dict[str, Any]]:
+        """Streaming counterpart of _prepare_chat_data. The messages of all files are parsed and decoded one at a time
+        as the returned iterator is consumed and stored in tables of at most STREAM_BATCH_SIZE messages, so only one
+        batch of the messages is in memory at a time. The tables are not sorted.
+
+        :param chat_id: ID of the chat to process
+        :return: messages - iterator over tables with the decoded messages
+                 chat - top-level members of the latest JSON file with the current chat info (see _get_chat_info);
+                        the participants precede the messages, but the title follows them, so it's only there
+                        once the iterator is consumed
+        """
+        jsons = self._get_jsons(chat_id)
+        latest_json = self._latest_json(jsons)
+
+        with latest_json.open("r") as data_file:
+            chat = read_header(data_file)
+
+        dedup = self._deduplicator(chat_id)
+
+        def tables() -> Iterator[MessageTable]:
+            for json_file in jsons:
+                with json_file.open("r") as data_file:
+                    messages = iter_messages(data_file, chat if json_file == latest_json else None)
+                    while batch := list(islice(messages, STREAM_BATCH_SIZE)):
+                        yield self._build_table(batch, dedup, json_file)
+
+        return tables(), chat
+
+    def _build_table(
+        self,
+        messages: Iterable[dict[Any, Any]],
+        dedup: MessageDeduplicator | None = None,
+        json_file: ExportPath | None = None,
+    ) -> MessageTable:
+        """Stores raw messages in a table
+
+        :param messages: raw messages
+        :param dedup: deduplicator of the chat if it's in several folders, the messages that were already read
+                      from another folder are left out
+        :param json_file: file with the messages, needed for the deduplication
+        :return: table with the messages in the same order
+        """
+        builder = MessageTableBuilder(self._message_kind)
+        if dedup is None or json_file is None:
+            return builder.extend(messages).build()
+
+        hashes: array[int] = array("q")
+        table = builder.extend(hash_messages(messages, hashes)).build()
+        duplicates = dedup.add(np.frombuffer(hashes, dtype=np.int64), json_file.parent)
+        return table.take(np.flatnonzero(~duplicates)) if duplicates.any() else table
 
-                    if len(participants) == 2:
-                        chat_type = StatsType.REGULAR
-                    else:
-                        chat_type = StatsType.GROUP
+    def _deduplicator(self, chat_id: chat_id_str) -> MessageDeduplicator | None:
+        """Creates a deduplicator for a chat that is in the folders of several exports, whose files can hold
+        the same messages (the parts of one export don't, see MessageDeduplicator)
 
-                    get_current_info = False
+        :param chat_id: ID of the chat
+        :return: new deduplicator or None if the chat is only in one export
+        """
+        if len(self.chat_ids[chat_id]) < 2:
+            return None
+        dedup = MessageDeduplicator(
+            {ch: [f for f in self._chat_files[ch] if f.startswith("message")] for ch in self.chat_ids[chat_id]}
+        )
+        return dedup if dedup.needed else None
 
-        return messages, participants, title, chat_type
+    @staticmethod
+    def _message_kind(message: dict[Any, Any]) -> MessageKind:
+        """Determines the kind of a message, the first matching key wins
+
+        :param message: decoded message
+        :return: kind of the message
+        """
+        if "content" in message:
+            return MessageKind.CONTENT
+        elif "photos" in message:
+            return MessageKind.PHOTOS
+        elif "gifs" in message:
+            return MessageKind.GIFS
+        elif "sticker" in message:
+            return MessageKind.STICKER
+        elif "videos" in message:
+            return MessageKind.VIDEOS
+        elif "audio_files" in message:
+            return MessageKind.AUDIO
+        elif "files" in message:
+            return MessageKind.FILES
+        elif "share" in message:
+            return MessageKind.SHARE
+        return MessageKind.OTHER
 
-    @abc.abstractmethod
     def _process_messages(
-        self, messages: list[Any], participants: list[str], title: str, stats_type: StatsType = None
+        self,
+        messages: MessageTable,
+        participants: list[str],
+        title: str,
+        stats_type: StatsType = None,
+        keep_messages: bool = True,
+        timezone: tzinfo | None = None,
     ) -> FacebookStats:
-        """Processes the messages, produces raw stats and stores them in a Chat object.
+        """Processes the messages with the source's stats engine, produces raw stats and stores them
+        in a Chat object. The messages don't need to be sorted, the stats are the same for any order
+        of the messages.
 
-        :param messages: list of messages to process
+        :param messages: table of messages to process
         :param participants: list of the chat participants
         :param title: title of the chat
         :param stats_type: type of stats (regular / group chat / overall personal)
+        :param keep_messages: whether to keep the table of messages in the Chat object
+        :param timezone: time zone of the times in the stats, the local time zone of the machine if None
         :return: FacebookMessengerChat with the processed chats
         """
+        chat = ChatContext(participants, title, stats_type, self.user_name, timezone, self.session_gap)
+        return self._make_stats(
+            self.stats_engine.run(messages, chat), messages if keep_messages else None, participants, title, stats_type
+        )
+
+    def _make_stats(
+        self,
+        computed: dict[str, Any],
+        messages: MessageTable | None,
+        participants: list[str],
+        title: str,
+        stats_type: StatsType | None,
+    ) -> FacebookStats:
+        """Creates the stats from the fields computed by the source's stats engine
 
-    def _process_reactions(
-        self, message: dict[Any, Any], name: str, participants: list[str], reactions: dict[Any, Any]
-    ) -> Any:
-        """Extracts reactions from a message and expands the reaction stats.
-
-        :param message: message to analyze
-        :param name: name of the message author
+        :param computed: fields computed by the accumulators
+        :param messages: table of the processed messages to keep in the stats, None to leave them out
         :param participants: list of the chat participants
-        :param reactions: dictionary with reaction stats
-        :return: expanded reactions dict
-        """
-        for r in message["reactions"]:
-            if r["reaction"] == self._decode("\u00e2\u009d\u00a4"):
-                reaction = "❤️"
-            else:
-                reaction = r["reaction"]
-            reactions["total"] += 1
-            reactions["types"][reaction] = 1 + reactions["types"].get(reaction, 0)
-            if name in participants:
-                reactions["got"][name]["total"] += 1
-                reactions["got"][name][reaction] = 1 + reactions["got"][name].get(reaction, 0)
-                if r["actor"] in participants:
-                    reactions["gave"][r["actor"]]["total"] += 1
-                    reactions["gave"][r["actor"]][reaction] = 1 + reactions["gave"][r["actor"]].get(reaction, 0)
-
-        return reactions
-
-    def _extract_emojis(self, message: dict[Any, Any], emojis: dict[Any, Any]) -> dict[Any, Any]:
-        """Extracts both actual Unicode emojis and text emojis (such as ":D") from a message.
-
-        :param message: message to analyze
-        :param emojis: emojis dict to which the extracted emoji should be added
-        :return: expanded emojis dict
+        :param title: title of the chat
+        :param stats_type: type of stats
+        :return: the stats
         """
-
-        name = message["sender_name"]
-        data = self._regex_unicode.findall(message["content"].translate(TRANSLATE_REMOVE_LETTERS))
-
-        text_emoji = self._regex_emoji.search(message["content"])
-        if text_emoji:
-            data.extend([EMOJIS_DICT[e] for e in text_emoji.groups()])
-
-        for c in data:
-            if c in emoji.EMOJI_DATA:
-                emojis["total"] += 1
-                emojis["types"][c] = 1 + emojis["types"].get(c, 0)
-                emojis["sent"][name]["total"] += 1
-                emojis["sent"][name][c] = 1 + emojis["sent"][name].get(c, 0)
-
-        return emojis
+        # the fields without an accumulator in the source's engine are None
+        stats: dict[str, Any] = dict.fromkeys(f.name for f in fields(FacebookStats))
+        stats.update(computed)
+        stats.update(
+            messages=messages,
+            participants=participants,
+            title=title,
+            stats_type=stats_type,
+            source_type=self.source_type,
+        )
+        return FacebookStats(**stats)
 
     # endregion
 
@@ -318,63 +970,127 @@ class FacebookSource(MessageSource):
 
     def _load_message_folders(self) -> None:
         """Load folders containing the messages"""
-        self.folders = [Path(root, d) for root, dirs, _ in os.walk(self._data_path) for d in dirs if d == "inbox"]
+        manifest = self._load_manifest()
+        self.folders = manifest.inboxes
+        self.info_files = manifest.info_files
+        self._chat_files = manifest.chats
         if not self.folders:
             raise NoMessageFilesError('Looks like there is no "inbox" folder with the messages here.')
 
+    def _load_manifest(self) -> ExportManifest:
+        """Gets the manifest of the export from the persistent cache if none of its folders changed since it was
+        created, otherwise discovers the export again. Zip archives are always discovered again, as their directory
+        tree is in memory anyway."""
+        cacheable = self.cache is not None and all(isinstance(r, Path) for r in self._roots)
+        key = f"{self.__class__.__name__}:{self._export_id}:manifest"
+
+        if cacheable:
+            assert self.cache is not None
+            manifest = self.cache.load(key, "")
+            # the manifest is valid if none of the folders it was created from changed
+            if manifest is not None and files_fingerprint(manifest.listed_folders) == manifest.fingerprint:
+                return manifest
+
+        manifest = self._discover()
+        if cacheable:
+            assert self.cache is not None
+            self.cache.save(key, "", manifest)
+        return manifest
+
+    def _discover(self) -> ExportManifest:
+        """Searches the export for the "inbox" folders, the chat folders in them and the info files. Only folders
+        where an "inbox" folder can be are searched: the search doesn't go into the known folders with media,
+        into the "messages" folders (except for their "inbox") or deeper than MAX_INBOX_DEPTH.
+
+        :return: manifest of the export
+        """
+        listed: list[ExportPath] = []
+        inboxes: list[ExportPath] = []
+        info_files: list[ExportPath] = []
+        chats: dict[ExportPath, list[str]] = {}
+
+        def search(folder: ExportPath, depth: int) -> None:
+            listed.append(folder)
+            dirs, files = self._scan_folder(folder)
+            info_files.extend(folder / f for f in files if f in self.info_file_names)
+            for d in dirs:
+                if d == "inbox":
+                    inboxes.append(folder / d)
+                elif depth < MAX_INBOX_DEPTH and d not in SKIPPED_FOLDERS and folder.name != "messages":
+                    search(folder / d, depth + 1)
+
+        for root in self._roots:
+            search(root, 0)
+
+        for inbox in inboxes:
+            listed.append(inbox)
+            for chat_folder in self._scan_folder(inbox)[0]:
+                path_to_chat_folder = inbox / chat_folder
+                listed.append(path_to_chat_folder)
+                chats[path_to_chat_folder] = [
+                    f for f in self._scan_folder(path_to_chat_folder)[1] if f.endswith(".json")
+                ]
+
+        return ExportManifest(listed, files_fingerprint(listed), inboxes, chats, info_files)
+
+    @staticmethod
+    def _scan_folder(folder: ExportPath) -> tuple[list[str], list[str]]:
+        """Lists a folder (on the disk or in a zip archive), the macOS metadata files are left out
+
+        :param folder: path to the folder
+        :return: names of the subfolders and names of the files
+        """
+        dirs: list[str] = []
+        files: list[str] = []
+        if isinstance(folder, Path):
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not is_metadata_file(entry.name):
+                        (dirs if entry.is_dir() else files).append(entry.name)
+        else:
+            for child in folder.iterdir():
+                if not is_metadata_file(child.name):
+                    (dirs if child.is_dir() else files).append(child.name)
+        return dirs, files
+
     def _load_all_chats(self) -> None:
         """Load all chats from the source and get their relevant paths"""
-        for folder in self.folders:
-            for chat_id in list_folder(folder):
-                path_to_chat_folder = Path(f"{folder}/{chat_id}")
-                if any(x.endswith(".json") for x in list_folder(path_to_chat_folder)):
-                    if "_" in chat_id:
-                        chat_id = chat_id.split("_", 1)[1]
-                    else:
-                        # chats with deleted accounts don't contain a name and only consist of the chat ID
-                        continue
-
-                    if chat_id in self.chat_ids:
-                        self.chat_ids[chat_id].append(path_to_chat_folder)
-                    else:
-                        self.chat_ids[chat_id] = [path_to_chat_folder]
+        for path_to_chat_folder, json_files in self._chat_files.items():
+            chat_id = path_to_chat_folder.name
+            if json_files:
+                if "_" in chat_id:
+                    chat_id = chat_id.split("_", 1)[1]
+                else:
+                    # chats with deleted accounts don't contain a name and only consist of the chat ID
+                    continue
+
+                if chat_id in self.chat_ids:
+                    self.chat_ids[chat_id].append(path_to_chat_folder)
+                else:
+                    self.chat_ids[chat_id] = [path_to_chat_folder]
 
     # endregion
 
-    # region Facebook-specific utilities
 
-    @staticmethod
-    def _decode(word: str) -> str:
-        """Decodes a string from the Facebook encoding."""
-        return word.encode("iso-8859-1").decode("utf-8")
+def _init_worker(source: FacebookSource) -> None:
+    """Initializer of the worker processes, which stores the message source for the worker functions"""
+    global _worker_source
+    _worker_source = source
 
-    @staticmethod
-    def _decode_messages(messages: list[Any]) -> list[Any]:
-        """Decodes all messages from the Facebook encoding"""
-        for m in messages:
-            m["sender_name"] = FacebookSource._decode(m["sender_name"])
-            if "content" in m:
-                m["content"] = FacebookSource._decode(m["content"])
-            if "reactions" in m:
-                for r in m["reactions"]:
-                    r["reaction"] = FacebookSource._decode(r["reaction"])
-                    r["actor"] = FacebookSource._decode(r["actor"])
-        return messages
 
-    @staticmethod
-    def _days_list(messages: list[Any]) -> dict[str, int]:
-        """Prepares a dictionary with all days from the first message up to the last one
+def _summarize_chat(chat_id: chat_id_str) -> ChatSummary:
+    """Worker function returning the summary of a chat"""
+    assert _worker_source is not None
+    return _worker_source._summarize_chat(chat_id)
 
-        :param messages: list of messages in the conversation
-        :return: dictionary of days
-        """
-        from_day = date.fromtimestamp(messages[0]["timestamp_ms"] // 1000)
-        to_day = date.fromtimestamp(messages[-1]["timestamp_ms"] // 1000)
-        delta = to_day - from_day
-        days = {}
-        for i in range(delta.days + 1):
-            day = from_day + timedelta(days=i)
-            days[str(day)] = 0
-        return days
 
-    # endregion
+def _personal_chat_stats(chat_id: chat_id_str, name: str) -> FacebookStats | None:
+    """Worker function returning the stats of the user's messages in a chat"""
+    assert _worker_source is not None
+    return _worker_source._personal_chat_stats(chat_id, name)
+
+
+def _index_chat(chat_id: chat_id_str) -> ChatSegment:
+    """Worker function returning the search index of a chat"""
+    assert _worker_source is not None
+    return _worker_source._index_chat(chat_id)
@@ -1,118 +1,76 @@
-from datetime import date, datetime
-from typing import Any
+from functools import partial
+from typing import Any, Sequence
 
-from chats.stats import FacebookStats, Times, StatsType, SourceType
+from chats.accumulators import (
+    FACEBOOK_MEDIA,
+    EmojisAccumulator,
+    LengthsAccumulator,
+    MediaAccumulator,
+    PeopleAccumulator,
+    ReactionsAccumulator,
+    RepliesAccumulator,
+    SessionsAccumulator,
+    StatsEngine,
+    TimesAccumulator,
+    VocabularyAccumulator,
+)
+from chats.message_table import MessageKind
+from chats.sessions import SESSION_GAP
+from chats.stats import SourceType
 from sources.facebook_source import FacebookSource
-from utils.const import HOURS_DICT
+from utils.cache import StatsCache
 
 
 class Instagram(FacebookSource):
-    def __init__(self, path: str):
-        FacebookSource.__init__(self, path)
+    stats_engine = StatsEngine(
+        [
+            TimesAccumulator,
+            PeopleAccumulator,
+            # GIFs are exported as shared links (see _message_kind) and stickers and files aren't analyzed
+            partial(MediaAccumulator, kinds={**FACEBOOK_MEDIA, "stickers": None, "files": None}),
+            EmojisAccumulator,
+            VocabularyAccumulator,
+            ReactionsAccumulator,
+            LengthsAccumulator,
+            RepliesAccumulator,
+            SessionsAccumulator,
+        ]
+    )
+
+    def __init__(
+        self,
+        path: str | Sequence[str],
+        streaming: bool = False,
+        workers: int = 1,
+        cache: StatsCache | None = None,
+        incremental: bool = False,
+        timezone: str | None = None,
+        chat_timezones: dict[str, str] | None = None,
+        session_gap: int = SESSION_GAP,
+    ):
+        FacebookSource.__init__(
+            self, path, streaming, workers, cache, incremental, timezone, chat_timezones, session_gap
+        )
         self.source_type = SourceType.INSTAGRAM
 
-    def _process_messages(
-        self, messages: list[Any], participants: list[str], title: str, stats_type: StatsType = None
-    ) -> FacebookStats:
-        """Processes the messages, produces raw stats and stores them in a Chat object.
+    @staticmethod
+    def _message_kind(message: dict[Any, Any]) -> MessageKind:
+        """Determines the kind of a message. Instagram exports GIFs as shared links and stickers and files
+        aren't analyzed at all.
 
-        :param messages: list of messages to process
-        :param participants: list of the chat participants
-        :param title: title of the chat
-        :param stats_type: type of stats (regular / group chat / overall personal)
-        :return: FacebookMessengerChat with the processed chats
+        :param message: decoded message
+        :return: kind of the message
         """
-        from_day = date.fromtimestamp(messages[0]["timestamp_ms"] // 1000)
-        to_day = date.fromtimestamp(messages[-1]["timestamp_ms"] // 1000)
-        people = {"total": 0}
-        photos = {"total": 0}
-        gifs = {"total": 0}
-        stickers = {"total": 0}
-        videos = {"total": 0}
-        audios = {"total": 0}
-        files = {"total": 0}
-        reactions: Any = {"total": 0, "types": {}, "gave": {}, "got": {}}
-        emojis: Any = {"total": 0, "types": {}, "sent": {}}
-        message_lengths: dict[str, list[int]] = {}  # list of message lengths (in words) from a given person
-
-        days = self._days_list(messages)
-        months: dict[str, int] = {}
-        years: dict[str, int] = {}
-        weekdays: dict[int, int] = {}
-        hours = HOURS_DICT.copy()
-
-        for n in participants:
-            people[n] = 0
-            reactions["gave"][n] = {"total": 0}
-            reactions["got"][n] = {"total": 0}
-            emojis["sent"][n] = {"total": 0}
-            message_lengths[n] = []
-
-        for m in messages:
-            name = m["sender_name"]
-            day = date.fromtimestamp(m["timestamp_ms"] // 1000)
-            days[str(day)] += 1
-            month = f"{day.month}/{day.year}"
-            months[month] = 1 + months.get(month, 0)
-            year = f"{day.year}"
-            years[year] = 1 + years.get(year, 0)
-            weekday = date.fromtimestamp(m["timestamp_ms"] // 1000).isoweekday()
-            weekdays[weekday] = 1 + weekdays.get(weekday, 0)
-            hour = datetime.fromtimestamp(m["timestamp_ms"] // 1000).hour
-            hours[hour] += 1
-            people["total"] += 1
-            if name in participants:
-                people[name] = 1 + people.get(name, 0)
-            if "content" in m:
-                if name in participants:
-                    emojis = self._extract_emojis(m, emojis)
-                    # kept here for later
-                    # words_cnt = len(regex.findall(r"(\b[^\s]+\b)", m["content"]))  # length of the message in words
-                    # message_lengths[name].append(words_cnt)
-            elif "photos" in m:
-                photos["total"] += 1
-                if name in participants:
-                    photos[name] = 1 + photos.get(name, 0)
-            elif "share" in m:
-                if "link" in m["share"] and m["share"]["link"].endswith("gif"):
-                    gifs["total"] += 1
-                    if name in participants:
-                        gifs[name] = 1 + gifs.get(name, 0)
-            elif "videos" in m:
-                videos["total"] += 1
-                if name in participants:
-                    videos[name] = 1 + videos.get(name, 0)
-            elif "audio_files" in m:
-                audios["total"] += 1
-                if name in participants:
-                    audios[name] = 1 + audios.get(name, 0)
-            if "reactions" in m:
-                reactions = self._process_reactions(m, name, participants, reactions)
-
-        times = Times(hours, days, weekdays, months, years)
-
-        # kept here for later, but beware - mean requires at least one datapoint
-        # avg_message_lengths = {name: round(mean(lengths), 2) for name, lengths in message_lengths.items()}
-        # longest_message = {name: sorted(lengths)[-1] for name, lengths in message_lengths.items()}
-
-        return FacebookStats(
-            messages,
-            photos,
-            gifs,
-            stickers,
-            videos,
-            audios,
-            files,
-            reactions,
-            emojis,
-            times,
-            from_day,
-            to_day,
-            people,
-            participants,
-            title,
-            None,
-            None,
-            stats_type,
-            self.source_type,
-        )
+        if "content" in message:
+            return MessageKind.CONTENT
+        elif "photos" in message:
+            return MessageKind.PHOTOS
+        elif "share" in message:
+            if "link" in message["share"] and message["share"]["link"].endswith("gif"):
+                return MessageKind.GIFS
+            return MessageKind.SHARE
+        elif "videos" in message:
+            return MessageKind.VIDEOS
+        elif "audio_files" in message:
+            return MessageKind.AUDIO
+        return MessageKind.OTHER
@@ -32,3 +32,7 @@ class MessageSource(abc.ABC):
 
         :param chat: name of the conversation / chat ID
         """
+
+    def close(self) -> None:
+        """Saves the data whose saving is deferred (e.g. to the persistent cache) and releases the opened files,
+        it's called when the source is no longer used"""
@@ -1,15 +1,28 @@
 import datetime
 import regex
-import emoji
-from collections import defaultdict
-from typing import Any
+from dataclasses import fields
+from itertools import chain
+from typing import Any, Callable
 
 import dateparser
 
-from chats.stats import Times, SourceType, StatsType
+from chats.accumulators import (
+    ChatContext,
+    EmojisAccumulator,
+    PeopleAccumulator,
+    RepliesAccumulator,
+    SessionsAccumulator,
+    StatsEngine,
+    TimesAccumulator,
+    VocabularyAccumulator,
+)
+from chats.message_table import MessageKind, MessageTableBuilder
+from chats.sessions import SESSION_GAP
+from chats.stats import SourceType, StatsType
+from chats.time_buckets import load_timezone
 from sources.message_source import MessageSource
+from sources.whatsapp_dates import DateParser
 from chats.stats import Stats
-from utils.const import EMOJIS_REGEX, EMOJIS_DICT, TRANSLATE_REMOVE_LETTERS
 
 
 # WhatsApp export files can have different formats including different delimiters. These two patterns
@@ -25,9 +38,28 @@ WHATSAPP_CHAT_NAME_REGEX = regex.compile(r"WhatsApp Chat with (.+)")
 class WhatsApp(MessageSource):
     """WhatsApp message source for a single conversation (file)."""
 
-    def __init__(self, path: str):
+    # the export only has the text of the messages, without any media or reactions
+    stats_engine = StatsEngine(
+        [
+            TimesAccumulator,
+            PeopleAccumulator,
+            EmojisAccumulator,
+            VocabularyAccumulator,
+            RepliesAccumulator,
+            SessionsAccumulator,
+        ]
+    )
+
+    def __init__(self, path: str, timezone: str | None = None, session_gap: int = SESSION_GAP):
+        """
+        :param path: path to the exported text file
+        :param timezone: IANA name of the time zone of the export (e.g. "Europe/Prague"), the times in the file
+                         don't say which one it is. The local time zone of the machine if None or empty.
+        :param session_gap: longest gap between two messages of one session of the chat in seconds
+        """
         MessageSource.__init__(self, path)
-        self._regex_emoji = regex.compile(EMOJIS_REGEX)
+        self.timezone = load_timezone(timezone)
+        self.session_gap = session_gap
 
         self._messages = self._process_messages()
 
@@ -55,103 +87,67 @@ class WhatsApp(MessageSource):
         with open(self._data_path, "r", encoding="utf-8") as f:
             lines = f.readlines()
 
-        name = ""
-        participants = set()
-        people: dict[str, int] = defaultdict(int)
-        emojis: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
-
-        days: dict[str, int] = defaultdict(int)
-        months: dict[str, int] = defaultdict(int)
-        years: dict[str, int] = defaultdict(int)
-        weekdays: dict[int, int] = defaultdict(int)
-        hours: dict[int, int] = defaultdict(int)
-        dates = []
+        # the format of the dates is inferred from the lines with messages first, parsing every date
+        # by dateparser would take minutes for large chats
+        matches = [self._match_line(line) for line in lines]
+        date_parser = DateParser.infer([m.group(1) for m in matches if m])
 
-        for line in lines:
-            ret = self._parse_line(line)
+        messages: list[dict[str, Any]] = []
+        for line, match in zip(lines, matches):
+            ret = self._parse_line(line, date_parser.parse, match) if match else None
 
             if ret:
                 dt, name, message = ret
-
-                dates.append(dt.date())
-                days[str(dt.date())] += 1
-                months[f"{dt.month}/{dt.year}"] += 1
-                years[str(dt.year)] += 1
-                weekdays[dt.isoweekday()] += 1
-                hours[int(dt.hour)] += 1
-
-                people["total"] += 1
-                people[name] += 1
-                participants.add(name)
-
-            data = line.translate(TRANSLATE_REMOVE_LETTERS)
-
-            text_emoji = self._regex_emoji.search(data)
-            if text_emoji:
-                data += "".join([EMOJIS_DICT[e] for e in text_emoji.groups()])
-
-            # Remaining lines of multiline messages are not matched by the regex (only the first line is)
-            # but their content is still analyzed for emoji and the emoji are attributed to the last name
-            # matched by the regex. There might be some edge case that will break this, but it works for now.
-            for c in data:
-                if c in emoji.EMOJI_DATA:
-                    emojis["total"]["total"] += 1
-                    emojis["total"][c] += 1
-                    emojis[name]["total"] += 1
-                    emojis[name][c] += 1
-
-        times = Times(hours, days, weekdays, months, years)
+                if dt.tzinfo is None and self.timezone is not None:
+                    dt = dt.replace(tzinfo=self.timezone)
+                messages.append({"timestamp_ms": int(dt.timestamp() * 1000), "sender_name": name, "content": message})
+            elif messages:
+                # Remaining lines of multiline messages are not matched by the regex (only the first line is),
+                # they are added to the content of the last message matched by the regex.
+                messages[-1]["content"] += "\n" + line.rstrip("\n")
+
+        table = MessageTableBuilder(lambda _: MessageKind.CONTENT).extend(messages).build()
+        participants = list(dict.fromkeys(m["sender_name"] for m in messages))
         stats_type = StatsType.PERSONAL if len(participants) == 2 else StatsType.GROUP
+        title = self._get_chat_name()
 
-        return Stats(
-            messages=None,
-            photos=None,
-            gifs=None,
-            stickers=None,
-            videos=None,
-            audios=None,
-            files=None,
-            reactions=None,
-            emojis=self._reshape_emoji_dict(emojis),
-            times=times,
-            from_day=dates[0],
-            to_day=dates[-1],
-            people=people,
-            participants=list(participants),
-            title=self._get_chat_name(),
-            nicknames=None,
-            group_names=None,
-            stats_type=stats_type,
-            source_type=SourceType.WHATSAPP,
-        )
+        # the fields without an accumulator are None
+        stats: dict[str, Any] = dict.fromkeys(f.name for f in fields(Stats))
+        chat = ChatContext(participants, title, stats_type, timezone=self.timezone, session_gap=self.session_gap)
+        stats.update(self.stats_engine.run(table, chat))
+        stats.update(participants=participants, title=title, stats_type=stats_type, source_type=SourceType.WHATSAPP)
+        return Stats(**stats)
 
     @staticmethod
-    def _reshape_emoji_dict(emoji_dict: dict[Any, Any]) -> dict[Any, Any]:
-        """Change the dict structure to be the same as used in the rest of the program.
-
-        :param emoji_dict: dict with emoji to restructure
-        :return: restructured dict
-        """
-        return {
-            "total": emoji_dict["total"]["total"],
-            "types": {k: v for k, v in emoji_dict["total"].items() if k != "total"},
-            "sent": {k: dict(v) for k, v in emoji_dict.items() if k != "total"}
-        }
+    def _match_line(line: str) -> regex.Match[str] | None:
+        """Matches a line with the first of the regexes that match it, see _parse_line"""
+        for pattern in WHATSAPP_REGEXES:
+            m = pattern.match(line)
+            if m:
+                return m
+        return None
 
     @staticmethod
-    def _parse_line(line: str) -> tuple[datetime.datetime, str, str] | None:
+    def _parse_line(
+        line: str,
+        parse_date: Callable[[str], datetime.datetime | None] = dateparser.parse,
+        match: regex.Match[str] | None = None,
+    ) -> tuple[datetime.datetime, str, str] | None:
         """Try parsing a date, name and message from a line. Since the lines can have different formats,
         the function tries matching using different regexes.
 
         :param line: Line to parse.
+        :param parse_date: Function parsing the date, e.g. DateParser.parse.
+        :param match: Match of the line by _match_line, if the line was already matched. It's tried first and
+            the line is only matched by the other regexes if its date could not be parsed.
         :return: Return a tuple of (datetime object, name, message) if the message was successfully parsed. If no
             regex matched the string or the date could not be parsed, None is returned.
         """
-        for pattern in WHATSAPP_REGEXES:
-            m = regex.match(pattern, line)
+        other_matches = (p.match(line) for p in WHATSAPP_REGEXES if match is None or p is not match.re)
+        for m in chain([match], other_matches):
             if m:
                 datetime_str, name, message = m.groups()
-                dt = dateparser.parse(datetime_str)  # try parsing the extracted date string
+                dt = parse_date(datetime_str)  # try parsing the extracted date string
 
                 if dt is not None:
                     return dt, name, message
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import datetime
+from collections import Counter
+from functools import lru_cache
+from typing import NamedTuple
+
+import dateparser
+import regex
+
+# dates and times of the messages in the formats of the exports we've seen, e.g. "3/30/24, 15:55",
+# "13.06.2023, 18:08:08", "2023-06-13 18:08" or "1/2/23, 3:04 PM"
+DATETIME_REGEX = regex.compile(
+    r"^(\d{1,4})([./-])(\d{1,2})\2(\d{1,4}),?\s+(\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?(?:\s*([AaPp])\.?\s?[Mm]\.?)?$"
+)
+
+# number of the dates from which the format of an export is inferred
+SAMPLE_SIZE = 2000
+
+# number of the last parsed dates that are cached
+CACHE_SIZE = 4096
+
+
+class DateFormat(NamedTuple):
+    order: str  # order of the day, month and year, e.g. "DMY"
+    separator: str  # separator of the day, month and year
+    seconds: bool  # whether the times have seconds
+    twelve_hour: bool  # whether the times are in the 12-hour format (with AM/PM)
+
+
+def infer_date_format(dates: list[str]) -> DateFormat | None:
+    """Infers the format of the dates of an export. The day and the month are told apart by the dates in which
+    one of them is greater than 12, the month comes first if there are no such dates (as in dateparser).
+
+    :param dates: sample of the dates of the messages
+    :return: the most common format of the dates, None if none of them is in a known format
+    """
+    matches = [m.groups() for m in map(DATETIME_REGEX.match, dates) if m]
+    if not matches:
+        return None
+
+    shapes = Counter((len(m[0]) == 4, m[1], m[6] is not None, m[7] is not None) for m in matches)
+    year_first, separator, seconds, twelve_hour = shapes.most_common(1)[0][0]
+    if year_first:
+        order = "YMD"
+    elif any(int(m[0]) > 12 for m in matches):
+        order = "DMY"
+    else:
+        order = "MDY"
+    return DateFormat(order, separator, seconds, twelve_hour)
+
+
+class DateParser:
+    """Parses the dates of the messages of an export. The dates in the export's format (see infer_date_format)
+    are parsed directly, the rest by dateparser, which is much slower. The recently parsed dates are cached, as
+    the messages sent in the same minute follow each other."""
+
+    def __init__(self, date_format: DateFormat | None) -> None:
+        """
+        :param date_format: format of the dates, None to parse all dates by dateparser
+        """
+        self.format = date_format
+        self.parse = lru_cache(maxsize=CACHE_SIZE)(self._parse)
+
+    @classmethod
+    def infer(cls, dates: list[str]) -> DateParser:
+        """Creates a parser for the format of the dates of an export
+
+        :param dates: all dates of the messages, the format is inferred from a sample spread over them
+        """
+        return cls(infer_date_format(dates[:: max(1, len(dates) // SAMPLE_SIZE)]))
+
+    def _parse(self, text: str) -> datetime.datetime | None:
+        """Parses a date, it's available cached as parse
+
+        :param text: the date with the time
+        :return: naive datetime (unless the date is parsed by dateparser and has a time zone), None if the date
+                 can't be parsed
+        """
+        dt = self._parse_format(text)
+        return dt if dt is not None else dateparser.parse(text)
+
+    def _parse_format(self, text: str) -> datetime.datetime | None:
+        """Parses a date in the format of the export, None if it's in a different format"""
+        date_format = self.format
+        m = DATETIME_REGEX.match(text) if date_format is not None else None
+        if date_format is None or m is None:
+            return None
+        first, separator, second, third, hour, minute, seconds, half = m.groups()
+        shape = (len(first) == 4, separator, seconds is not None, half is not None)
+        if shape != (date_format.order == "YMD", date_format.separator, date_format.seconds, date_format.twelve_hour):
+            return None
+
+        fields = dict(zip(date_format.order, (int(first), int(second), int(third))))
+        year = fields["Y"]
+        if year < 100:
+            year += 1900 if year >= 69 else 2000  # as in strptime
+        hours = int(hour)
+        if half is not None:
+            hours = hours % 12 + (12 if half in "Pp" else 0)
+        try:
+            return datetime.datetime(year, fields["M"], fields["D"], hours, int(minute), int(seconds or 0))
+        except ValueError:
+            return None
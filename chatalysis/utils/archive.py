@@ -0,0 +1,169 @@
+from __future__ import annotations
+import io
+import os
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Any, IO, Iterator, NamedTuple, Union
+
+
+class ArchiveStat(NamedTuple):
+    """Subset of os.stat_result available for the members of zip archives"""
+
+    st_size: int
+    st_mtime: float
+    st_mtime_ns: int
+    st_ctime: float
+
+
+class ZipExport:
+    """Zip archive with (a part of) an export of the messages. Only the central directory of the archive is read
+    when it's opened and the members are read directly from the archive when they are needed, so nothing has to be
+    extracted to the disk."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path).resolve()
+        self._zip: zipfile.ZipFile | None = None  # opened on the first read in each process
+        self._zip_pid: int | None = None
+
+        with zipfile.ZipFile(self.path) as zf:
+            self._members = {i.filename.rstrip("/"): i for i in zf.infolist()}
+
+        # directory tree of the archive (directories don't need to have their own entries in zip files)
+        self._children: dict[str, dict[str, None]] = {"": {}}
+        for name, info in self._members.items():
+            if info.is_dir():
+                self._children.setdefault(name, {})
+            parent, _, child = name.rpartition("/")
+            while True:
+                siblings = self._children.setdefault(parent, {})
+                if child in siblings:
+                    break
+                siblings[child] = None
+                if not parent:
+                    break
+                parent, _, child = parent.rpartition("/")
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Leaves out the opened archive, so that every process opens its own"""
+        state = self.__dict__.copy()
+        state.update(_zip=None, _zip_pid=None)
+        return state
+
+    @property
+    def root(self) -> ArchivePath:
+        return ArchivePath(self, "")
+
+    def is_dir(self, name: str) -> bool:
+        return name in self._children
+
+    def list_dir(self, name: str) -> list[str]:
+        return list(self._children[name])
+
+    def open(self, name: str) -> IO[str]:
+        """Opens a member of the archive as a text file"""
+        # forked processes would share the position in the file with the parent, so they open the archive again
+        if self._zip is None or self._zip_pid != os.getpid():
+            self._zip = zipfile.ZipFile(self.path)
+            self._zip_pid = os.getpid()
+        return io.TextIOWrapper(self._zip.open(self._members[name]), encoding="utf-8")
+
+    def close(self) -> None:
+        """Closes the archive file opened by open, it's opened again by the next read"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+            self._zip_pid = None
+
+    def stat(self, name: str) -> ArchiveStat:
+        """Gets the size and the modification time of a member. Directories without their own entries get
+        the modification time of their newest member."""
+        if name in self._members and not self.is_dir(name):
+            info = self._members[name]
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            return ArchiveStat(info.file_size, mtime, int(mtime) * 10**9, mtime)
+
+        if name in self._members:
+            mtime = time.mktime(self._members[name].date_time + (0, 0, -1))
+        else:
+            prefix = f"{name}/" if name else ""
+            mtime = max((self.stat(f"{prefix}{c}").st_mtime for c in self._children[name]), default=0)
+        return ArchiveStat(0, mtime, int(mtime) * 10**9, mtime)
+
+    def crc32(self, name: str) -> int:
+        """Gets the CRC-32 checksum of the content of a member, it's stored in the central directory"""
+        return self._members[name].CRC
+
+
+class ArchivePath:
+    """Path to a file or a directory inside a zip archive, it supports the subset of the Path interface
+    needed for reading the messages"""
+
+    def __init__(self, archive: ZipExport, name: str) -> None:
+        self.archive = archive
+        self._name = name
+
+    def __truediv__(self, other: str) -> ArchivePath:
+        return ArchivePath(self.archive, f"{self._name}/{other}" if self._name else other)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ArchivePath) and other.archive is self.archive and other._name == self._name
+
+    def __hash__(self) -> int:
+        return hash((id(self.archive), self._name))
+
+    def __str__(self) -> str:
+        if not self._name:
+            return str(self.archive.path)
+        return os.path.join(self.archive.path, *self._name.split("/"))
+
+    def __repr__(self) -> str:
+        return f"ArchivePath({str(self)!r})"
+
+    @property
+    def name(self) -> str:
+        return self._name.rpartition("/")[2]
+
+    @property
+    def parent(self) -> ArchivePath:
+        return ArchivePath(self.archive, self._name.rpartition("/")[0])
+
+    def is_dir(self) -> bool:
+        return self.archive.is_dir(self._name)
+
+    def iterdir(self) -> Iterator[ArchivePath]:
+        for child in self.archive.list_dir(self._name):
+            yield self / child
+
+    def open(self, mode: str = "r") -> IO[str]:
+        if mode != "r":
+            raise ValueError("Archives can only be opened for reading text")
+        return self.archive.open(self._name)
+
+    def stat(self) -> ArchiveStat:
+        return self.archive.stat(self._name)
+
+    def crc32(self) -> int:
+        return self.archive.crc32(self._name)
+
+
+# path to a file of an export, either on the disk or in a zip archive
+ExportPath = Union[Path, ArchivePath]
+
+
+def crc32(path: ExportPath) -> int:
+    """Computes the CRC-32 checksum of the content of a file, for the members of zip archives it's only read
+    from the archive, so the checksum is the same for a file on the disk and for the same file in an archive
+
+    :param path: path to the file
+    :return: the checksum
+    """
+    if not isinstance(path, os.PathLike):
+        return path.crc32()
+
+    checksum = 0
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            checksum = zlib.crc32(block, checksum)
+    return checksum
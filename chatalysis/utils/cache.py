@@ -0,0 +1,83 @@
+import appdirs
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Iterable
+
+from __init__ import __version__
+from utils.archive import ExportPath, crc32
+
+# bump whenever the format of the cached objects changes, which invalidates all existing entries
+CACHE_VERSION = 12
+
+cache_dir_current = Path(appdirs.user_cache_dir("Chatalysis")) / "stats"
+
+
+class StatsCache:
+    """Persistent on-disk cache of processed stats. Every entry is stored together with a fingerprint of the files
+    it was computed from and it's only returned while the fingerprint matches, i.e. while none of the files changed.
+    Entries written by a different version of the program or of the cache format are ignored."""
+
+    def __init__(self, cache_dir: Path = cache_dir_current) -> None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._cache_dir = cache_dir
+
+    def load(self, key: str, fingerprint: str) -> Any:
+        """Loads a cached value
+
+        :param key: key of the entry
+        :param fingerprint: fingerprint of the current state of the source files
+        :return: the cached value or None if there is no valid entry
+        """
+        try:
+            with open(self._entry_path(key), "rb") as f:
+                version, entry_fingerprint, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+            return None
+
+        if version != (CACHE_VERSION, __version__) or entry_fingerprint != fingerprint:
+            return None
+        return value
+
+    def save(self, key: str, fingerprint: str, value: Any) -> None:
+        """Saves a value to the cache, replacing the previous entry with the same key
+
+        :param key: key of the entry
+        :param fingerprint: fingerprint of the source files the value was computed from
+        :param value: picklable value to save
+        """
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(((CACHE_VERSION, __version__), fingerprint, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # replace atomically, so that an interrupted write can't corrupt the entry
+
+    def _entry_path(self, key: str) -> Path:
+        return self._cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pickle"
+
+
+def files_fingerprint(paths: Iterable[ExportPath]) -> str:
+    """Creates a fingerprint of files from their paths, sizes and modification times
+
+    :param paths: paths to the files (on the disk or in zip archives)
+    :return: hex digest identifying the current state of the files
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = path.stat()
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def files_content_fingerprint(paths: Iterable[ExportPath]) -> str:
+    """Creates a fingerprint of files from their names, sizes and checksums of their content. Unlike
+    files_fingerprint, it doesn't depend on where the files are or when they were modified, so identical files
+    from another (e.g. newer) export of the same account have the same fingerprint.
+
+    :param paths: paths to the files (on the disk or in zip archives)
+    :return: hex digest identifying the content of the files
+    """
+    # the order of the files doesn't matter, the same files can be found in a different order in another export
+    entries = sorted(f"{path.name}\0{path.stat().st_size}\0{crc32(path):08x}\n" for path in paths)
+    return hashlib.sha1("".join(entries).encode("utf-8", "surrogateescape")).hexdigest()
@@ -16,6 +16,19 @@ class Config:
     DEFAULT_CONFIG: Dict[str, Any] = {
         "General": {},
         "Source_dirs": {"messenger": os.getcwd(), "instagram": os.getcwd(), "whatsapp": os.getcwd()},
+        # the session gap is in minutes, the incremental mode is opt-in, as it reads the whole content of the chats'
+        # files to recognize them in a newer export
+        "Analysis": {
+            "streaming": "no",
+            "workers": "1",
+            "cache": "yes",
+            "incremental": "no",
+            "timezone": "",
+            "session_gap": "60",
+        },
+        # time zones of the sources (e.g. "messenger = Europe/Prague") and of their individual chats
+        # (e.g. "messenger/<chat ID> = America/New_York") that differ from the one in Analysis
+        "Timezones": {},
         "dev": {"print_stacktrace": "no"},
     }
 
@@ -61,6 +74,14 @@ class Config:
             val = self._parser[section].getboolean(item) if is_bool else self._parser[section][item]
         return val
 
+    def items(self, section: str) -> Dict[str, str]:
+        """Loads all items of a section, for sections whose items aren't known in advance
+
+        :param section: name of the config section
+        :returns: dict with the values of the items, empty if the section doesn't exist
+        """
+        return dict(self._parser[section]) if self._parser.has_section(section) else {}
+
     def _create(self) -> None:
         """Create the config file and initialize it with default values"""
         config_dir = self._config_file.parent.parent
@@ -4,6 +4,7 @@ import requests
 import webbrowser
 from pathlib import Path
 
+from utils.archive import ExportPath
 from utils.const import TRANSLATE_SPECIAL_CHARS
 from __init__ import __version__
 from paths import OUTPUT_DIR
@@ -14,6 +15,17 @@ def html_spaces(n: int) -> str | int:
     return "{0:n}".format(n) if n != 1 else n
 
 
+def html_duration(seconds: float) -> str:
+    """Formats a duration in seconds as seconds, minutes, hours or days (e.g. "45 s", "3 min", "2.5 h", "12 days")"""
+    if seconds < 60:
+        return f"{round(seconds)} s"
+    if seconds < 3600:
+        return f"{round(seconds / 60)} min"
+    if seconds < 2 * 86400:
+        return f"{round(seconds / 3600, 1):n} h"
+    return f"{round(seconds / 86400)} days"
+
+
 def open_html(path: str | Path) -> None:
     """Opens the HTML file in a browser
 
@@ -44,17 +56,19 @@ def change_name(name: str) -> str:
     return name.translate(TRANSLATE_SPECIAL_CHARS).lower()
 
 
-def list_folder(path: Path) -> list[str]:
+def list_folder(path: ExportPath) -> list[str]:
     """Lists the names of all files / subdirectories in a directory excluding the 'DS_Store' files from macOS.
 
-    :param path: path to the directory
+    :param path: path to the directory (on the disk or in a zip archive)
     :return: list of strings with the file names
     """
-    return [
-        str(folder)
-        for folder in os.listdir(path)
-        if str(folder).find("DS_Store") == -1 and str(folder).find("._") == -1
-    ]
+    names = os.listdir(path) if isinstance(path, os.PathLike) else [p.name for p in path.iterdir()]
+    return [str(folder) for folder in names if not is_metadata_file(str(folder))]
+
+
+def is_metadata_file(name: str) -> bool:
+    """Checks whether a file is one of the metadata files created by macOS ('DS_Store' and '._' files)"""
+    return name.find("DS_Store") != -1 or name.find("._") != -1
 
 
 def is_latest_version() -> bool:
@@ -77,10 +91,13 @@ def download_latest() -> None:
     webbrowser.open(f"https://github.com/stepva/chatalysis/archive/refs/tags/{latest}.zip")
 
 
-def creation_date(path_to_file: Path) -> float:
+def creation_date(path_to_file: ExportPath) -> float:
     """Get the date when a file was created or, if that isn't possible, the time it was last modified.
     Note: stolen from the internets. See http://stackoverflow.com/a/39501288/1709587 for explanation.
     """
+    if not isinstance(path_to_file, os.PathLike):
+        # zip archives only store the modification times
+        return path_to_file.stat().st_mtime
     if sys.platform == "win32" or sys.platform == "cygwin":
         return os.path.getctime(path_to_file)
     else:
@@ -0,0 +1,128 @@
+from functools import partial
+
+from chatalysis.chats.accumulators import (
+    FACEBOOK_MEDIA,
+    ChatContext,
+    EmojisAccumulator,
+    MediaAccumulator,
+    PeopleAccumulator,
+    ReactionsAccumulator,
+    RepliesAccumulator,
+    SessionsAccumulator,
+    StatsEngine,
+    SystemMessagesAccumulator,
+)
+from chatalysis.chats.message_table import MessageKind, MessageTableBuilder
+from chatalysis.chats.stats import StatsType
+
+
+def _classify(message: dict) -> MessageKind:
+    return MessageKind.CONTENT if "content" in message else MessageKind.PHOTOS
+
+
+MESSAGES = [
+    {"sender_name": "Bob", "timestamp_ms": 10, "content": "ahoj 😀", "reactions": [{"reaction": "❤", "actor": "Eve"}]},
+    {"sender_name": "Eve", "timestamp_ms": 20, "photos": [{"uri": "a.jpg"}]},
+    {
+        "sender_name": "Eve",
+        "timestamp_ms": 30,
+        "content": "Eve set the nickname for Bob to 😀.",
+        "reactions": [{"reaction": "👍", "actor": "Bob"}],
+    },
+]
+CHAT = ChatContext(["Bob", "Eve"], "Bob", StatsType.REGULAR, user_name="Eve")
+
+
+def test_engine():
+    table = MessageTableBuilder(_classify).extend(MESSAGES).build()
+    engine = StatsEngine(
+        [PeopleAccumulator, MediaAccumulator, SystemMessagesAccumulator, EmojisAccumulator, ReactionsAccumulator]
+    )
+    stats = engine.run(table, CHAT)
+
+    assert stats["people"] == {"total": 3, "Bob": 1, "Eve": 2}
+    assert stats["photos"] == {"total": 1, "Eve": 1}
+    assert stats["videos"] == {"total": 0}
+    assert stats["nicknames"] == [{"timestamp": 30, "target": "Bob", "nickname": "😀", "changed_by": "Eve"}]
+    # the nickname change is a system message, so its emoji and its reactions aren't counted
+    assert stats["emojis"] == {
+        "total": 1,
+        "types": {"😀": 1},
+        "sent": {"Bob": {"total": 1, "😀": 1}, "Eve": {"total": 0}},
+    }
+    assert stats["reactions"]["types"] == {"❤️": 1}
+    assert stats["reactions"]["got"]["Bob"] == {"total": 1, "❤️": 1}
+    assert stats["group_names"] == [] and stats["members"] == [] and stats["calls"] == {"total": 0}
+    assert "times" not in stats
+
+
+def test_disabled_kinds():
+    table = MessageTableBuilder(_classify).extend(MESSAGES).build()
+    engine = StatsEngine([partial(MediaAccumulator, kinds={**FACEBOOK_MEDIA, "photos": None})])
+
+    assert engine.run(table, CHAT)["photos"] == {"total": 0}
+
+
+def test_reactions():
+    messages = [
+        {"sender_name": "Bob", "timestamp_ms": 10, "content": "a", "reactions": [{"reaction": "❤", "actor": "Eve"}]},
+        {
+            "sender_name": "Eve",
+            "timestamp_ms": 20,
+            "content": "b",
+            "reactions": [{"reaction": "❤️", "actor": "Bob"}, {"reaction": "👍", "actor": "Ann"}],
+        },
+        {"sender_name": "Ann", "timestamp_ms": 30, "content": "c", "reactions": [{"reaction": "👍", "actor": "Bob"}]},
+    ]
+    table = MessageTableBuilder(_classify).extend(messages).build()
+    reactions = StatsEngine([ReactionsAccumulator]).run(table, CHAT)["reactions"]
+
+    # Ann isn't a participant, so the reactions of Ann and to the messages of Ann are only counted in the totals
+    # and the types
+    assert reactions["total"] == 4
+    assert reactions["types"] == {"❤️": 2, "👍": 2}
+    assert reactions["got"] == {"Bob": {"total": 1, "❤️": 1}, "Eve": {"total": 2, "❤️": 1, "👍": 1}}
+    assert reactions["gave"] == {"Bob": {"total": 1, "❤️": 1}, "Eve": {"total": 1, "❤️": 1}}
+
+
+def test_batches():
+    messages = [
+        {"sender_name": "Eve", "timestamp_ms": 5_000, "photos": [{"uri": "a.jpg"}]},
+        {
+            "sender_name": "Bob",
+            "timestamp_ms": 10_000,
+            "content": "👍 😀",
+            "reactions": [{"reaction": "👍", "actor": "Eve"}],
+        },
+        {"sender_name": "Eve", "timestamp_ms": 60_000, "content": "Eve set the nickname for Bob to B."},
+        {
+            "sender_name": "Eve",
+            "timestamp_ms": 70_000,
+            "content": "😀",
+            "reactions": [{"reaction": "❤", "actor": "Bob"}],
+        },
+        {"sender_name": "Bob", "timestamp_ms": 90_000, "photos": [{"uri": "b.jpg"}]},
+    ]
+    engine = StatsEngine(
+        [MediaAccumulator, SystemMessagesAccumulator, EmojisAccumulator, ReactionsAccumulator]
+        + [RepliesAccumulator, SessionsAccumulator]
+    )
+    stats = engine.run(MessageTableBuilder(_classify).extend(messages).build(), CHAT)
+    # the messages from the newest, split between the reply of Eve and the message of Bob it replies to
+    batches = [MessageTableBuilder(_classify).extend(b).build() for b in (messages[:1:-1], [], messages[1::-1])]
+    parts, sequential = engine.run_batches(batches, CHAT)
+
+    assert len(parts) == 2 and "replies" not in parts[0] and "sessions" not in parts[0]
+    # the system message is left out, so Eve replied once, after 60 seconds
+    assert sequential["replies"]["Eve"].to["Bob"].count == stats["replies"]["Eve"].to["Bob"].count == 1
+    assert sequential["replies"]["Eve"].times.quantile(0.5) == stats["replies"]["Eve"].times.quantile(0.5)
+    assert sequential["replies"]["Bob"].times.count == stats["replies"]["Bob"].times.count == 2
+    assert sequential["sessions"].durations.count == stats["sessions"].durations.count == 1
+    assert sequential["sessions"].started == stats["sessions"].started == {"Eve": 1}
+
+    # the counts are ordered in the same way regardless of the order of the messages
+    reverse = engine.run(MessageTableBuilder(_classify).extend(messages[::-1]).build(), CHAT)
+    for f in ["photos", "emojis", "reactions", "calls"]:
+        assert repr(reverse[f]) == repr(stats[f])
+    assert list(stats["photos"]) == ["total", "Bob", "Eve"]
+    assert list(stats["emojis"]["types"]) == ["😀", "👍"]
@@ -0,0 +1,81 @@
+import pickle
+import shutil
+import zipfile
+from pathlib import Path
+from chatalysis.utils.archive import ArchivePath, ZipExport, crc32
+from chatalysis.utils.utility import list_folder
+
+data_dir = Path("tests/test_data/archive")
+
+
+def _archive() -> ZipExport:
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / "export.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("messages/inbox/alice_123/message_1.json", (2023, 5, 1, 12, 0, 0)), '{"a": 1}')
+        zf.writestr(zipfile.ZipInfo("messages/inbox/alice_123/message_2.json", (2022, 5, 1, 12, 0, 0)), "{}")
+        zf.writestr(zipfile.ZipInfo("messages/inbox/alice_123/photos/._img.jpg", (2021, 5, 1, 12, 0, 0)), b"\x00")
+        zf.writestr("messages/inbox/bob_456/", b"")
+    return ZipExport(path)
+
+
+def test_tree():
+    archive = _archive()
+    inbox = archive.root / "messages" / "inbox"
+
+    assert inbox.is_dir()
+    assert sorted(list_folder(inbox)) == ["alice_123", "bob_456"]
+    assert sorted(list_folder(inbox / "alice_123")) == ["message_1.json", "message_2.json", "photos"]
+    assert list_folder(inbox / "alice_123" / "photos") == []  # macOS metadata files are skipped
+    assert list_folder(inbox / "bob_456") == []
+    assert (inbox / "bob_456").is_dir()
+    assert not (inbox / "alice_123" / "message_1.json").is_dir()
+
+
+def test_read():
+    archive = _archive()
+    chat = archive.root / "messages" / "inbox" / "alice_123"
+
+    with (chat / "message_1.json").open() as f:
+        assert f.read() == '{"a": 1}'
+    assert (chat / "message_1.json").stat().st_size == 8
+    assert (chat / "message_1.json").stat().st_mtime > (chat / "message_2.json").stat().st_mtime
+    # directories without their own entries get the time of the newest member
+    assert chat.stat().st_mtime == (chat / "message_1.json").stat().st_mtime
+
+    # the paths can be sent to other processes
+    copy = pickle.loads(pickle.dumps(chat / "message_2.json"))
+    assert isinstance(copy, ArchivePath)
+    with copy.open() as f:
+        assert f.read() == "{}"
+
+
+def test_close():
+    archive = _archive()
+    member = archive.root / "messages" / "inbox" / "alice_123" / "message_1.json"
+    with member.open() as f:
+        f.read()
+
+    zf = archive._zip
+    archive.close()
+    assert zf is not None and zf.fp is None and archive._zip is None
+    # the archive is opened again when it's read after closing
+    with member.open() as f:
+        assert f.read() == '{"a": 1}'
+    archive.close()
+
+
+def test_crc32():
+    archive = _archive()
+    member = archive.root / "messages" / "inbox" / "alice_123" / "message_1.json"
+    extracted = data_dir / "message_1.json"
+    extracted.write_text('{"a": 1}')
+
+    # the checksum of a member is read from the archive and it matches the one of the same file on the disk
+    assert crc32(member) == crc32(extracted)
+    assert crc32(member) != crc32(archive.root / "messages" / "inbox" / "alice_123" / "message_2.json")
+
+
+def test_clean_up():
+    # this is a separate function which ensures that the cleanup will happen even if some test fails
+    shutil.rmtree(data_dir, ignore_errors=True)
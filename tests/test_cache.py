@@ -0,0 +1,77 @@
+import os
+import shutil
+from pathlib import Path
+from chatalysis.utils.cache import StatsCache, files_content_fingerprint, files_fingerprint
+
+cache_dir = Path("tests/test_data/cache")
+data_dir = Path("tests/test_data/cache_files")
+
+
+def _write(name: str, content: str) -> Path:
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / name
+    path.write_text(content)
+    return path
+
+
+def test_save_load():
+    cache = StatsCache(cache_dir)
+    assert cache.load("missing", "abc") is None
+
+    cache.save("key", "abc", {"total": 5})
+    assert cache.load("key", "abc") == {"total": 5}
+    assert StatsCache(cache_dir).load("key", "abc") == {"total": 5}
+
+    # an entry computed from different files is not valid
+    assert cache.load("key", "def") is None
+
+    cache.save("key", "def", [1, 2])
+    assert cache.load("key", "def") == [1, 2]
+    assert cache.load("key", "abc") is None
+
+
+def test_corrupted_entry():
+    cache = StatsCache(cache_dir)
+    cache.save("corrupted", "abc", 1)
+    for entry in os.listdir(cache_dir):
+        (cache_dir / entry).write_bytes(b"not a pickle")
+
+    assert cache.load("corrupted", "abc") is None
+
+
+def test_files_fingerprint():
+    file_1 = _write("message_1.json", "{}")
+    file_2 = _write("message_2.json", "{}")
+    fingerprint = files_fingerprint([file_1, file_2])
+
+    assert files_fingerprint([file_1, file_2]) == fingerprint
+    assert files_fingerprint([file_1]) != fingerprint
+
+    # a change of the size or of the modification time changes the fingerprint
+    _write("message_2.json", "{ }")
+    assert files_fingerprint([file_1, file_2]) != fingerprint
+    fingerprint = files_fingerprint([file_1, file_2])
+    os.utime(file_1, (0, 0))
+    assert files_fingerprint([file_1, file_2]) != fingerprint
+
+
+def test_files_content_fingerprint():
+    file_1 = _write("message_1.json", '{"a": 1}')
+    fingerprint = files_content_fingerprint([file_1])
+
+    # the same file in another export (at a different path, modified at a different time) has the same fingerprint
+    copy = data_dir / "newer_export" / "message_1.json"
+    copy.parent.mkdir(parents=True, exist_ok=True)
+    copy.write_text('{"a": 1}')
+    os.utime(copy, (0, 0))
+    assert files_content_fingerprint([copy]) == fingerprint
+
+    # a change of the content with the same size changes it
+    copy.write_text('{"a": 2}')
+    assert files_content_fingerprint([copy]) != fingerprint
+
+
+def test_clean_up():
+    # this is a separate function which ensures that the cleanup will happen even if some test fails
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    shutil.rmtree(data_dir, ignore_errors=True)
@@ -43,6 +43,12 @@ def test_load_boolean():
     assert not config.load("print_stacktrace", "dev", True)
 
 
+def test_items():
+    config.save("messenger/chat_123", "Europe/Prague", "Timezones")
+    assert config.items("Timezones")["messenger/chat_123"] == "Europe/Prague"
+    assert config.items("section_abcd") == {}
+
+
 def test_save():
     # save a value to an already existing item
     config.save("print_stacktrace", "yes", "dev")
@@ -0,0 +1,38 @@
+import numpy as np
+from chatalysis.sources.dedup import MessageDeduplicator, message_hash
+
+MESSAGE = {"sender_name": "Bob", "timestamp_ms": 10, "content": "ahoj"}
+PHOTO = {"sender_name": "Bob", "timestamp_ms": 10, "photos": [{"uri": "messages/inbox/bob_1/photos/1.jpg"}]}
+
+
+def test_message_hash():
+    assert message_hash(MESSAGE) == message_hash(dict(MESSAGE))
+    assert message_hash(MESSAGE) != message_hash({**MESSAGE, "content": "ahoj!"})
+    assert message_hash(MESSAGE) != message_hash({**MESSAGE, "timestamp_ms": 11})
+    assert message_hash(PHOTO) != message_hash(MESSAGE)
+    # the folders of the attachments differ between exports
+    moved = {**PHOTO, "photos": [{"uri": "your_facebook_activity/messages/inbox/bob_1/photos/1.jpg"}]}
+    assert message_hash(PHOTO) == message_hash(moved)
+
+
+def test_deduplicator():
+    dedup = MessageDeduplicator({"newer": ["message_1.json", "message_2.json"], "older": ["message_1.json"]})
+    hashes = np.array([1, 2, 3], dtype=np.int64)
+
+    assert dedup.needed
+    assert dedup.add(hashes, "newer").tolist() == [False, False, False]
+    # files from the same folder are not compared
+    assert dedup.add(np.array([3], dtype=np.int64), "newer").tolist() == [False]
+    assert dedup.add(np.array([0, 2, 3], dtype=np.int64), "older").tolist() == [False, True, True]
+    assert dedup.add(np.array([0, 4], dtype=np.int64), "newer").tolist() == [True, False]
+
+
+def test_export_parts():
+    # the parts of one export hold different files, the third folder is another export
+    folders = {"part1": ["message_1.json"], "part2": ["message_2.json"], "older": ["message_1.json"]}
+    dedup = MessageDeduplicator(folders)
+
+    assert dedup.add(np.array([1, 2], dtype=np.int64), "part1").tolist() == [False, False]
+    assert dedup.add(np.array([2, 3], dtype=np.int64), "part2").tolist() == [False, False]
+    assert dedup.add(np.array([0, 1, 2], dtype=np.int64), "older").tolist() == [False, True, True]
+    assert not MessageDeduplicator({"part1": ["message_1.json"], "part2": ["message_2.json"]}).needed
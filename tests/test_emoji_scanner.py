@@ -0,0 +1,52 @@
+import random
+
+import emoji
+import regex
+
+from chatalysis.chats.emoji_scanner import EmojiScanner
+from chatalysis.utils.const import EMOJIS_DICT, EMOJIS_REGEX, TRANSLATE_REMOVE_LETTERS
+
+scanner = EmojiScanner()
+
+MESSAGES = [
+    "Ahoj, jak se máš? :D",
+    "super 👍🏻👍 díky",
+    "Rodina 👨‍👩‍👧 a 👩🏽‍💻 v práci",
+    "🇨🇿 vs 🇸🇰, skóre 2️⃣:1️⃣ #️⃣",
+    "❤️ <3 ❤ ♥",
+    "😀́ a 👍 🏻 a‍👍",
+    "🏳️‍🌈🏴󠁧󠁢󠁳󠁣󠁴󠁿 🇨🇿🇨",
+    "©️ ® ™ 1⃣",
+    "Příliš žluťoučký kůň úpěl ďábelské ódy 🐴",
+    "Привет 🙂 как дела? :(",
+]
+# pieces of the emoji sequences (ZWJ, skin tones, regional indicators, keycaps...) mixed with letters
+PIECES = ["a", "Ž", " ", "\n", ":D", "<3", ":)", "‍", "️", "⃣", "́", "1", "#", "🏻", "🏽"]
+PIECES += ["👍", "👨", "👩", "👧", "❤", "💻", "🇨", "🇿", "🏳", "🌈", "©", "♥", "🐴"]
+
+
+def _extract_emojis(text: str) -> list[str]:
+    """The emoji extraction that EmojiScanner replaced, for comparison"""
+    data = regex.findall(r"\X", text.translate(TRANSLATE_REMOVE_LETTERS))
+    text_emoji = regex.search(EMOJIS_REGEX, text)
+    if text_emoji:
+        data.extend([EMOJIS_DICT[e] for e in text_emoji.groups()])
+    return [c for c in data if c in emoji.EMOJI_DATA]
+
+
+def test_scan():
+    assert scanner.scan("ahoj") == []
+    assert scanner.scan("Ahoj, jak se máš?") == []
+    assert scanner.scan("super 👍🏻👍") == ["👍🏻", "👍"]
+    assert scanner.scan("🇨🇿 1️⃣ 👨‍👩‍👧") == ["🇨🇿", "1️⃣", "👨‍👩‍👧"]
+    # only the first text emoji is counted, after the Unicode ones
+    assert scanner.scan("❤️ <3 :D") == ["❤️", "❤️"]
+    assert scanner.scan("ok :D") == ["😀"]
+    assert scanner.scan("f(x):D") == []
+
+
+def test_previous_output():
+    rng = random.Random(0)
+    texts = MESSAGES + ["".join(rng.choices(PIECES, k=rng.randint(1, 12))) for _ in range(5000)]
+    for text in texts:
+        assert scanner.scan(text) == _extract_emojis(text), text
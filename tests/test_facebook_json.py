@@ -0,0 +1,101 @@
+import io
+import json
+
+import pytest
+from chatalysis.sources.facebook_json import MessageFileReader, decode_escaped_bytes, iter_messages, load, read_header
+
+# chat in the Facebook encoding, with the UTF-8 bytes of non-ASCII characters stored as separate characters
+CHAT = {
+    "participants": [{"name": "Morgan Freeman"}, {"name": "Å tÄ\u009bpÃ¡n"}],
+    "messages": [
+        {"sender_name": "Morgan Freeman", "timestamp_ms": 1600000000000, "content": 'ahoj [1, 2] {"x": 3}'},
+        {"sender_name": "Morgan Freeman", "timestamp_ms": 1600000000001, "content": "Å¾luÅ¥ouÄ\u008dkÃ½ kÅ¯Å\u0088"},
+        {"sender_name": "Morgan Freeman", "timestamp_ms": 1600000000002, "content": "C:\\u00e2\\"},
+        {"sender_name": "Morgan Freeman", "timestamp_ms": 1599999999999, "photos": [{"uri": "a.jpg"}]},
+        {"sender_name": "Å tÄ\u009bpÃ¡n", "timestamp_ms": 1500000000000, "is_unsent": False},
+    ],
+    "title": "Morgan Freeman",
+    "is_still_participant": True,
+    "magic_words": [],
+}
+
+
+def _decode(value):
+    """Decodes the Facebook encoding the way the data was decoded after parsing"""
+    if isinstance(value, str):
+        return value.encode("iso-8859-1").decode("utf-8")
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+DECODED = _decode(CHAT)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_messages(chunk_size, indent):
+    text = json.dumps(CHAT, indent=indent)
+    reader = MessageFileReader(io.StringIO(text), chunk_size)
+
+    # participants precede the messages, so they are available right away
+    assert reader.members == {"participants": DECODED["participants"]}
+    assert list(reader.messages()) == DECODED["messages"]
+    assert reader.members == {k: v for k, v in DECODED.items() if k != "messages"}
+
+
+def test_iter_messages_members():
+    members: dict = {}
+    messages = list(iter_messages(io.StringIO(json.dumps(CHAT)), members))
+
+    assert messages == DECODED["messages"]
+    assert members["title"] == "Morgan Freeman"
+
+
+def test_read_header():
+    assert read_header(io.StringIO(json.dumps(CHAT))) == {"participants": DECODED["participants"]}
+
+
+def test_load():
+    assert load(io.StringIO(json.dumps(CHAT))) == DECODED
+    assert DECODED["participants"][1]["name"] == "Štěpán"
+
+
+def test_decode_escaped_bytes():
+    assert decode_escaped_bytes(r'"\u00c5\u00a0t\u00c4\u009bp\u00c3\u00a1n"') == '"Štěpán"'
+    # escaped backslashes followed by "u00..." are not escapes
+    assert decode_escaped_bytes(r'"\\u00c5\\\u00c5\u00a0"') == r'"\\u00c5\\Š"'
+    # invalid UTF-8 is left as it is
+    assert decode_escaped_bytes(r'"\u00c5x"') == r'"\u00c5x"'
+
+
+def test_empty_messages():
+    chat = {"participants": [], "messages": [], "title": ""}
+    reader = MessageFileReader(io.StringIO(json.dumps(chat)), 3)
+    assert list(reader.messages()) == []
+    assert reader.members == {"participants": [], "title": ""}
+
+
+def test_malformed():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_messages(io.StringIO('{"participants": [], "messages": [{"a": 1}, {"b": ')))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_messages(io.StringIO('{"participants": [], "messages": [{"a": 1} {"b": 2}]}')))
+
+
+def test_malformed_raises_early():
+    # the error is far from the end of the buffer, so the rest of the file isn't read
+    file = io.StringIO('{"participants": [], "messages": [{"a": 1 "b": 2}, ' + '{"c": 3}, ' * 10000)
+    with pytest.raises(json.JSONDecodeError):
+        list(MessageFileReader(file, 64).messages())
+    assert file.tell() < 1000
+
+
+def test_long_value():
+    content = "x" * 100_000
+    text = json.dumps({"participants": [], "messages": [{"content": content}, {"content": "y"}]})
+    file = io.StringIO(text)
+    reader = MessageFileReader(file, 16)
+    assert [m["content"] for m in reader.messages()] == [content, "y"]
@@ -0,0 +1,24 @@
+import numpy as np
+
+from chatalysis.chats.message_lengths import LongestMessages, LongMessage, text_lengths
+
+TEXTS = ["ahoj", "", "  dva  slova ", "Příliš žluťoučký kůň 👍🏻", "a\tb\nc", "x"]
+
+
+def test_text_lengths():
+    encoded = [t.encode("utf-8") for t in TEXTS]
+    offsets = np.cumsum([0] + [len(e) for e in encoded])
+    chars, words = text_lengths(b"".join(encoded), offsets)
+
+    assert chars.tolist() == [len(t) for t in TEXTS]
+    assert words.tolist() == [len(t.split()) for t in TEXTS]
+
+
+def test_longest_messages():
+    longest, other = LongestMessages(2), LongestMessages(2)
+    for i, text in enumerate(["a", "abc", "ab"]):
+        longest.add(LongMessage(len(text), 1, i, text))
+    other.add(LongMessage(4, 1, 10, "abcd"))
+    longest.merge(other)
+
+    assert [m.text for m in longest.messages()] == ["abcd", "abc"]
@@ -0,0 +1,68 @@
+from chatalysis.chats.message_table import MessageKind, MessageTable, MessageTableBuilder
+
+
+def _classify(message: dict) -> MessageKind:
+    return MessageKind.CONTENT if "content" in message else MessageKind.PHOTOS
+
+
+MESSAGES = [
+    {"sender_name": "Bob", "timestamp_ms": 30, "content": "třetí", "reactions": [{"reaction": "👍", "actor": "Eve"}]},
+    {"sender_name": "Alice", "timestamp_ms": 10, "photos": [{"uri": "a.jpg"}]},
+    {"sender_name": "Bob", "timestamp_ms": 20, "content": "druhá", "reactions": [{"reaction": "😆", "actor": "Alice"}]},
+]
+
+
+def _table() -> MessageTable:
+    return MessageTableBuilder(_classify).extend(MESSAGES).build()
+
+
+def test_build():
+    table = _table()
+
+    assert len(table) == 3
+    assert table.timestamps.tolist() == [30, 10, 20]
+    assert [table.names[s] for s in table.senders] == ["Bob", "Alice", "Bob"]
+    assert table.kinds.tolist() == [MessageKind.CONTENT, MessageKind.PHOTOS, MessageKind.CONTENT]
+    assert list(table.texts(range(3))) == ["třetí", "", "druhá"]
+    assert table.reaction_rows.tolist() == [0, 2]
+    assert [table.names[a] for a in table.reaction_actors] == ["Eve", "Alice"]
+
+
+def test_sorted_and_filtered():
+    table = _table().sorted()
+
+    assert table.timestamps.tolist() == [10, 20, 30]
+    assert list(table.texts(range(3))) == ["", "druhá", "třetí"]
+    # the reactions follow their messages
+    assert table.reaction_rows.tolist() == [1, 2]
+    assert [table.symbols[s] for s in table.reaction_symbols] == ["😆", "👍"]
+
+    bob = table.sent_by("Bob")
+    assert bob.timestamps.tolist() == [20, 30]
+    assert bob.reaction_rows.tolist() == [0, 1]
+    assert len(table.sent_by("Nobody")) == 0
+
+
+def test_concatenate():
+    first = MessageTableBuilder(_classify).extend(MESSAGES[:1]).build()
+    second = MessageTableBuilder(_classify).extend(MESSAGES[1:]).build()
+    table = MessageTable.concatenate([first, second])
+
+    assert table.timestamps.tolist() == [30, 10, 20]
+    assert [table.names[s] for s in table.senders] == ["Bob", "Alice", "Bob"]
+    assert list(table.texts(range(3))) == ["třetí", "", "druhá"]
+    assert table.reaction_rows.tolist() == [0, 2]
+    assert [table.names[a] for a in table.reaction_actors] == ["Eve", "Alice"]
+    assert [table.symbols[s] for s in table.reaction_symbols] == ["👍", "😆"]
+
+
+def test_merge():
+    # files in the exports are sorted from the newest message
+    newer = MessageTableBuilder(_classify).extend([MESSAGES[0], MESSAGES[2]]).build()
+    older = MessageTableBuilder(_classify).extend([MESSAGES[1]]).build()
+    table = MessageTable.merge([newer, older])
+
+    assert table.timestamps.tolist() == [10, 20, 30]
+    assert [table.names[s] for s in table.senders] == ["Alice", "Bob", "Bob"]
+    assert list(table.texts(range(3))) == ["", "druhá", "třetí"]
+    assert table.reaction_rows.tolist() == [1, 2]
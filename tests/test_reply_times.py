@@ -0,0 +1,37 @@
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from chatalysis.chats.reply_times import ReplyTimes, count_reply_times, find_replies
+
+
+def test_find_replies():
+    timestamps = np.array([0, 60_000, 90_000, 100_000, 100_000 + 13 * 3600_000, 100_000 + 13 * 3600_000 + 5_000])
+    senders = np.array([0, 1, 1, 0, 1, 0], dtype=np.int32)
+
+    replies, previous, times = find_replies(timestamps, senders)
+    # the second message of a person isn't a reply, neither is a message after more than the window
+    assert replies.tolist() == [1, 3, 5]
+    assert previous.tolist() == [0, 2, 4]
+    assert times.tolist() == [60, 10, 5]
+
+
+def test_count_reply_times():
+    # 2021-01-01 09:00 UTC, 04:00 in New York
+    start = 1609491600_000
+    timestamps = start + np.array([0, 30_000, 40_000, 100_000, 400_000])
+    senders = np.array([0, 1, 2, 0, 1], dtype=np.int32)
+
+    replies = count_reply_times(timestamps, senders, ["A", "B", "C"], ZoneInfo("America/New_York"))
+    assert replies.keys() == {"A", "B", "C"}
+    assert replies["B"].count == 2
+    assert replies["B"].to.keys() == {"A"}
+    assert replies["B"].hours.keys() == {4}
+    assert round(replies["A"].times.quantile(0.5)) == 60
+    assert round(replies["C"].to["B"].quantile(0.5)) == 10
+
+    merged = ReplyTimes()
+    merged.merge(replies["B"])
+    merged.merge(replies["A"])
+    assert merged.count == 3
+    assert merged.to.keys() == {"A", "C"}
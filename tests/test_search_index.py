@@ -0,0 +1,81 @@
+import pickle
+from datetime import timezone
+
+import numpy as np
+
+from chatalysis.chats.message_table import MessageKind, MessageTableBuilder
+from chatalysis.chats.search_index import ChatSegment, SearchIndex, decode_varints, encode_varints, parse_query
+
+DAY = 86_400_000
+
+MESSAGES = [
+    {"sender_name": "Alice Smith", "timestamp_ms": 0, "content": "Shall we go to the cinema?"},
+    {"sender_name": "Bob", "timestamp_ms": DAY, "content": "The cinema is closed, let's go to the café"},
+    {"sender_name": "Alice Smith", "timestamp_ms": DAY + 1, "photos": [{"uri": "a.jpg"}]},
+    {"sender_name": "Alice Smith", "timestamp_ms": 3 * DAY, "content": "Cafe it is. Go!"},
+]
+
+
+def _classify(message: dict) -> MessageKind:
+    return MessageKind.CONTENT if "content" in message else MessageKind.PHOTOS
+
+
+def _segment(chat_id: str = "chat") -> ChatSegment:
+    table = MessageTableBuilder(_classify).extend(MESSAGES).build().sorted()
+    return ChatSegment.build(chat_id, "Alice and Bob", table)
+
+
+def test_varints():
+    values = np.array([0, 1, 127, 128, 300, 2**40], dtype=np.int64)
+    encoded = encode_varints(values)
+    assert len(encoded) == 1 + 1 + 1 + 2 + 2 + 6
+    assert decode_varints(encoded).tolist() == values.tolist()
+    assert decode_varints(encode_varints(np.zeros(0, dtype=np.int64))).tolist() == []
+
+
+def test_parse_query():
+    query = parse_query('Café "go to the" from:"alice s" from:bob after:1970-01-02 before:1970-01-03', timezone.utc)
+    assert query.terms == ["cafe", "go", "to", "the"]
+    assert query.phrases == [["go", "to", "the"]]
+    assert query.senders == ["alice s", "bob"]
+    assert query.after == DAY
+    assert query.before == 3 * DAY
+
+
+def test_segment_search():
+    # the segment is stored compressed
+    segment = pickle.loads(pickle.dumps(_segment()))
+
+    def search(text: str) -> list[int]:
+        return segment.search(parse_query(text, timezone.utc), 10).tolist()
+
+    assert search("cinema") == [0, 1]
+    assert search("CAFE go") == [1, 3]
+    assert search('"go to the"') == [0, 1]
+    assert search('"the cinema is"') == [1]
+    assert search("cinema from:alice") == [0]
+    assert search("go after:1970-01-02") == [1, 3]
+    assert search("from:alice before:1970-01-02") == [0]
+    assert search("unknown") == []
+    assert segment.text(1) == "The cinema is closed, let's go to the café"
+
+
+def test_search_index(tmp_path):
+    index = SearchIndex("scope", tmp_path, timezone.utc)
+    index.add(_segment("a"), "fingerprint a")
+    index.add(_segment("b"), "fingerprint b")
+    index.save()
+
+    index = SearchIndex("scope", tmp_path, timezone.utc)
+    assert index.fingerprint("a") == "fingerprint a"
+    assert SearchIndex("other scope", tmp_path).fingerprint("a") is None
+
+    results = index.search("cafe", limit=3)
+    assert [(r.chat_id, r.timestamp) for r in results] == [("a", 3 * DAY), ("b", 3 * DAY), ("a", DAY)]
+    assert results[0].sender == "Alice Smith"
+    assert results[0].text == "Cafe it is. Go!"
+    assert index.search("") == []
+
+    index.remove("b")
+    index.save()
+    assert [r.chat_id for r in SearchIndex("scope", tmp_path).search("cafe")] == ["a", "a"]
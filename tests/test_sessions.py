@@ -0,0 +1,48 @@
+from datetime import date
+
+import numpy as np
+
+from chatalysis.chats.sessions import Sessions, Silence, count_sessions, find_sessions, longest_streak
+from chatalysis.chats.time_buckets import Calendar
+
+MINUTE = 60_000
+
+
+def test_find_sessions():
+    timestamps = np.array([0, 10, 80, 85, 210]) * MINUTE
+    assert find_sessions(timestamps).tolist() == [0, 2, 4]
+    assert find_sessions(timestamps, gap=3 * 3600).tolist() == [0]
+    assert find_sessions(np.zeros(0, dtype=np.int64)).tolist() == []
+
+
+def test_count_sessions():
+    timestamps = np.array([0, 10, 80, 85, 210]) * MINUTE
+    senders = np.array([0, 1, 1, 0, 1], dtype=np.int32)
+
+    sessions = count_sessions(timestamps, senders, ["A", "B"])
+    assert sessions.count == 3
+    assert sessions.started == {"A": 1, "B": 2}
+    assert sessions.ended == {"B": 2, "A": 1}
+    assert sessions.silence == Silence(125 * MINUTE, 85 * MINUTE)
+    assert round(sessions.sizes.quantile(1)) == 2
+
+    # the silence between messages that don't overlap in time counts too
+    later = count_sessions(np.array([500, 501]) * MINUTE, np.array([0, 1], dtype=np.int32), ["A", "B"])
+    merged = Sessions()
+    merged.merge(sessions)
+    merged.merge(later)
+    assert merged.count == 4
+    assert merged.started == {"A": 2, "B": 2}
+    assert merged.silence == Silence(290 * MINUTE, 210 * MINUTE)
+
+
+def test_longest_streak():
+    days = {"2023-12-30": 1, "2023-12-31": 0, "2024-01-01": 4, "2024-01-02": 2, "2024-01-03": 1, "2024-01-05": 3}
+    streak = longest_streak(days)
+    assert streak.days == 3
+    assert (str(streak.first), str(streak.last)) == ("2024-01-01", "2024-01-03")
+    assert longest_streak({}).days == 0
+
+    # the calendar of the days gives the same streak
+    calendar = Calendar(date(2023, 12, 30), np.array([1, 0, 4, 2, 1, 0, 3]))
+    assert longest_streak(calendar) == streak
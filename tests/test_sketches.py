@@ -0,0 +1,51 @@
+from collections import Counter
+
+import numpy as np
+
+from chatalysis.chats.sketches import HeavyHitters, QuantileSketch
+
+
+def test_quantile_sketch():
+    values = np.random.default_rng(0).integers(0, 5000, 10000)
+    sketch, other = QuantileSketch(), QuantileSketch()
+    sketch.add(values[:6000])
+    other.add(values[6000:])
+    sketch.merge(other)
+
+    assert sketch.count == len(values)
+    for q in (0, 0.1, 0.5, 0.9, 1):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+
+
+def test_grouped():
+    sketches = QuantileSketch.grouped(np.array([2, 0, 2, 2]), np.array([10, 0, 30, 20]))
+
+    assert list(sketches) == [0, 2]
+    assert sketches[0].zeros == 1
+    assert sketches[2].count == 3 and round(sketches[2].quantile(0.5)) == 20
+
+    # the same sketches as when adding the numbers of every group separately
+    rng = np.random.default_rng(0)
+    groups, values = rng.integers(0, 50, 5000), rng.integers(0, 100000, 5000)
+    for group, sketch in QuantileSketch.grouped(groups, values).items():
+        expected = QuantileSketch()
+        expected.add(values[groups == group])
+        assert (sketch.count, sketch.zeros, sketch.buckets) == (expected.count, expected.zeros, expected.buckets)
+
+
+def test_heavy_hitters():
+    rng = np.random.default_rng(0)
+    items = [f"w{i}" for i in rng.zipf(1.5, 20000) if i < 1000]
+    exact = Counter(items)
+    hitters, other = HeavyHitters(capacity=20), HeavyHitters(capacity=20)
+    for start in range(0, 12000, 1000):
+        hitters.add(Counter(items[start : start + 1000]))
+    other.add(Counter(items[12000:]))
+    hitters.merge(other)
+
+    assert len(hitters.counts) <= 2 * 20
+    assert hitters.error <= len(items) / 21
+    for item, count in hitters.top(5):
+        assert count <= exact[item] <= count + hitters.error
+    assert [item for item, _ in hitters.top(3)] == [item for item, _ in exact.most_common(3)]
@@ -0,0 +1,44 @@
+from chatalysis.chats.system_messages import SystemEvent, SystemMessageClassifier
+
+classifier = SystemMessageClassifier()
+
+
+def _classify(text: str, sender: str = "Ann Lee", participants: tuple = ("Ann Lee", "Bob")) -> tuple:
+    message = classifier.classify(text, sender, participants)
+    return (message.event, message.groups) if message else None
+
+
+def test_classify():
+    assert _classify("Ann Lee set the nickname for Bob to Bobby.") == (
+        SystemEvent.NICKNAME,
+        {"target": "Bob", "nickname": "Bobby"},
+    )
+    assert _classify("Ann Lee set your nickname to Bubu.") == (SystemEvent.YOUR_NICKNAME, {"nickname": "Bubu"})
+    assert _classify("Ann Lee named the group Výlet.") == (SystemEvent.GROUP_NAME, {"group_name": "Výlet"})
+    assert _classify("You added Bob to the group.") == (SystemEvent.MEMBER_ADDED, {"member": "Bob"})
+    assert _classify("Ann Lee left the group.") == (SystemEvent.MEMBER_LEFT, {})
+    assert _classify("Ann Lee started a video call.") == (SystemEvent.CALL, {})
+    assert _classify("The call ended.") == (SystemEvent.CALL_ENDED, {})
+    assert _classify("Ann Lee nastavila přezdívku uživatele Bob na Bobík.") == (
+        SystemEvent.NICKNAME,
+        {"target": "Bob", "nickname": "Bobík"},
+    )
+    assert _classify("Ann Lee odešel ze skupiny.") == (SystemEvent.MEMBER_LEFT, {})
+
+
+def test_ordinary_messages():
+    assert _classify("ahoj") is None
+    assert _classify("Ann Lee is here.") is None
+    # the system messages start with the name of the sender
+    assert _classify("Bob named the group Výlet.") is None
+    assert _classify("Ann Lee named the group Výlet", sender="Ann Lee") is None
+
+
+def test_nickname_target():
+    # the separator can be in the names, the participants are preferred for the target
+    participants = ("Ann Lee", "Bob to Go")
+    assert _classify("Ann Lee set the nickname for Bob to Go to B.", participants=participants) == (
+        SystemEvent.NICKNAME,
+        {"target": "Bob to Go", "nickname": "B"},
+    )
+    assert _classify("Ann Lee set the nickname for Eve to Evie.")[1] == {"target": "Eve", "nickname": "Evie"}
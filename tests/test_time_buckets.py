@@ -0,0 +1,87 @@
+import pickle
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from chatalysis.chats.time_buckets import Calendar, count_times, load_timezone, local_seconds
+
+
+def test_count_times():
+    # unsorted timestamps spanning a change of the year and of the daylight saving time
+    timestamps = np.array([1672570800000, 1672527600000, 1679796000000, 1672531200000, 1672444800000])
+    times, from_day, to_day = count_times(timestamps)
+
+    local = [datetime.fromtimestamp(t // 1000) for t in timestamps.tolist()]
+    assert from_day == min(local).date() and to_day == max(local).date()
+    assert sum(times.days.values()) == 5 and len(times.days) == (to_day - from_day).days + 1
+    assert list(times.days)[0] == str(from_day)
+    for d in local:
+        assert times.days[str(d.date())] == sum(x.date() == d.date() for x in local)
+        assert times.hours[d.hour] == sum(x.hour == d.hour for x in local)
+        assert times.months[f"{d.month}/{d.year}"] == sum((x.month, x.year) == (d.month, d.year) for x in local)
+        assert times.years[str(d.year)] == sum(x.year == d.year for x in local)
+    # weekdays are in the order of their first appearance
+    assert list(times.weekdays) == list(dict.fromkeys(d.isoweekday() for d in local))
+    assert list(times.hours) == list(range(24))
+    assert list(times.years) == sorted({str(d.year) for d in local})
+
+
+def test_count_times_before_epoch():
+    times, from_day, _ = count_times(np.array([-86400000 * 400]))
+    assert from_day == date.fromtimestamp(-86400 * 400)
+    assert times.years == {str(from_day.year): 1}
+
+
+def test_local_seconds_in_timezone():
+    # around the changes of the daylight saving time in New York in 2023 and a single second after them
+    timestamps = np.array([1678604399000, 1678604400000, 1699163999000, 1699164000000, 1699164001000])
+    zone = load_timezone("America/New_York")
+    offsets = [datetime.fromtimestamp(t // 1000, zone).utcoffset().total_seconds() for t in timestamps.tolist()]
+    assert (local_seconds(timestamps, zone) - timestamps // 1000).tolist() == offsets
+
+    times, from_day, to_day = count_times(timestamps, zone)
+    assert from_day == date(2023, 3, 12) and to_day == date(2023, 11, 5)
+    assert times.hours[1] == 4 and times.hours[3] == 1 and times.hours[2] == 0
+
+
+def test_load_timezone():
+    assert load_timezone("") is None
+    with pytest.raises(ValueError, match="Europe/Nowhere"):
+        load_timezone("Europe/Nowhere")
+    with pytest.raises(ValueError):
+        load_timezone("../etc")
+
+
+def test_calendar():
+    # 2024-02-28 (Wednesday) to 2024-03-04, with the messages of two participants and of two kinds
+    timestamps = np.array([0, 1, 2, 4, 4, 6]) * 86_400_000 + 1709121600000
+    senders = np.array([0, 1, 0, 2, 0, 1], dtype=np.int32)
+    kinds = np.array([1, 1, 2, 1, 1, 1], dtype=np.uint8)
+    times, from_day, to_day = count_times(timestamps, load_timezone("UTC"), senders, ["A", "B", None], kinds)
+    calendar = times.days
+
+    assert isinstance(calendar, Calendar) and calendar.to_day == to_day == date(2024, 3, 5)
+    assert calendar.people == ["A", "B"] and calendar.kinds == ["content", "photos"]
+    assert list(calendar)[:3] == ["2024-02-28", "2024-02-29", "2024-03-01"] and len(calendar) == 7
+    assert calendar["2024-03-03"] == 2 and calendar.counts().tolist() == [1, 1, 1, 0, 2, 0, 1]
+    assert calendar.count() == 6
+    assert calendar.count(date(2024, 3, 1), date(2024, 3, 3)) == 3
+    assert calendar.count(date(2024, 1, 1), date(2024, 2, 29)) == 2
+    assert calendar.count(date(2024, 3, 1), person="A") == 2
+    assert calendar.count(person="C") == 0
+    assert calendar.count(kind="photos") == 1
+    assert calendar.counts(person="B").tolist() == [0, 1, 0, 0, 0, 0, 1]
+    with pytest.raises(ValueError):
+        calendar.count(person="A", kind="photos")
+
+    assert calendar.weeks == {"2024-02-26": 5, "2024-03-04": 1}
+    assert calendar.months == times.months == {"2/2024": 2, "3/2024": 4}
+    assert calendar.years == times.years == {"2024": 6}
+
+    restored = pickle.loads(pickle.dumps(calendar))
+    assert dict(restored) == dict(calendar) and restored.count(person="B") == 2
+
+    merged = Calendar.merge([calendar, Calendar(date(2024, 2, 27), np.array([3]), {"B": np.array([3])})])
+    assert merged.from_day == date(2024, 2, 27) and merged.to_day == date(2024, 3, 5)
+    assert merged.count() == 9 and merged.count(person="B") == 5 and merged.count(kind="photos") == 1
+    assert merged.months == {"2/2024": 5, "3/2024": 4}
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from chatalysis.utils.utility import change_name, get_file_path
+from chatalysis.utils.utility import change_name, get_file_path, html_duration
 
 
 def test_change_name():
@@ -9,6 +9,14 @@ def test_change_name():
     assert change_name("Morgan Freeman") == "morganfreeman"
 
 
+def test_html_duration():
+    assert html_duration(0) == "0 s"
+    assert html_duration(59.4) == "59 s"
+    assert html_duration(150) == "2 min"
+    assert html_duration(9000) == "2.5 h"
+    assert html_duration(30 * 86400) == "30 days"
+
+
 def test_get_file_path():
     root = Path(__file__).parent.parent.absolute()
 
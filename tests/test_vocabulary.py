@@ -0,0 +1,18 @@
+from chatalysis.chats.vocabulary import Vocabulary
+
+
+def test_vocabulary():
+    vocabulary = Vocabulary()
+    vocabulary.add_text("I don't know, see https://example.com/know know")
+    vocabulary.add_text("Don't KNOW 2 times")
+    vocabulary.flush()
+
+    assert vocabulary.words.top(2) == [("know", 3), ("don't", 2)]
+    # only the pairs of long words are phrases
+    assert vocabulary.phrases.top(1) == [("don't know", 2)]
+    assert "i don't" not in dict(vocabulary.phrases.top(10))
+
+    other = Vocabulary()
+    other.add_text("see")
+    vocabulary.merge(other)
+    assert dict(vocabulary.words.top(10))["see"] == 2
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from chatalysis.sources.whatsapp_dates import DateFormat, DateParser, infer_date_format
+
+
+def test_infer_date_format():
+    assert infer_date_format(["3/30/24, 15:55", "4/2/24, 09:10"]) == DateFormat("MDY", "/", False, False)
+    assert infer_date_format(["05.06.2023, 18:08:08", "13.06.2023, 18:08:08"]) == DateFormat("DMY", ".", True, False)
+    assert infer_date_format(["2023-06-13 6:08 PM"]) == DateFormat("YMD", "-", False, True)
+    # the month comes first when the dates don't tell
+    assert infer_date_format(["05/06/2023, 18:08"]).order == "MDY"
+    assert infer_date_format(["yesterday"]) is None
+
+
+def test_parse():
+    parser = DateParser.infer(["05.06.2023, 18:08:08", "13.06.2023, 08:00:00"])
+    # unlike dateparser, which reads the first date as May 6th
+    assert parser.parse("05.06.2023, 18:08:08") == datetime(2023, 6, 5, 18, 8, 8)
+    assert parser.parse("13.06.23, 00:00:01") == datetime(2023, 6, 13, 0, 0, 1)
+    # the dates in other formats are left to dateparser
+    assert parser.parse("June 13, 2023 18:08") == datetime(2023, 6, 13, 18, 8)
+    assert parser.parse("not a date") is None
+
+    parser = DateParser.infer(["1/2/23, 3:04 PM"])
+    assert parser.parse("1/2/23, 12:04 am") == datetime(2023, 1, 2, 0, 4)
+    assert parser.parse("12/31/23, 12:59 PM") == datetime(2023, 12, 31, 12, 59)